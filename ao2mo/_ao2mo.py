@@ -43,6 +43,22 @@ class AO2MOpt(object):
         libao2mo.CVHFdel_optimizer(ctypes.byref(self._this))
 
 
+# The OpenMP loops of the e1 drivers hand out one ish at a time.  Passing the
+# shells in cost-descending order lets the expensive shells start first, so
+# that the threads do not idle while the last big shell is being computed.
+def _shell_order(bas, triangular):
+    from pyscf.gto.mole import ANG_OF, NPRIM_OF, NCTR_OF
+    bas = numpy.asarray(bas)
+    weights = ((bas[:,ANG_OF]*2+1) * bas[:,NCTR_OF] * bas[:,NPRIM_OF])
+    weights = weights.astype(numpy.double)
+    if triangular:
+        # only jsh <= ish are computed for the given ish
+        cost = weights * numpy.cumsum(weights)
+    else:
+        cost = weights
+    return numpy.asarray(numpy.argsort(-cost, kind='mergesort'),
+                         dtype=numpy.int32)
+
 # if out is not None, transform AO to MO in-place
 def nr_e1fill_(intor, sh_range, atm, bas, env,
                aosym='s1', comp=1, ao2mopt=None, out=None):
@@ -85,12 +101,15 @@ def nr_e1fill_(intor, sh_range, atm, bas, env,
         cintor = _fpointer(intor)
         cintopt = _vhf.make_cintopt(c_atm, c_bas, c_env, intor)
 
+    ish_order = _shell_order(c_bas, aosym in ('s4', 's2ij'))
+
     fdrv = getattr(libao2mo, 'AO2MOnr_e1fill_drv')
     fill = _fpointer('AO2MOfill_nr_' + aosym)
     fdrv(cintor, cgto_in_shell, fill,
          out.ctypes.data_as(ctypes.c_void_p),
          ctypes.c_int(klsh0), ctypes.c_int(klsh1-klsh0),
          ctypes.c_int(nkl), ctypes.c_int(comp),
+         ish_order.ctypes.data_as(ctypes.c_void_p),
          cintopt, cao2mopt,
          c_atm.ctypes.data_as(ctypes.c_void_p), natm,
          c_bas.ctypes.data_as(ctypes.c_void_p), nbas,
@@ -239,6 +258,8 @@ def r_e1_(intor, mo_coeff, shape, sh_range, atm, bas, env,
         cintopt = _vhf.make_cintopt(c_atm, c_bas, c_env, intor)
 
     tao = numpy.asarray(tao, dtype=numpy.int32)
+    ish_order = _shell_order(c_bas, aosym in ('s4', 's2ij', 'a2ij', 'a4ij',
+                                              'a4kl', 'a4'))
 
     fdrv = getattr(libao2mo, 'AO2MOr_e1_drv')
     fill = _fpointer('AO2MOfill_r_' + aosym)
@@ -250,8 +271,8 @@ def r_e1_(intor, mo_coeff, shape, sh_range, atm, bas, env,
          ctypes.c_int(nkl),
          ctypes.c_int(i0), ctypes.c_int(icount),
          ctypes.c_int(j0), ctypes.c_int(jcount),
-         ctypes.c_int(comp), cintopt, cao2mopt,
-         tao.ctypes.data_as(ctypes.c_void_p),
+         ctypes.c_int(comp), ish_order.ctypes.data_as(ctypes.c_void_p),
+         cintopt, cao2mopt, tao.ctypes.data_as(ctypes.c_void_p),
          c_atm.ctypes.data_as(ctypes.c_void_p), natm,
          c_bas.ctypes.data_as(ctypes.c_void_p), nbas,
          c_env.ctypes.data_as(ctypes.c_void_p))
@@ -15,8 +15,10 @@ def full(eri_ao, mo_coeff, verbose=0, compact=True):
     r'''MO integral transformation for the given orbital.
 
     Args:
-        eri_ao : ndarray
-            AO integrals, can be either 8-fold or 4-fold symmetry.
+        eri_ao : ndarray or Mole
+            AO integrals, can be either 8-fold or 4-fold symmetry.  If a
+            :class:`Mole` object is given, the 8-fold AO integrals are
+            generated (or read from :mod:`pyscf.lib.intcache` if enabled).
         mo_coeff : ndarray
             Transform (ij|kl) with the same set of orbitals.
 
@@ -56,8 +58,10 @@ def general(eri_ao, mo_coeffs, verbose=0, compact=True):
     AO integrals to MO integrals.
 
     Args:
-        eri_ao : ndarray
-            AO integrals, can be either 8-fold or 4-fold symmetry.
+        eri_ao : ndarray or Mole
+            AO integrals, can be either 8-fold or 4-fold symmetry.  If a
+            :class:`Mole` object is given, the 8-fold AO integrals are
+            generated (or read from :mod:`pyscf.lib.intcache` if enabled).
         mo_coeffs : 4-item list of ndarray
             Four sets of orbital coefficients, corresponding to the four
             indices of (ij|kl)
@@ -111,6 +115,11 @@ def general(eri_ao, mo_coeffs, verbose=0, compact=True):
     else:
         log = logger.Logger(sys.stdout, verbose)
 
+    if hasattr(eri_ao, '_bas'):  # Mole object
+        from pyscf.scf import _vhf
+        mol = eri_ao
+        eri_ao = _vhf.int2e_sph(mol._atm, mol._bas, mol._env)
+
     ijsame = compact and iden_coeffs(mo_coeffs[0], mo_coeffs[1])
     klsame = compact and iden_coeffs(mo_coeffs[2], mo_coeffs[3])
 
@@ -278,46 +278,51 @@ def general(mol, mo_coeffs, erifile, dataname='eri_mo', tmpdir=None,
                            *time_0pass)
 
     mem_words = max_memory * 1e6 / 8
-    iobuflen = guess_e2bufsize(ioblk_size, nij_pair, nao_pair)[0]
+# two buffers are used for the load/write in background
+    iobuflen = guess_e2bufsize(ioblk_size*.5, nij_pair, nao_pair)[0]
 
     log.debug('step2: kl-pair (ao %d, mo %d), mem %.8g MB, ioblock %.8g MB',
               nao_pair, nkl_pair, iobuflen*nao_pair*8/1e6,
               iobuflen*nkl_pair*8/1e6)
 
-    klaoblks = len(fswap['0'])
     ijmoblks = int(numpy.ceil(float(nij_pair)/iobuflen)) * comp
     ao_loc = numpy.asarray(mol.ao_loc_nr(), dtype=numpy.int32)
-    ti0 = time_1pass
-    bufs1 = numpy.empty((iobuflen,nkl_pair))
-    buf = numpy.empty((iobuflen, nao_pair))
-    istep = 0
-    for row0, row1 in prange(0, nij_pair, iobuflen):
-        nrow = row1 - row0
+    tasks = [(icomp, row0, row1)
+             for row0, row1 in prange(0, nij_pair, iobuflen)
+             for icomp in range(comp)]
+
+    def load(icomp, row0, row1, buf):
+        _load_from_h5g(fswap['%d'%icomp], row0, row1, buf)
+    def save(icomp, row0, row1, buf):
+        if comp == 1:
+            h5d_eri[row0:row1] = buf
+        else:
+            h5d_eri[icomp,row0:row1] = buf
 
-        for icomp in range(comp):
-            istep += 1
-            tioi = 0
+# The half-transformed integrals of the next block are loaded and the MO
+# integrals of the previous block are written in the background, while the
+# current block is transformed.
+    bufs = [numpy.empty((iobuflen,nao_pair)) for i in range(min(2,len(tasks)))]
+    bufs1 = [numpy.empty((iobuflen,nkl_pair)) for i in range(min(2,len(tasks)))]
+    ti0 = time_1pass
+    with pyscf.lib.call_in_background(load) as prefetch, \
+         pyscf.lib.call_in_background(save) as async_write:
+        icomp, row0, row1 = tasks[0]
+        prefetch(icomp, row0, row1, bufs[0])
+        for istep, (icomp, row0, row1) in enumerate(tasks):
+            nrow = row1 - row0
             log.debug('step 2 [%d/%d], [%d,%d:%d], row = %d', \
-                      istep, ijmoblks, icomp, row0, row1, nrow)
-
-            buf = _load_from_h5g(fswap['%d'%icomp], row0, row1, buf)
-            ti2 = log.timer('step 2 [%d/%d], load buf'%(istep,ijmoblks), *ti0)
-            tioi += ti2[1]-ti0[1]
-            pbuf = bufs1[:nrow]
+                      istep+1, ijmoblks, icomp, row0, row1, nrow)
+            prefetch.wait()
+            buf = bufs[istep%2]
+            if istep+1 < len(tasks):
+                prefetch(*(tasks[istep+1] + (bufs[(istep+1)%2],)))
+            pbuf = bufs1[istep%2][:nrow]
             _ao2mo.nr_e2_(buf[:nrow], mokl, klshape, aosym, klmosym,
                           ao_loc=ao_loc, out=pbuf)
-
-            tw1 = time.time()
-            if comp == 1:
-                h5d_eri[row0:row1] = pbuf
-            else:
-                h5d_eri[icomp,row0:row1] = pbuf
-            tioi += time.time()-tw1
-
-            ti1 = (time.clock(), time.time())
-            log.debug('step 2 [%d/%d] CPU time: %9.2f, Wall time: %9.2f, I/O time: %9.2f', \
-                      istep, ijmoblks, ti1[0]-ti0[0], ti1[1]-ti0[1], tioi)
-            ti0 = ti1
+            async_write(icomp, row0, row1, pbuf)
+            ti0 = log.timer_debug1('step 2 [%d/%d]'%(istep+1,ijmoblks), *ti0)
+    bufs = bufs1 = None
     fswap.close()
     if isinstance(erifile, str):
         feri.close()
@@ -416,7 +421,9 @@ def half_e1(mol, mo_coeffs, swapfile,
             guess_e1bufsize(max_memory, ioblk_size, nij_pair, nao_pair, comp)
 # The buffer to hold AO integrals in C code, see line (@)
     aobuflen = int((mem_words - iobuf_words) // (nao_pair*comp))
-    shranges = guess_shell_ranges(mol, e1buflen, aobuflen, aosym)
+# iobuf is split into two buffers.  One is filled while the other one is
+# written to disk in the background
+    shranges = guess_shell_ranges(mol, (e1buflen+1)//2, aobuflen, aosym)
     if ao2mopt is None:
         if intor == 'cint2e_sph':
             ao2mopt = _ao2mo.AO2MOpt(mol, intor, 'CVHFnr_schwarz_cond',
@@ -440,30 +447,37 @@ def half_e1(mol, mo_coeffs, swapfile,
     nstep = len(shranges)
     maxbuflen = max([x[2] for x in shranges])
     bufs1 = numpy.empty((comp*maxbuflen,nao_pair))
-    bufs2 = numpy.empty((comp*maxbuflen,nij_pair))
-    for istep,sh_range in enumerate(shranges):
-        log.debug('step 1 [%d/%d], AO [%d:%d], len(buf) = %d', \
-                  istep+1, nstep, *(sh_range[:3]))
-        buflen = sh_range[2]
-        iobuf = bufs2[:comp*buflen].reshape(comp,buflen,nij_pair)
-        nmic = len(sh_range[3])
-        p0 = 0
-        for imic, aoshs in enumerate(sh_range[3]):
-            log.debug1('      fill iobuf micro [%d/%d], AO [%d:%d], len(aobuf) = %d', \
-                       imic+1, nmic, *aoshs)
-            buf = bufs1[:comp*aoshs[2]] # (@)
-            _ao2mo.nr_e1fill_(intor, aoshs, mol._atm, mol._bas, mol._env,
-                              aosym, comp, ao2mopt, out=buf)
-            buf = _ao2mo.nr_e1_(buf, moij, ijshape, aosym, ijmosym)
-            iobuf[:,p0:p0+aoshs[2]] = buf.reshape(comp,aoshs[2],-1)
-            p0 += aoshs[2]
-        ti2 = log.timer('gen AO/transform MO [%d/%d]'%(istep+1,nstep), *ti0)
-
-        e2buflen, chunks = guess_e2bufsize(ioblk_size, nij_pair, buflen)
+    bufs2 = [numpy.empty((comp*maxbuflen,nij_pair))
+             for i in range(min(2,nstep))]
+
+    def save(istep, iobuf):
+        e2buflen, chunks = guess_e2bufsize(ioblk_size, nij_pair, iobuf.shape[1])
         for icomp in range(comp):
             _transpose_to_h5g(fswap, '%d/%d'%(icomp,istep), iobuf[icomp],
                               e2buflen, None)
-        ti0 = log.timer('transposing to disk', *ti2)
+
+# The integrals of step istep are written in the background, while the
+# integrals of step istep+1 are computed.
+    with pyscf.lib.call_in_background(save) as async_write:
+        for istep,sh_range in enumerate(shranges):
+            log.debug('step 1 [%d/%d], AO [%d:%d], len(buf) = %d', \
+                      istep+1, nstep, *(sh_range[:3]))
+            buflen = sh_range[2]
+# the buffer of step istep-2 is released when the write of step istep-1 starts
+            iobuf = bufs2[istep%2][:comp*buflen].reshape(comp,buflen,nij_pair)
+            nmic = len(sh_range[3])
+            p0 = 0
+            for imic, aoshs in enumerate(sh_range[3]):
+                log.debug1('      fill iobuf micro [%d/%d], AO [%d:%d], len(aobuf) = %d', \
+                           imic+1, nmic, *aoshs)
+                buf = bufs1[:comp*aoshs[2]] # (@)
+                _ao2mo.nr_e1fill_(intor, aoshs, mol._atm, mol._bas, mol._env,
+                                  aosym, comp, ao2mopt, out=buf)
+                buf = _ao2mo.nr_e1_(buf, moij, ijshape, aosym, ijmosym)
+                iobuf[:,p0:p0+aoshs[2]] = buf.reshape(comp,aoshs[2],-1)
+                p0 += aoshs[2]
+            async_write(istep, iobuf)
+            ti0 = log.timer('gen AO/transform MO [%d/%d]'%(istep+1,nstep), *ti0)
     bufs1 = bufs2 = None
     if isinstance(swapfile, str):
         fswap.close()
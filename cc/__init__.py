@@ -1,6 +1,10 @@
 from pyscf.cc import ccsd
 from pyscf.cc import ccsd_lambda
 from pyscf.cc import ccsd_rdm
+from pyscf.cc import ccsd_t
+from pyscf.cc import ccsd_symm
+from pyscf.cc import dfccsd
+from pyscf.cc.dfccsd import density_fit
 
 def CCSD(mf, frozen=[]):
     return ccsd.CCSD(mf, frozen)
@@ -10,6 +10,7 @@ import h5py
 from pyscf import lib
 from pyscf.lib import logger
 import pyscf.ao2mo
+from pyscf.df.addons import prefetch_ranges
 from pyscf.cc import _ccsd
 
 BLKMIN = 4
@@ -38,6 +39,8 @@ def kernel(cc, eris, t1=None, t2=None, max_cycle=50, tol=1e-8, tolnormt=1e-6,
     if cc.diis:
         adiis = lib.diis.DIIS(cc, cc.diis_file)
         adiis.space = cc.diis_space
+# the amplitudes which do not fit the memory are held in the file
+        adiis.max_memory = max(0, max_memory - lib.current_memory()[0]) * .5
     else:
         adiis = lambda t1,t2,*args: (t1,t2)
 
@@ -92,14 +95,19 @@ def update_amps(cc, t1, t2, eris, max_memory=2000):
     time1 = log.timer_debug1('woooo', *time0)
 
     unit = _memory_usage_inloop(nocc, nvir)*1e6/8
+    ovxx = (eris.ovvv, eris.ovoo, eris.ooov, eris.ovov, eris.oovv)
+    if not isinstance(eris.ovvv, numpy.ndarray):
+# double buffer for the integrals prefetched from disk
+        unit += (nvir**2*(nvir+1)//2 + nocc**2*nvir*2 + nocc*nvir**2*2) * 2
     max_memory = max_memory - lib.current_memory()[0]
     blksize = max(BLKMIN, int(max_memory*.95e6/8/unit))
     log.debug1('block size = %d, nocc = %d is divided into %d blocks',
                blksize, nocc, int((nocc+blksize-1)//blksize))
 
-    for p0, p1 in prange(0, nocc, blksize):
+    for p0, p1, (ovvv, ovoo, ooov, ovov, oovv) in \
+            prefetch_ranges(ovxx, list(prange(0, nocc, blksize))):
 # ==== read eris.ovvv ====
-        eris_ovvv = _cp(eris.ovvv[p0:p1])
+        eris_ovvv = _cp(ovvv)
         eris_ovvv = _ccsd.unpack_tril(eris_ovvv.reshape((p1-p0)*nvir,-1))
         eris_ovvv = eris_ovvv.reshape(p1-p0,nvir,nvir,nvir)
 
@@ -126,7 +134,7 @@ def update_amps(cc, t1, t2, eris, max_memory=2000):
     #: wOVov -= numpy.einsum('jbik,ka->jiba', eris.ovoo, t1)
     #: t2new += woVoV.transpose()
         #: wOVov = -numpy.einsum('jbik,ka->ijba', eris.ovoo[p0:p1], t1)
-        tmp = _cp(eris.ovoo[p0:p1].transpose(2,0,1,3))
+        tmp = _cp(ovoo.transpose(2,0,1,3))
         wOVov = lib.dot(tmp.reshape(-1,nocc), t1, -1)
         tmp = None
         wOVov = wOVov.reshape(nocc,p1-p0,nvir,nvir)
@@ -134,7 +142,7 @@ def update_amps(cc, t1, t2, eris, max_memory=2000):
         lib.dot(t1, eris_ovvv.reshape(-1,nvir).T, 1, wOVov.reshape(nocc,-1), 1)
         t2new[p0:p1] += wOVov.transpose(1,0,2,3)
 
-        eris_ooov = _cp(eris.ooov[p0:p1])
+        eris_ooov = _cp(ooov)
         #: woVoV = numpy.einsum('ka,ijkb->ijba', t1, eris.ooov[p0:p1])
         #: woVoV -= numpy.einsum('jc,icab->ijab', t1, eris_ovvv)
         woVoV = lib.dot(_cp(eris_ooov.transpose(0,1,3,2).reshape(-1,nocc)), t1)
@@ -156,7 +164,7 @@ def update_amps(cc, t1, t2, eris, max_memory=2000):
         #==== mem usage blksize*(nvir**3+nocc*nvir**2*4)
 
 # ==== read eris.ovov ====
-        eris_ovov = _cp(eris.ovov[p0:p1])
+        eris_ovov = _cp(ovov)
         #==== mem usage blksize*(nocc*nvir**2*4)
 
         for i in range(p1-p0):
@@ -226,7 +234,7 @@ def update_amps(cc, t1, t2, eris, max_memory=2000):
         tau = theta = None
 
 # ==== read eris.oovv ====
-        eris_oovv = _cp(eris.oovv[p0:p1])
+        eris_oovv = _cp(oovv)
         #==== mem usage blksize*(nocc*nvir**2*3)
 
         #:tmp = numpy.einsum('ic,jkbc->jibk', t1, eris_oovv)
@@ -517,6 +525,14 @@ http://sunqm.net/pyscf/code-rule.html#api-rules for the details of API conventio
                                    verbose=self.verbose)
         return conv, self.l1, self.l2
 
+    def ccsd_t(self, t1=None, t2=None, eris=None):
+        from pyscf.cc import ccsd_t
+        if t1 is None: t1 = self.t1
+        if t2 is None: t2 = self.t2
+        if eris is None: eris = self.ao2mo()
+        return ccsd_t.kernel(self, eris, t1, t2, max_memory=self.max_memory,
+                             verbose=self.verbose)
+
     def make_rdm1(self, t1=None, t2=None, l1=None, l2=None):
         '''1-particle density matrix in MO space'''
         from pyscf.cc import ccsd_rdm
@@ -572,10 +588,11 @@ http://sunqm.net/pyscf/code-rule.html#api-rules for the details of API conventio
             p0 += i + 1
         time0 = logger.timer_debug1(self, 'vvvv-tau', *time0)
 
-        p0 = 0
         outbuf = numpy.empty((nvir,nvir,nvir))
-        for a in range(nvir):
-            buf = _ccsd.unpack_tril(eris.vvvv[p0:p0+a+1], out=outbuf[:a+1])
+        ranges = [(a*(a+1)//2, (a+1)*(a+2)//2) for a in range(nvir)]
+        vvvv_blocks = prefetch_ranges((eris.vvvv,), ranges)
+        for a, (p0, p1, (vvvv,)) in enumerate(vvvv_blocks):
+            buf = _ccsd.unpack_tril(vvvv, out=outbuf[:a+1])
             #: t2new_tril[i,:i+1, a] += numpy.einsum('xcd,cdb->xb', tau[:,:a+1], buf)
             lib.numpy_helper._dgemm('N', 'N', nocc*(nocc+1)//2, nvir, (a+1)*nvir,
                                     tau.reshape(-1,nvir*nvir), buf.reshape(-1,nvir),
@@ -588,7 +605,6 @@ http://sunqm.net/pyscf/code-rule.html#api-rules for the details of API conventio
                                         tau.reshape(-1,nvir*nvir), buf.reshape(-1,nvir),
                                         t2new_tril.reshape(-1,nvir*nvir), 1, 1,
                                         a*nvir, 0, 0)
-            p0 += a+1
             time0 = logger.timer_debug1(self, 'vvvv %d'%a, *time0)
         return t2new_tril
     def add_wvvVV(self, t1, t2, eris, max_memory=2000):
@@ -664,7 +680,7 @@ class _ERIS:
             self.oovv = numpy.empty((nocc,nocc,nvir,nvir))
             self.ovov = numpy.empty((nocc,nvir,nocc,nvir))
             self.ovvv = numpy.empty((nocc,nvir,nvir_pair))
-            self.vvvv = numpy.empty((nvir_pair,nvir_pair))
+            self._prepare_vvvv_(cc, nvir)
             ij = 0
             outbuf = numpy.empty((nmo,nmo,nmo))
             for i in range(nocc):
@@ -674,16 +690,13 @@ class _ERIS:
                     self.ooov[i,j] = self.ooov[j,i] = buf[j,:nocc,nocc:]
                     self.oovv[i,j] = self.oovv[j,i] = buf[j,nocc:,nocc:]
                 ij += i + 1
-            ij1 = 0
             for i in range(nocc,nmo):
                 buf = _ccsd.unpack_tril(eri1[ij:ij+i+1], out=outbuf[:i+1])
                 self.ovoo[:,i-nocc] = buf[:nocc,:nocc,:nocc]
                 self.ovov[:,i-nocc] = buf[:nocc,:nocc,nocc:]
                 for j in range(nocc):
                     self.ovvv[j,i-nocc] = lib.pack_tril(_cp(buf[j,nocc:,nocc:]))
-                for j in range(nocc, i+1):
-                    self.vvvv[ij1] = lib.pack_tril(_cp(buf[j,nocc:,nocc:]))
-                    ij1 += 1
+                self._save_vvvv_(i-nocc, buf[nocc:i+1,nocc:,nocc:])
                 ij += i + 1
         else:
             cput1 = time.clock(), time.time()
@@ -725,6 +738,17 @@ class _ERIS:
                     del(feri[key])
         log.timer('CCSD integral transformation', *cput0)
 
+    def _prepare_vvvv_(self, cc, nvir):
+        nvir_pair = nvir * (nvir+1) // 2
+        self.vvvv = numpy.empty((nvir_pair,nvir_pair))
+
+    def _save_vvvv_(self, a, buf):
+        '''Save the integrals of the virtual orbital a, buf[c,b,d] = (ac|bd)
+        for c <= a'''
+        p0 = a * (a+1) // 2
+        for c in range(a+1):
+            self.vvvv[p0+c] = lib.pack_tril(_cp(buf[c]))
+
     def __del__(self):
         if hasattr(self, 'feri1'):
             for key in self.feri1.keys(): del(self.feri1[key])
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+#
+# Author: Qiming Sun <osirpt.sun@gmail.com>
+#
+
+'''
+CCSD with the point group symmetry (D2h and its subgroups)
+
+The vvvv integrals are stored in the symmetry blocks.  For the pair irrep
+G = irrep(a)^irrep(b), the (ac|bd) of the symmetry allowed pairs
+irrep(a)^irrep(b) = irrep(c)^irrep(d) = G form a symmetric matrix
+V_G[(ab),(cd)], of which the lower triangular part is saved.  The
+particle-particle ladder term is evaluated block by block, which reduces the
+storage of vvvv by ~G/2 and the FLOPs of the ladder term by ~G^2, G being the
+order of the point group.  The symmetry forbidden amplitudes are removed
+after each update.
+
+This class is not selected by cc.CCSD.  Use cc.ccsd_symm.CCSD explicitly;
+it pays off for the groups of more than 2 irreps.  If the orbitals are not
+symmetry adapted, the dense vvvv of ccsd.CCSD is used.
+'''
+
+import time
+import numpy
+from pyscf import lib
+from pyscf.lib import logger
+from pyscf import symm
+from pyscf.df.addons import prefetch_ranges
+from pyscf.cc import ccsd
+from pyscf.cc import _ccsd
+
+
+class CCSD(ccsd.CCSD):
+    def __init__(self, mf, frozen=[], mo_energy=None, mo_coeff=None, mo_occ=None):
+        assert(mf.mol.symmetry)
+        ccsd.CCSD.__init__(self, mf, frozen, mo_energy, mo_coeff, mo_occ)
+        self.orbsym = []
+
+    def ao2mo(self, mo_coeff=None):
+        if mo_coeff is None:
+            mo = self.mo_coeff
+        else:
+            mo = mo_coeff
+        if is_symm_adapted(self.mol, mo, self._scf.get_ovlp()):
+            eris = _ERIS(self, mo_coeff)
+            self.orbsym = eris.orbsym
+        else:
+            logger.warn(self, 'Orbitals are not symmetry adapted.  '
+                        'The vvvv integrals are not blocked by symmetry.')
+            eris = ccsd._ERIS(self, mo_coeff)
+            self.orbsym = []
+        return eris
+
+    def add_wvvVV_(self, t1, t2, eris, t2new_tril, max_memory=2000):
+        if hasattr(eris, 'vvvv_sym'):
+            return add_wvvVV_(self, t1, t2, eris, t2new_tril, max_memory)
+        else:
+            return ccsd.CCSD.add_wvvVV_(self, t1, t2, eris, t2new_tril,
+                                        max_memory)
+
+    def update_amps(self, t1, t2, eris, max_memory=2000):
+        t1, t2 = ccsd.update_amps(self, t1, t2, eris, max_memory)
+        if hasattr(eris, 'orbsym'):
+            t1, t2 = symmetrize_amps_(t1, t2, eris.orbsym)
+        return t1, t2
+
+
+def add_wvvVV_(cc, t1, t2, eris, t2new_tril, max_memory=2000):
+    '''t2new_tril[ij,a,b] += sum_{cd} tau[ij,c,d] (ac|bd) for the symmetry
+    blocks of eris.vvvv_sym
+    '''
+    time0 = time.clock(), time.time()
+    log = logger.Logger(cc.stdout, cc.verbose)
+    nocc, nvir = t1.shape
+    orbsym = numpy.asarray(eris.orbsym)
+    occsym = orbsym[:nocc]
+    #: tau = t2 + numpy.einsum('ia,jb->ijab', t1, t1)
+    tau = numpy.empty((nocc*(nocc+1)//2,nvir,nvir))
+    p0 = 0
+    for i in range(nocc):
+        tau[p0:p0+i+1] = numpy.einsum('a,jb->jab', t1[i], t1[:i+1])
+        tau[p0:p0+i+1] += t2[i,:i+1]
+        p0 += i + 1
+    tau = tau.reshape(-1,nvir*nvir)
+    idx, idy = numpy.tril_indices(nocc)
+    ijsym = occsym[idx] ^ occsym[idy]
+    t2new = t2new_tril.reshape(-1,nvir*nvir)
+
+    for ir, pairs in enumerate(eris.vvpairs):
+        ijidx = numpy.where(ijsym == ir)[0]
+        if len(ijidx) == 0 or len(pairs) == 0:
+            continue
+        vvvv = lib.unpack_tril(numpy.asarray(eris.vvvv_sym[ir]))
+        #: t2new[ij,ab] += numpy.einsum('xcd,abcd->xab', tau, vvvv)
+        t2new[ijidx[:,None],pairs] += lib.dot(tau[ijidx[:,None],pairs], vvvv)
+        vvvv = None
+        time0 = log.timer_debug1('vvvv irrep %d'%ir, *time0)
+    return t2new_tril
+
+def is_symm_adapted(mol, mo_coeff, s=None):
+    '''Whether each orbital belongs to one irrep (see symm.label_orb_symm)'''
+    if mo_coeff is None:
+        return False
+    if s is None:
+        s = mol.intor_symmetric('cint1e_ovlp_sph')
+    nmo = mo_coeff.shape[1]
+    mo_s = numpy.dot(mo_coeff.T, s)
+    norm = numpy.empty((len(mol.symm_orb),nmo))
+    for i, c in enumerate(mol.symm_orb):
+        moso = numpy.dot(mo_s, c)
+        norm[i] = numpy.einsum('ij,ij->i', moso, moso)
+    norm[numpy.argmax(norm, axis=0),numpy.arange(nmo)] = 0
+    return nmo == 0 or norm.max() < symm.addons.THRESHOLD*1e2
+
+def symmetrize_amps_(t1, t2, orbsym):
+    '''Remove the symmetry forbidden amplitudes'''
+    nocc, nvir = t1.shape
+    orbsym = numpy.asarray(orbsym)
+    occsym = orbsym[:nocc]
+    virsym = orbsym[nocc:]
+    t1[occsym[:,None] != virsym] = 0
+    ovsym = occsym[:,None] ^ virsym
+    for i in range(nocc):
+        t2[i][(ovsym[i][None,:,None] ^ ovsym[:,None,:]) != 0] = 0
+    return t1, t2
+
+
+class _ERIS(ccsd._ERIS):
+    '''The integrals of ccsd._ERIS with vvvv replaced by
+
+        vvvv_sym[G] : the lower triangular part of V_G[(ab),(cd)] = (ac|bd)
+        vvpairs[G] : the (ab) pairs (a*nvir+b) of irrep(a)^irrep(b) = G
+        orbsym : the irreps of the orbitals
+
+    The blocks V_G are filled by the integrals of one virtual orbital at a
+    time (see _save_vvvv_), either during the incore transformation or from
+    the vvvv on disk.  The full vvvv is not held in memory.
+    '''
+    def __init__(self, cc, mo_coeff=None, method='incore'):
+        ccsd._ERIS.__init__(self, cc, mo_coeff, method)
+        cput0 = (time.clock(), time.time())
+        log = logger.Logger(cc.stdout, cc.verbose)
+        if hasattr(self, 'feri2'):
+            nocc = cc.nocc()
+            nvir = self.mo_coeff.shape[1] - nocc
+            self._prepare_vvvv_(cc, nvir)
+            outbuf = numpy.empty((nvir,nvir,nvir))
+            ranges = [(a*(a+1)//2, (a+1)*(a+2)//2) for a in range(nvir)]
+            vvvv_blocks = prefetch_ranges((self.feri2['eri_mo'],), ranges)
+            for a, (p0, p1, (vvvv,)) in enumerate(vvvv_blocks):
+                buf = _ccsd.unpack_tril(numpy.asarray(vvvv), out=outbuf[:a+1])
+                self._save_vvvv_(a, buf)
+            del(self.feri2['eri_mo'])
+            log.timer('CCSD vvvv symmetry blocks', *cput0)
+        self.vvvv = None
+
+    def _prepare_vvvv_(self, cc, nvir):
+        mol = cc.mol
+        self.orbsym = symm.label_orb_symm(mol, mol.irrep_id, mol.symm_orb,
+                                          self.mo_coeff,
+                                          s=cc._scf.get_ovlp())
+        self.orbsym = orbsym = numpy.asarray(self.orbsym)
+        nocc = self.mo_coeff.shape[1] - nvir
+        virsym = orbsym[nocc:]
+        self._vvsym = vvsym = virsym[:,None] ^ virsym
+        nirrep = max(mol.irrep_id) + 1
+# pairs are ordered with a as the major index, so that the (ac|bd) of c <= a
+# fill the lower triangular part of V_G
+        self.vvpairs = [numpy.where(vvsym.ravel() == ir)[0]
+                        for ir in range(nirrep)]
+        self._vvpos = numpy.empty(nvir*nvir, dtype=int)
+        for pairs in self.vvpairs:
+            self._vvpos[pairs] = numpy.arange(len(pairs))
+        self._vvpos = self._vvpos.reshape(nvir,nvir)
+        self.vvvv_sym = [numpy.zeros(len(pairs)*(len(pairs)+1)//2)
+                         for pairs in self.vvpairs]
+
+    def _save_vvvv_(self, a, buf):
+        '''buf[c,b,d] = (ac|bd) for c <= a'''
+        vvsym = self._vvsym
+        pos = self._vvpos
+        for ir, v in enumerate(self.vvvv_sym):
+            bidx = numpy.where(vvsym[a] == ir)[0]
+            cidx, didx = numpy.where(vvsym[:a+1] == ir)
+            if len(bidx) > 0 and len(cidx) > 0:
+                #: V_G[(ab),(cd)] = (ac|bd), (cd) <= (ab)
+                row = pos[a,bidx]
+                col = pos[cidx,didx]
+                mask = col <= row[:,None]
+                idx = (row*(row+1)//2)[:,None] + col
+                v[idx[mask]] = buf[cidx,:,didx][:,bidx].T[mask]
+
+
+if __name__ == '__main__':
+    from pyscf import gto
+    from pyscf import scf
+
+    mol = gto.Mole()
+    mol.atom = [
+        [8 , (0. , 0.     , 0.)],
+        [1 , (0. , -0.757 , 0.587)],
+        [1 , (0. , 0.757  , 0.587)]]
+    mol.basis = 'cc-pvdz'
+    mol.symmetry = True
+    mol.build()
+    mf = scf.RHF(mol)
+    mf.conv_tol = 1e-12
+    mf.scf()
+
+    mcc = CCSD(mf)
+    mcc.ccsd()
+    print(mcc.ecc - -0.2133432312951)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+#
+# Author: Qiming Sun <osirpt.sun@gmail.com>
+#
+
+'''
+RHF-CCSD(T) perturbative triples correction
+
+The triples amplitudes W_ijk(abc) are constructed for the occupied triples
+i >= j >= k, with the virtual indices (a,b,c) vectorized.  The ovvv integrals
+are read from ccsd._ERIS (incore arrays or the datasets of feri1) in the
+packed storage, and unpacked for blocks of occupied orbitals.  The block
+size is determined by max_memory.  The tensor contractions are carried out
+by the (multi-threaded) BLAS dot.
+'''
+
+import time
+import numpy
+import pyscf.lib as lib
+from pyscf.lib import logger
+from pyscf.cc import _ccsd
+
+# t2 as ijab
+
+def kernel(mycc, eris, t1=None, t2=None, max_memory=2000, verbose=logger.INFO):
+    '''(T) correction energy.  The orbitals of eris need to be canonical HF
+    orbitals.
+    '''
+    cput0 = (time.clock(), time.time())
+    if isinstance(verbose, logger.Logger):
+        log = verbose
+    else:
+        log = logger.Logger(mycc.stdout, verbose)
+
+    if t1 is None: t1 = mycc.t1
+    if t2 is None: t2 = mycc.t2
+
+    nocc, nvir = t1.shape
+    mo_e = eris.fock.diagonal()
+    e_occ = mo_e[:nocc]
+    eabc = lib.direct_sum('a,b,c->abc', mo_e[nocc:], mo_e[nocc:], mo_e[nocc:])
+    fov = eris.fock[:nocc,nocc:]
+    ovoo = numpy.asarray(eris.ovoo)
+    ovov = numpy.asarray(eris.ovov)
+    t2ovv = t2.reshape(nocc,nocc,nvir*nvir)
+
+    def get_w(i, j, k, ovvv_i):
+        #:w = numpy.einsum('abf,cf->abc', ovvv[i], t2[k,j])
+        #:w-= numpy.einsum('am,mbc->abc', ovoo[i,:,:,j], t2[:,k])
+        w = lib.dot(ovvv_i.reshape(-1,nvir), t2[k,j].T)
+        w -= lib.dot(ovoo[i,:,:,j], t2ovv[:,k]).reshape(-1,nvir)
+        return w.reshape(nvir,nvir,nvir)
+
+    def get_v(i, j, k):
+        #:v = numpy.einsum('ab,c->abc', ovov[i,:,j], t1[k]) * .5
+        #:v+= numpy.einsum('ab,c->abc', t2[i,j], fov[k]) * .5
+        v = numpy.einsum('ab,c->abc', ovov[i,:,j], t1[k]*.5)
+        v+= numpy.einsum('ab,c->abc', t2[i,j], fov[k]*.5)
+        return v
+
+    def contract(i, j, k, vvv):
+        wijk = (get_w(i, j, k, vvv[i]) +
+                get_w(i, k, j, vvv[i]).transpose(0,2,1) +
+                get_w(j, i, k, vvv[j]).transpose(1,0,2) +
+                get_w(j, k, i, vvv[j]).transpose(2,0,1) +
+                get_w(k, i, j, vvv[k]).transpose(1,2,0) +
+                get_w(k, j, i, vvv[k]).transpose(2,1,0))
+        vijk = (get_v(i, j, k) +
+                get_v(i, k, j).transpose(0,2,1) +
+                get_v(j, i, k).transpose(1,0,2) +
+                get_v(j, k, i).transpose(2,0,1) +
+                get_v(k, i, j).transpose(1,2,0) +
+                get_v(k, j, i).transpose(2,1,0))
+        d3 = e_occ[i] + e_occ[j] + e_occ[k] - eabc
+        if i == k:  # i == j == k
+            d3 *= 6
+        elif i == j or j == k:
+            d3 *= 2
+        zijk = r3(wijk + vijk) / d3
+        return numpy.dot(wijk.ravel(), zijk.ravel())
+
+    mem_now = lib.current_memory()[0]
+    max_memory = max(0, max_memory - mem_now)
+# 3 blocks of unpacked ovvv, 8 nvir^3 intermediates in contract
+    blksize = int(max_memory*1e6/8/nvir**3 - 8) // 3
+    blksize = min(nocc, max(1, blksize))
+    log.debug1('max_memory %d MB (%d in use), blksize %d',
+               max_memory, mem_now, blksize)
+
+    et = 0
+    vvv = {}
+    for i0, i1 in prange(0, nocc, blksize):
+        _load_ovvv_(vvv, eris.ovvv, i0, i1, nvir)
+        for j0, j1 in prange(0, i1, blksize):
+            _load_ovvv_(vvv, eris.ovvv, j0, j1, nvir)
+            for k0, k1 in prange(0, j1, blksize):
+                _load_ovvv_(vvv, eris.ovvv, k0, k1, nvir)
+                for i in range(i0, i1):
+                    for j in range(j0, min(j1,i+1)):
+                        for k in range(k0, min(k1,j+1)):
+                            et += contract(i, j, k, vvv)
+                _drop_ovvv_(vvv, (i0, i1), (j0, j1))
+            _drop_ovvv_(vvv, (i0, i1))
+        vvv.clear()
+        log.debug1('(T) occupied block [%d:%d]', i0, i1)
+    et *= 2
+    log.timer('CCSD(T)', *cput0)
+    log.note('CCSD(T) correction = %.15g', et)
+    return et
+
+def r3(w):
+    return (4 * w + w.transpose(1,2,0) + w.transpose(2,0,1)
+            - 2 * w.transpose(2,1,0) - 2 * w.transpose(0,2,1)
+            - 2 * w.transpose(1,0,2))
+
+def _load_ovvv_(vvv, ovvv, p0, p1, nvir):
+    '''Unpack ovvv[p0:p1] to vvv[p] = (pa|bc), for p not in the dict'''
+    if p0 in vvv:
+        return vvv
+    buf = numpy.asarray(ovvv[p0:p1]).reshape((p1-p0)*nvir,-1)
+    buf = _ccsd.unpack_tril(buf).reshape(p1-p0,nvir,nvir,nvir)
+    for p in range(p0, p1):
+        vvv[p] = buf[p-p0]
+    return vvv
+
+def _drop_ovvv_(vvv, *blocks):
+    '''Remove the unpacked ovvv except those of the given blocks'''
+    keep = set()
+    for p0, p1 in blocks:
+        keep.update(range(p0, p1))
+    for p in list(vvv.keys()):
+        if p not in keep:
+            del(vvv[p])
+    return vvv
+
+def prange(start, end, step):
+    for i in range(start, end, step):
+        yield i, min(i+step, end)
+
+
+if __name__ == '__main__':
+    from pyscf import gto
+    from pyscf import scf
+    from pyscf import cc
+
+    mol = gto.Mole()
+    mol.atom = [
+        [8 , (0. , 0.     , 0.)],
+        [1 , (0. , -.957 , .587)],
+        [1 , (0.2,  .757 , .487)]]
+
+    mol.basis = '631g'
+    mol.build()
+    mf = scf.RHF(mol)
+    mf.conv_tol = 1e-14
+    mf.scf()
+    mcc = cc.CCSD(mf)
+    mcc.conv_tol = 1e-14
+    mcc.ccsd()
+    print(kernel(mcc, mcc.ao2mo()))
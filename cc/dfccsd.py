@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+#
+# Author: Qiming Sun <osirpt.sun@gmail.com>
+#
+
+'''
+Density fitting CCSD
+
+The CCSD integrals are generated from the Cholesky vectors of density fitting.
+The vvvv integrals are not stored.  They are built from the (L|vv) vectors in
+blocks of the virtual index when the particle-particle ladder term is
+evaluated.  Similarly, the ovvv integrals are generated from the (L|ov) and
+(L|vv) vectors for the blocks of the occupied index when they are read in the
+CCSD iterations.  The integral storage scales as naux*nmo^2 + nocc^2*nvir^2.
+'''
+
+import time
+from functools import reduce
+import tempfile
+import numpy
+import h5py
+from pyscf import lib
+from pyscf.lib import logger
+from pyscf import df
+from pyscf.ao2mo import _ao2mo
+from pyscf.scf import dfhf
+from pyscf.cc import ccsd
+
+
+def density_fit(cc, auxbasis='weigend'):
+    '''For the given CCSD object, generate the 2-electron integrals with
+    density fitting.  If cc._scf is a density fitting SCF object with the
+    same auxbasis, the Cholesky vectors of the SCF object are reused.
+
+    Args:
+        cc : an CCSD object
+
+    Kwargs:
+        auxbasis : str
+
+    Returns:
+        An CCSD object which uses density fitting integrals
+
+    Examples:
+
+    >>> mol = gto.M(atom='H 0 0 0; F 0 0 1', basis='ccpvdz', verbose=0)
+    >>> mf = scf.density_fit(scf.RHF(mol))
+    >>> mf.scf()
+    >>> mycc = cc.density_fit(cc.CCSD(mf))
+    >>> mycc.ccsd()
+    '''
+
+    class CCSD(cc.__class__):
+        def __init__(self):
+            self.__dict__.update(cc.__dict__)
+            self.auxbasis = auxbasis
+            if hasattr(self._scf, '_cderi') and self._scf.auxbasis == auxbasis:
+                self._cderi = self._scf._cderi
+            else:
+                self._cderi = None
+            self._naoaux = None
+            self._keys = self._keys.union(['auxbasis'])
+
+        def ao2mo(self, mo_coeff=None):
+            return _ERIS(self, mo_coeff)
+
+        def add_wvvVV_(self, t1, t2, eris, t2new_tril, max_memory=2000):
+            return add_wvvVV_(self, t1, t2, eris, t2new_tril, max_memory)
+
+    return CCSD()
+
+
+def add_wvvVV_(cc, t1, t2, eris, t2new_tril, max_memory=2000):
+    '''t2new_tril[ij,a,b] += sum_{cd} tau[ij,c,d] (ac|bd), where (ac|bd) are
+    generated from eris.vvL for blocks of a
+    '''
+    time0 = time.clock(), time.time()
+    log = logger.Logger(cc.stdout, cc.verbose)
+    nocc, nvir = t1.shape
+    nocc_pair = nocc*(nocc+1)//2
+    #: tau = t2 + numpy.einsum('ia,jb->ijab', t1, t1)
+    tau = numpy.empty((nocc_pair,nvir,nvir))
+    p0 = 0
+    for i in range(nocc):
+        tau[p0:p0+i+1] = numpy.einsum('a,jb->jab', t1[i], t1[:i+1])
+        tau[p0:p0+i+1] += t2[i,:i+1]
+        p0 += i + 1
+    tau = tau.reshape(nocc_pair,-1)
+    time0 = log.timer_debug1('vvvv-tau', *time0)
+
+    vvL = _unpack_vvL(eris.vvL, nvir)
+    naux = vvL.shape[2]
+    vvL = vvL.reshape(-1,naux)
+
+    max_memory = max(0, max_memory - lib.current_memory()[0])
+    unit = nvir**3*2 + nocc_pair*nvir
+    blksize = max(ccsd.BLKMIN, int(max_memory*.95e6/8/unit))
+    blksize = min(nvir, blksize)
+    log.debug1('vvvv block size %d', blksize)
+
+    buf = numpy.empty((blksize*nvir,nvir*nvir))
+    for a0, a1 in ccsd.prange(0, nvir, blksize):
+        #: vvvv[a,c,b,d] = numpy.einsum('acL,bdL->acbd', vvL[a0:a1], vvL)
+        vvvv = lib.dot(vvL[a0*nvir:a1*nvir], vvL.T, 1, buf[:(a1-a0)*nvir])
+        vvvv = vvvv.reshape(a1-a0,nvir,nvir,nvir).transpose(0,2,1,3)
+        vvvv = ccsd._cp(vvvv).reshape((a1-a0)*nvir,-1)
+        #: t2new_tril[:,a0:a1] += numpy.einsum('xcd,abcd->xab', tau, vvvv)
+        tmp = lib.dot(tau, vvvv.T).reshape(nocc_pair,a1-a0,nvir)
+        t2new_tril[:,a0:a1] += tmp
+        vvvv = tmp = None
+        time0 = log.timer_debug1('vvvv [%d:%d]'%(a0,a1), *time0)
+    return t2new_tril
+
+def _unpack_vvL(vvL, nvir):
+    '''(nvir_pair,naux) -> (nvir,nvir,naux)'''
+    vvL = numpy.asarray(vvL)
+    idx, idy = numpy.tril_indices(nvir)
+    out = numpy.empty((nvir,nvir,vvL.shape[1]))
+    out[idx,idy] = vvL
+    out[idy,idx] = vvL
+    return out
+
+class _OVVV(object):
+    '''ovvv[i,a,bc] = (ia|bc) = sum_L (L|ia) (L|bc), evaluated for the
+    blocks of i when the blocks are sliced or read.  It has the interface of
+    the ovvv dataset (shape, slicing, read_direct) that ccsd.update_amps and
+    the lambda, (T) and gradients code access, without storing the
+    nocc*nvir*nvir_pair array.
+    '''
+    def __init__(self, Lov, vvL):
+        self.Lov = Lov  # (naux,nocc,nvir)
+        self.vvL = vvL  # (nvir_pair,naux)
+        naux, nocc, nvir = Lov.shape
+        self.shape = (nocc, nvir, vvL.shape[0])
+        self.dtype = numpy.dtype(numpy.double)
+
+    def read_direct(self, out, source_sel=numpy.s_[:]):
+        p0, p1 = source_sel.indices(self.shape[0])[:2]
+        naux = self.Lov.shape[0]
+        Lop = ccsd._cp(self.Lov[:,p0:p1]).reshape(naux,-1)
+        lib.dot(Lop.T, self.vvL.T, 1, out.reshape(Lop.shape[1],-1), 0)
+        return out
+
+    def __getitem__(self, s):
+        if isinstance(s, slice):
+            p0, p1, step = s.indices(self.shape[0])
+            assert(step == 1)
+            out = numpy.empty((max(0, p1-p0),)+self.shape[1:])
+            return self.read_direct(out, slice(p0,p1))
+        else:
+            return self[s:s+1][0]
+
+    def __array__(self):
+        return self[:]
+
+
+class _ERIS:
+    '''The integrals of ccsd._ERIS, but generated from the Cholesky vectors.
+    vvvv is replaced by vvL, the (L|vv) vectors of shape (nvir_pair,naux).
+    ovvv is an _OVVV object which builds the (ia|bc) blocks from Lov and vvL
+    on the fly.
+    '''
+    def __init__(self, cc, mo_coeff=None, method='incore'):
+        cput0 = (time.clock(), time.time())
+        moidx = numpy.ones(cc.mo_energy.size, dtype=numpy.bool)
+        if isinstance(cc.frozen, (int, numpy.integer)):
+            moidx[:cc.frozen] = False
+        elif len(cc.frozen) > 0:
+            moidx[numpy.asarray(cc.frozen)] = False
+        if mo_coeff is None:
+            self.mo_coeff = mo_coeff = cc.mo_coeff[:,moidx]
+            self.fock = numpy.diag(cc.mo_energy[moidx])
+        else:  # If mo_coeff is not canonical orbital
+            self.mo_coeff = mo_coeff = mo_coeff[:,moidx]
+            dm = cc._scf.make_rdm1(cc.mo_coeff, cc.mo_occ)
+            fockao = cc._scf.get_hcore() + cc._scf.get_veff(cc.mol, dm)
+            self.fock = reduce(numpy.dot, (mo_coeff.T, fockao, mo_coeff))
+
+        log = logger.Logger(cc.stdout, cc.verbose)
+        # using dm=[], a hacky call to dfhf.get_jk, to generate cc._cderi
+        dfhf.get_jk_(cc, cc.mol, [])
+        cput1 = log.timer_debug1('Generate density fitting integrals', *cput0)
+
+        nocc = cc.nocc()
+        nmo = cc.nmo()
+        nvir = nmo - nocc
+        nvir_pair = nvir * (nvir+1) // 2
+        naux = cc._naoaux
+        orbv = mo_coeff[:,nocc:]
+
+        Loo = numpy.empty((naux,nocc,nocc))
+        Lov = numpy.empty((naux,nocc,nvir))
+        vvL = numpy.empty((naux,nvir_pair))
+        with df.load(cc._cderi) as feri:
+            for b0, b1, eri1 in df.addons.prefetch_blocks(feri, dfhf.BLOCKDIM):
+                eri1 = numpy.asarray(eri1, order='C')
+                buf = _ao2mo.nr_e2_(eri1, mo_coeff, (0,nocc,0,nmo), 's2kl', 's1')
+                buf = buf.reshape(b1-b0,nocc,nmo)
+                Loo[b0:b1] = buf[:,:,:nocc]
+                Lov[b0:b1] = buf[:,:,nocc:]
+                _ao2mo.nr_e2_(eri1, orbv, (0,nvir,0,nvir), 's2kl', 's2',
+                              out=vvL[b0:b1])
+                eri1 = buf = None
+        self.vvL = lib.transpose(vvL)
+        Lvv = _unpack_vvL(self.vvL, nvir).reshape(nvir*nvir,naux)
+        Loo = Loo.reshape(naux,-1)
+        Lov = Lov.reshape(naux,-1)
+        cput1 = log.timer_debug1('(L|pq) transformation', *cput1)
+
+        mem_incore = (nocc**2*nvir**2*2 +
+                      nocc**3*nvir*2 + nocc**4) * 8/1e6
+        mem_now = lib.current_memory()[0]
+        if (method == 'incore' and mem_incore+mem_now < cc.max_memory or
+            cc.mol.incore_anyway):
+            self.oooo = numpy.empty((nocc,nocc,nocc,nocc))
+            self.ooov = numpy.empty((nocc,nocc,nocc,nvir))
+            self.ovoo = numpy.empty((nocc,nvir,nocc,nocc))
+            self.oovv = numpy.empty((nocc,nocc,nvir,nvir))
+            self.ovov = numpy.empty((nocc,nvir,nocc,nvir))
+        else:
+            self._tmpfile1 = tempfile.NamedTemporaryFile()
+            self.feri1 = h5py.File(self._tmpfile1.name)
+            self.oooo = self.feri1.create_dataset('oooo', (nocc,nocc,nocc,nocc), 'f8')
+            self.ooov = self.feri1.create_dataset('ooov', (nocc,nocc,nocc,nvir), 'f8')
+            self.ovoo = self.feri1.create_dataset('ovoo', (nocc,nvir,nocc,nocc), 'f8')
+            self.oovv = self.feri1.create_dataset('oovv', (nocc,nocc,nvir,nvir), 'f8')
+            self.ovov = self.feri1.create_dataset('ovov', (nocc,nvir,nocc,nvir), 'f8')
+
+        max_memory = max(2000, cc.max_memory-lib.current_memory()[0])
+        unit = nocc*nvir**2*2 + nocc**2*nvir*2 + nocc**3
+        blksize = max(1, min(nocc, int(max_memory*.9e6/8/unit)))
+        for p0, p1 in ccsd.prange(0, nocc, blksize):
+            Lop = ccsd._cp(Loo.reshape(naux,nocc,nocc)[:,p0:p1]).reshape(naux,-1)
+            self.oooo[p0:p1] = lib.dot(Lop.T, Loo).reshape(p1-p0,nocc,nocc,nocc)
+            self.ooov[p0:p1] = lib.dot(Lop.T, Lov).reshape(p1-p0,nocc,nocc,nvir)
+            self.oovv[p0:p1] = lib.dot(Lop.T, Lvv.T).reshape(p1-p0,nocc,nvir,nvir)
+            Lop = ccsd._cp(Lov.reshape(naux,nocc,nvir)[:,p0:p1]).reshape(naux,-1)
+            self.ovoo[p0:p1] = lib.dot(Lop.T, Loo).reshape(p1-p0,nvir,nocc,nocc)
+            self.ovov[p0:p1] = lib.dot(Lop.T, Lov).reshape(p1-p0,nvir,nocc,nvir)
+            Lop = None
+            cput1 = log.timer_debug1('DF integrals [%d:%d]'%(p0,p1), *cput1)
+        self.ovvv = _OVVV(Lov.reshape(naux,nocc,nvir), self.vvL)
+        log.timer('DF-CCSD integral transformation', *cput0)
+
+    def __del__(self):
+        if hasattr(self, 'feri1'):
+            for key in self.feri1.keys(): del(self.feri1[key])
+            self.feri1.close()
+
+
+if __name__ == '__main__':
+    from pyscf import gto
+    from pyscf import scf
+    from pyscf import cc
+
+    mol = gto.Mole()
+    mol.atom = [
+        [8 , (0. , 0.     , 0.)],
+        [1 , (0. , -0.757 , 0.587)],
+        [1 , (0. , 0.757  , 0.587)]]
+    mol.basis = 'cc-pvdz'
+    mol.build()
+    mf = scf.density_fit(scf.RHF(mol))
+    mf.conv_tol = 1e-12
+    mf.scf()
+
+    mycc = density_fit(cc.CCSD(mf))
+    mycc.ccsd()
+    print(mycc.ecc)
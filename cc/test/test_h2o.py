@@ -1,7 +1,9 @@
 #!/usr/bin/env python
 import unittest
+import copy
 import numpy
 
+from pyscf import lib
 from pyscf import gto
 from pyscf import scf
 from pyscf import cc
@@ -47,6 +49,20 @@ class KnowValues(unittest.TestCase):
         self.assertAlmostEqual(mcc.ecc, -0.2133432312951, 8)
         self.assertAlmostEqual(abs(mcc.t2).sum(), 5.63970279799556984, 6)
 
+    def test_ccsd_outcore(self):
+        mcc = cc.ccsd.CC(mf)
+        eris0 = mcc.ao2mo()
+        eris1 = cc.ccsd._ERIS(mcc, method='outcore')
+        emp2, t1, t2 = mcc.init_amps(eris0)
+        t1a, t2a = cc.ccsd.update_amps(mcc, t1, t2, eris0)
+        t1b, t2b = cc.ccsd.update_amps(mcc, t1, t2, eris1)
+        self.assertTrue(numpy.allclose(t1a, t1b))
+        self.assertTrue(numpy.allclose(t2a, t2b))
+# small blocks, to prefetch the integrals in more than one step
+        t1b, t2b = cc.ccsd.update_amps(mcc, t1, t2, eris1, max_memory=1)
+        self.assertTrue(numpy.allclose(t1a, t1b))
+        self.assertTrue(numpy.allclose(t2a, t2b))
+
     def test_ccsd_frozen(self):
         mcc = cc.ccsd.CC(mf, frozen=range(1))
         mcc.conv_tol = 1e-10
@@ -54,6 +70,29 @@ class KnowValues(unittest.TestCase):
         self.assertAlmostEqual(mcc.ecc, -0.21124878189922872, 8)
         self.assertAlmostEqual(abs(mcc.t2).sum(), 5.4996425901189347, 6)
 
+    def test_ccsd_symm(self):
+        mol1 = mol.copy()
+        mol1.symmetry = True
+        mol1.build(0, 0)
+        mf1 = scf.RHF(mol1)
+        mf1.conv_tol = 1e-14
+        mf1.scf()
+        self.assertFalse(isinstance(cc.CCSD(mf1), cc.ccsd_symm.CCSD))
+        mcc = cc.ccsd_symm.CCSD(mf1)
+        mcc.conv_tol = 1e-9
+        mcc.conv_tol_normt = 1e-7
+        mcc.kernel()
+        self.assertAlmostEqual(mcc.ecc, -0.2133432312951, 8)
+
+        mf2 = copy.copy(mf1)
+        nocc = mol.nelectron // 2
+        numpy.random.seed(1)
+        u = numpy.eye(mf1.mo_coeff.shape[1])
+        u[:nocc,:nocc] = numpy.linalg.svd(numpy.random.random((nocc,nocc)))[0]
+        mf2.mo_coeff = numpy.dot(mf1.mo_coeff, u)
+        self.assertTrue(cc.ccsd_symm.is_symm_adapted(mol1, mf1.mo_coeff))
+        self.assertFalse(cc.ccsd_symm.is_symm_adapted(mol1, mf2.mo_coeff))
+
     def test_h2o_non_hf_orbital(self):
         nmo = mf.mo_energy.size
         nocc = mol.nelectron // 2
@@ -109,6 +148,70 @@ class KnowValues(unittest.TestCase):
         self.assertAlmostEqual(numpy.linalg.norm(dm1), 4.4225909673029618, 9)
         self.assertAlmostEqual(numpy.linalg.norm(dm2), 20.072866588576396, 9)
 
+    def test_ccsd_t(self):
+        mcc = cc.ccsd.CC(mf)
+        mcc.conv_tol = 1e-9
+        mcc.conv_tol_normt = 1e-7
+        mcc.kernel()
+        eris = mcc.ao2mo()
+        et = mcc.ccsd_t(eris=eris)
+        self.assertAlmostEqual(cc.ccsd_t.kernel(mcc, eris, max_memory=1), et, 12)
+
+        t1, t2 = mcc.t1, mcc.t2
+        nocc, nvir = t1.shape
+        mo_e = eris.fock.diagonal()
+        ovvv = numpy.asarray(eris.ovvv).reshape(nocc*nvir,-1)
+        ovvv = cc._ccsd.unpack_tril(ovvv).reshape(nocc,nvir,nvir,nvir)
+        ovoo = numpy.asarray(eris.ovoo)
+        ovov = numpy.asarray(eris.ovov)
+        w = numpy.einsum('iabf,kjcf->ijkabc', ovvv, t2)
+        w-= numpy.einsum('iamj,mkbc->ijkabc', ovoo, t2)
+        v = numpy.einsum('iajb,kc->ijkabc', ovov, t1) * .5
+        w = (w + w.transpose(0,2,1,3,5,4) + w.transpose(1,0,2,4,3,5) +
+             w.transpose(1,2,0,4,5,3) + w.transpose(2,0,1,5,3,4) +
+             w.transpose(2,1,0,5,4,3))
+        v = (v + v.transpose(0,2,1,3,5,4) + v.transpose(1,0,2,4,3,5) +
+             v.transpose(1,2,0,4,5,3) + v.transpose(2,0,1,5,3,4) +
+             v.transpose(2,1,0,5,4,3))
+        d3 = lib.direct_sum('i,j,k,a,b,c->ijkabc', mo_e[:nocc], mo_e[:nocc],
+                            mo_e[:nocc], -mo_e[nocc:], -mo_e[nocc:], -mo_e[nocc:])
+        x = w + v
+        z = (4*x + x.transpose(0,1,2,4,5,3) + x.transpose(0,1,2,5,3,4)
+             - 2*x.transpose(0,1,2,5,4,3) - 2*x.transpose(0,1,2,3,5,4)
+             - 2*x.transpose(0,1,2,4,3,5))
+        self.assertAlmostEqual(numpy.einsum('ijkabc,ijkabc', w, z/d3)/3, et, 9)
+
+    def test_dfccsd(self):
+        mcc = cc.density_fit(cc.ccsd.CC(mf))
+        eris = mcc.ao2mo()
+        self.assertTrue(not hasattr(eris, 'vvvv'))
+        emp2, t1, t2 = mcc.init_amps(eris)
+        t1 = t1 + numpy.sin(numpy.arange(t1.size)).reshape(t1.shape) * .01
+# the ladder term of the DF-vvvv equals to the one of conventional CCSD with
+# vvvv = (L|vv)(L|vv)
+        eris.vvvv = lib.dot(eris.vvL, eris.vvL.T)
+        nocc, nvir = t1.shape
+        ref = numpy.zeros((nocc*(nocc+1)//2,nvir,nvir))
+        ref = cc.ccsd.CC.add_wvvVV_(mcc, t1, t2, eris, ref)
+        self.assertTrue(numpy.allclose(mcc.add_wvvVV(t1, t2, eris), ref))
+
+        ovvv = numpy.asarray(eris.ovvv)
+        self.assertEqual(ovvv.shape, eris.ovvv.shape)
+        self.assertTrue(numpy.allclose(eris.ovvv[1:3], ovvv[1:3]))
+
+        mcc.conv_tol = 1e-10
+        mcc.conv_tol_normt = 1e-8
+        mcc.kernel()
+        self.assertAlmostEqual(mcc.ecc, -0.2133432312951, 3)
+# reference DF-CCSD energy from the conventional CCSD solver with the explicit
+# DF integrals vvvv = (vv|L)(L|vv) and ovvv = (ov|L)(L|vv)
+        eris.ovvv = ovvv
+        mcc0 = cc.ccsd.CC(mf)
+        mcc0.conv_tol = 1e-10
+        mcc0.conv_tol_normt = 1e-8
+        mcc0.kernel(eris=eris)
+        self.assertAlmostEqual(mcc.ecc, mcc0.ecc, 8)
+
 if __name__ == "__main__":
     print("Full Tests for H2O")
     unittest.main()
@@ -3,6 +3,8 @@
 # Author: Qiming Sun <osirpt.sun@gmail.com>
 #
 
+import numpy
+from pyscf import lib
 from pyscf import ao2mo
 
 class load(ao2mo.load):
@@ -13,3 +15,108 @@ class load(ao2mo.load):
     '''
     pass
 
+
+def prefetch_blocks(cderi, blksize, pinned=None, max_pinned=0):
+    '''Iterate over the blocks of the 3c2e integrals along the auxiliary
+    index.  For the integrals in the hdf5 dataset, the next block is read in
+    a background thread while the current block is used by the caller.
+
+    Args:
+        cderi : ndarray or hdf5 dataset
+            (naux, nao_pair) array
+        blksize : int
+            Number of auxiliary functions in each block
+
+    Kwargs:
+        pinned : dict
+            Blocks kept in memory, keyed by the auxiliary range (b0,b1).  The
+            values are the lists of the blocks, see :func:`prefetch_ranges`.
+            The pinned blocks are not read again.  New blocks are added to the
+            dict until the size of the dict reaches max_pinned.
+        max_pinned : float
+            Memory (in MB) for the pinned blocks
+
+    Yields:
+        b0, b1, and the integrals of the auxiliary functions b0:b1.  The
+        buffer of the block is overwritten when the next block is read.  Do
+        not keep the reference of it.
+
+    Examples:
+
+    >>> with df.load(mf._cderi) as feri:
+    ...     for b0, b1, eri1 in df.addons.prefetch_blocks(feri, 100):
+    ...         rho = numpy.dot(eri1, dmtril)
+    '''
+    naux = cderi.shape[0]
+    blksize = max(1, min(naux, blksize))
+    ranges = [(b0, min(b0+blksize, naux)) for b0 in range(0, naux, blksize)]
+    for b0, b1, (eri1,) in prefetch_ranges((cderi,), ranges, pinned,
+                                           max_pinned):
+        yield b0, b1, eri1
+
+def prefetch_ranges(arrays, ranges, pinned=None, max_pinned=0):
+    '''Iterate over the blocks x[p0:p1] of the given arrays for each (p0,p1)
+    in ranges.  If any of the arrays is not an ndarray (e.g. hdf5 dataset, or
+    an object which has the attribute shape and the method read_direct), the
+    blocks of the next range are read in a background thread while the
+    caller works on the current blocks.
+
+    Args:
+        arrays : list of ndarray or hdf5 dataset
+        ranges : list of (p0,p1)
+
+    Kwargs:
+        pinned : dict
+            The lists of blocks kept in memory, keyed by the range (p0,p1).
+            See :func:`prefetch_blocks`
+        max_pinned : float
+            Memory (in MB) for the pinned blocks
+
+    Yields:
+        p0, p1, and the list of the blocks x[p0:p1] of the arrays.  The
+        buffers of the blocks are overwritten two steps later.
+    '''
+    if all([isinstance(x, numpy.ndarray) for x in arrays]):
+        for p0, p1 in ranges:
+            yield p0, p1, [x[p0:p1] for x in arrays]
+        return
+
+    if pinned is None:
+        pinned = {}
+    elif pinned and not set(pinned.keys()).issubset(set(ranges)):
+        pinned.clear()  # blocks of different blksize
+    mem_pinned = sum([x.nbytes for blks in pinned.values() for x in blks]) / 1e6
+
+    def fread(p0, p1, buf):
+        for x, b in zip(arrays, buf):
+            if isinstance(x, numpy.ndarray):
+                b[:] = x[p0:p1]
+            else:
+                x.read_direct(b, numpy.s_[p0:p1])
+
+    todo = [r for r in ranges if r not in pinned]
+    if todo:
+        blksize = max([p1-p0 for p0, p1 in todo])
+    bufs = [[numpy.empty((blksize,)+x.shape[1:]) for x in arrays]
+            for i in range(min(2,len(todo)))]
+    with lib.call_in_background(fread) as prefetch:
+        if todo:
+            p0, p1 = todo[0]
+            prefetch(p0, p1, [b[:p1-p0] for b in bufs[0]])
+        k = 0
+        for p0, p1 in ranges:
+            if (p0, p1) in pinned:
+                yield p0, p1, pinned[(p0,p1)]
+                continue
+
+            prefetch.wait()
+            blocks = [b[:p1-p0] for b in bufs[k%2]]
+            if k+1 < len(todo):
+                q0, q1 = todo[k+1]
+                prefetch(q0, q1, [b[:q1-q0] for b in bufs[(k+1)%2]])
+            nbytes = sum([x.nbytes for x in blocks]) / 1e6
+            if mem_pinned + nbytes < max_pinned:
+                pinned[(p0,p1)] = [x.copy() for x in blocks]
+                mem_pinned += nbytes
+            yield p0, p1, blocks
+            k += 1
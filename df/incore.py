@@ -10,6 +10,7 @@ import _ctypes
 import numpy
 import scipy.linalg
 import pyscf.lib
+from pyscf.lib import intcache
 from pyscf.lib import logger
 from pyscf import gto
 from pyscf.df import _ri
@@ -95,15 +96,26 @@ def fill_2c2e(mol, auxmol, intor='cint2c2e_sph'):
 def cholesky_eri(mol, auxbasis='weigend', verbose=0):
     '''
     Returns:
-        2D array of (naux,nao*(nao+1)/2) in C-contiguous
+        2D array of (naux,nao*(nao+1)/2) in C-contiguous.  If the integral
+        cache :mod:`pyscf.lib.intcache` is enabled, the array is read from
+        the cache when the same molecule and auxbasis have been met before.
     '''
-    t0 = (time.clock(), time.time())
     if isinstance(verbose, logger.Logger):
         log = verbose
     else:
         log = logger.Logger(mol.stdout, verbose)
     auxmol = format_aux_basis(mol, auxbasis)
+    if intcache.enabled():
+        atm, bas, env = gto.mole.conc_env(mol._atm, mol._bas, mol._env,
+                                          auxmol._atm, auxmol._bas, auxmol._env)
+        return intcache.load_or_compute('cderi', atm, bas, env,
+                                        lambda: _cholesky_eri(mol, auxmol, log),
+                                        mol.nbas)
+    else:
+        return _cholesky_eri(mol, auxmol, log)
 
+def _cholesky_eri(mol, auxmol, log):
+    t0 = (time.clock(), time.time())
     j2c = fill_2c2e(mol, auxmol, intor='cint2c2e_sph')
     log.debug('size of aux basis %d', j2c.shape[0])
     t1 = log.timer('2c2e', *t0)
@@ -139,6 +139,20 @@ class KnowValues(unittest.TestCase):
         with h5py.File(ftmp.name) as feri:
             self.assertTrue(numpy.allclose(feri['eri_mo'], cderi0.reshape(naux,-1)))
 
+    def test_prefetch_blocks(self):
+        ftmp = tempfile.NamedTemporaryFile()
+        cderi0 = df.incore.cholesky_eri(mol)
+        df.outcore.cholesky_eri(mol, ftmp.name)
+        pinned = {}
+        with df.load(ftmp.name) as feri:
+            for i in range(2):
+                cderi1 = numpy.empty_like(cderi0)
+                for b0, b1, eri1 in df.addons.prefetch_blocks(feri, 30, pinned,
+                                                              cderi0.nbytes*.5e-6):
+                    cderi1[b0:b1] = eri1
+                self.assertTrue(numpy.allclose(cderi1, cderi0))
+                self.assertTrue(0 < len(pinned) < cderi0.shape[0]//30)
+
     def test_r_incore(self):
         j3c = df.r_incore.aux_e2(mol, auxmol, intor='cint3c2e_spinor', aosym='s1')
         nao = mol.nao_2c()
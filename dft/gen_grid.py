@@ -14,9 +14,23 @@ import pyscf.lib
 from pyscf.lib import logger
 from pyscf import gto
 from pyscf.dft import radi
+from pyscf.dft import numint
 
 libdft = pyscf.lib.load_library('libdft')
 
+# Grids with weights smaller than CUTOFF are removed
+CUTOFF = 1e-15
+# The size (in Bohr) of the boxes to group the grids, see arrange_grids
+BOX_SIZE = 1.2
+# Cell functions and pair factors below BECKE_CUTOFF are neglected in
+# gen_partition
+BECKE_CUTOFF = 1e-15
+# Number of grids (of about the same radius) sharing the atom screening in
+# gen_partition, and the upper limit of the (atom,grid) elements of the cell
+# functions evaluated at once
+BECKE_BLKSIZE = 1024
+BECKE_MAX_ELEMENTS = 100000
+
 # ~= (L+1)**2/3
 SPHERICAL_POINTS_ORDER = {
       0:    1,
@@ -262,42 +276,146 @@ def gen_partition(mol, atom_grids_tab, atomic_radii_adjust=None,
     '''Generate the mesh grid coordinates and weights for DFT numerical integration.
     We can change atomic_radii_adjust becke_scheme to generate different meshgrid.
 
+    The grids of each atom are sorted by radius and treated in blocks.  For
+    each block, the atoms whose cell functions, and whose factors on the
+    cell functions of the other atoms, are below BECKE_CUTOFF everywhere in
+    the block are left out.  The cell functions of the remaining atoms are
+    computed in C (libdft.VXCgen_grid) for original_becke with the radi
+    adjustments.  Otherwise the pairs (i,j<i) of each atom i are evaluated
+    together in numpy, and atomic_radii_adjust is called with the index i,
+    the (i,1) index array j and the (i,ngrid) array g.  It should accept the
+    index arrays i, j of the same shape as g as well.
+
     Returns:
         grid_coord and grid_weight arrays.  grid_coord array has shape (N,3);
         weight 1D array has N elements.
     '''
-    atm_coords = numpy.array([mol.atom_coord(i) for i in range(mol.natm)])
+    natm = mol.natm
+    atm_coords = numpy.array([mol.atom_coord(i) for i in range(natm)])
     atm_dist = radi._inter_distance(mol)
-    def gen_grid_partition(coords):
-        ngrid = coords.shape[0]
-        grid_dist = numpy.empty((mol.natm,ngrid))
-        for ia in range(mol.natm):
-            dc = coords - atm_coords[ia]
-            grid_dist[ia] = numpy.sqrt(numpy.einsum('ij,ij->i',dc,dc))
-        pbecke = numpy.ones((mol.natm,ngrid))
-        for i in range(mol.natm):
-            for j in range(i):
-                g = 1/atm_dist[i,j] * (grid_dist[i]-grid_dist[j])
-                if callable(atomic_radii_adjust):
-                    g = atomic_radii_adjust(i, j, g)
-                g = becke_scheme(g)
-                pbecke[i] *= .5 * (1-g)
-                pbecke[j] *= .5 * (1+g)
-
-        return pbecke
+    def pair_scheme(i, j, g):
+        if callable(atomic_radii_adjust):
+            g = atomic_radii_adjust(i, j, g)
+        return becke_scheme(numpy.ascontiguousarray(g))
+
+    # s_bound[j,k] is the upper bound of s(mu_jk) for the grids within rad
+    # of atom ia, at which r_j > R_j,ia-rad and r_k < R_k,ia+rad
+    i, j = numpy.tril_indices(natm, -1)
+    r_ij = atm_dist[i,j]
+    s_bound = numpy.ones((natm,natm))
+    def select_atoms(ia, rad):
+        mu_ij = numpy.maximum(atm_dist[ia,i]-atm_dist[ia,j]-2*rad, -r_ij) / r_ij
+        mu_ji = numpy.maximum(atm_dist[ia,j]-atm_dist[ia,i]-2*rad, -r_ij) / r_ij
+        # s(mu_ij) = 1 - s(mu_ji) for the pair scheme defined for i > j
+        s_bound[i,j] = .5 * (1 - pair_scheme(i, j, mu_ij))
+        s_bound[j,i] = .5 * (1 + pair_scheme(i, j, -mu_ji))
+        log_s = numpy.log(numpy.maximum(s_bound, 1e-300))
+        log_p = log_s.sum(axis=1)  # P_j <= prod_k s(mu_jk)
+        log_cutoff = numpy.log(BECKE_CUTOFF)
+        near = log_p >= log_cutoff
+        near[ia] = True
+        atms = numpy.where(near)[0]
+        far = numpy.where(~near)[0]
+        if far.size > 0:
+            # a far atom j changes P_k by less than P_k/s(mu_kj)*s(mu_jk)
+            dp = log_p[atms].reshape(-1,1) - log_s[atms][:,far] \
+                    + log_s[far][:,atms].T
+            atms = numpy.append(atms, far[(dp >= log_cutoff).any(axis=0)])
+        return numpy.sort(atms)
+
+    if becke_scheme is original_becke and \
+       (atomic_radii_adjust is None or
+        getattr(atomic_radii_adjust, '__module__', None) == radi.__name__):
+        # The adjustments of radi are g + a_ij*(1-g**2), a_ij = f(i,j,0)
+        if atomic_radii_adjust is None:
+            radii_table = None
+        else:
+            ai, aj = numpy.indices((natm,natm))
+            radii_table = atomic_radii_adjust(ai, aj, numpy.zeros((natm,natm)))
+        def cell_functions(coords, atms):
+            n = atms.size
+            coords = numpy.asarray(coords, order='C')
+            pbecke = numpy.empty((n,coords.shape[0]))
+            sub_coords = atm_coords[atms]
+            sub_dist = atm_dist[atms.reshape(-1,1),atms]
+            if radii_table is None:
+                ptab = pyscf.lib.c_null_ptr()
+            else:
+                sub_tab = radii_table[atms.reshape(-1,1),atms]
+                ptab = sub_tab.ctypes.data_as(ctypes.c_void_p)
+            libdft.VXCgen_grid(pbecke.ctypes.data_as(ctypes.c_void_p),
+                               coords.ctypes.data_as(ctypes.c_void_p),
+                               sub_coords.ctypes.data_as(ctypes.c_void_p),
+                               sub_dist.ctypes.data_as(ctypes.c_void_p),
+                               ptab, ctypes.c_int(n),
+                               ctypes.c_int(coords.shape[0]))
+            return pbecke
+    else:
+        def cell_functions(coords, atms):
+            n = atms.size
+            grid_dist = numpy.empty((n,coords.shape[0]))
+            for k, ka in enumerate(atms):
+                dc = coords - atm_coords[ka]
+                grid_dist[k] = numpy.sqrt(numpy.einsum('ij,ij->i',dc,dc))
+            pbecke = numpy.ones_like(grid_dist)
+            for k in range(1, n):
+                # the pairs (k,l) of all l < k
+                l = atms[:k].reshape(-1,1)
+                g = (grid_dist[k] - grid_dist[:k]) / atm_dist[atms[k],l]
+                g = pair_scheme(atms[k], l, g)
+                pbecke[k] = (.5 - .5*g).prod(axis=0)
+                pbecke[:k] *= .5 + .5*g
+            return pbecke
 
     coords_all = []
     weights_all = []
-    for ia in range(mol.natm):
+    for ia in range(natm):
         coords, vol = atom_grids_tab[mol.atom_symbol(ia)]
+        rad = numpy.sqrt(numpy.einsum('ij,ij->i', coords, coords))
+        idx = numpy.argsort(rad, kind='mergesort')
         coords = coords + atm_coords[ia]
-        pbecke = gen_grid_partition(coords)
-        weights = vol * pbecke[ia] / pbecke.sum(axis=0)
+        # merge the consecutive blocks of the same atoms
+        blocks = []
+        for p0, p1 in prange(0, vol.size, BECKE_BLKSIZE):
+            atms = select_atoms(ia, rad[idx[p1-1]])
+            if blocks and numpy.array_equal(blocks[-1][2], atms):
+                blocks[-1][1] = p1
+            else:
+                blocks.append([p0, p1, atms])
+
+        weights = numpy.empty_like(vol)
+        for p0, p1, atms in blocks:
+            if atms.size == 1:
+                weights[idx[p0:p1]] = vol[idx[p0:p1]]
+                continue
+            iatm = atms.searchsorted(ia)
+            blksize = max(1, int(BECKE_MAX_ELEMENTS/atms.size))
+            for q0, q1 in prange(p0, p1, blksize):
+                sub = numpy.sort(idx[q0:q1])
+                pbecke = cell_functions(coords[sub], atms)
+                weights[sub] = vol[sub] * pbecke[iatm] / pbecke.sum(axis=0)
         coords_all.append(coords)
         weights_all.append(weights)
     return numpy.vstack(coords_all), numpy.hstack(weights_all)
 
 
+def arrange_grids(coords, weights, cutoff=CUTOFF, box_size=BOX_SIZE):
+    '''Remove the grids of negligible weights and sort the remaining grids
+    by the boxes (of edge box_size) they belong to.  Consecutive grids are
+    spatially close, so that most shells vanish on a block of BLKSIZE grids
+    and the AO screening table (see :func:`numint.make_mask`) is sparse.
+
+    Returns:
+        coords and weights of the sorted grids
+    '''
+    if cutoff:
+        mask = abs(weights) > cutoff
+        coords = coords[mask]
+        weights = weights[mask]
+    boxes = numpy.floor(coords/box_size).astype(int)
+    idx = numpy.lexsort((boxes[:,2], boxes[:,1], boxes[:,0]))
+    return numpy.ascontiguousarray(coords[idx]), weights[idx]
+
 
 class Grids(object):
     '''DFT mesh grids
@@ -338,6 +456,17 @@ class Grids(object):
             Eg, grids.atom_grid = {'H': (20,110)} will generate 20 radial
             grids and 110 angular grids for H atom.
 
+        cutoff : float
+            The grids with weights smaller than cutoff are removed.  Set it
+            to 0 to keep all grids.  Default is 1e-15
+
+    Attributes (generated by build_):
+        coords : 2D array, shape (N,3)
+            The grids, sorted by the boxes they belong to
+        weights : 1D array
+        non0tab : 2D int8 array
+            AO screening table of the grids, see :func:`numint.make_mask`
+
         Examples:
 
         >>> mol = gto.M(atom='H 0 0 0; H 0 0 1.1')
@@ -361,11 +490,13 @@ class Grids(object):
         self.prune_scheme = treutler_prune
         self.symmetry = mol.symmetry
         self.atom_grid = {}
+        self.cutoff = CUTOFF
 
 ##################################################
 # don't modify the following attributes, they are not input options
         self.coords  = None
         self.weights = None
+        self.non0tab = None
         self._keys = set(self.__dict__.keys())
 
     def dump_flags(self):
@@ -379,6 +510,7 @@ class Grids(object):
                         self.atomic_radii.__doc__)
         if self.atom_grid:
             logger.info(self, 'User specified grid scheme %s', str(self.atom_grid))
+        logger.info(self, 'grids weight cutoff: %g', self.cutoff)
 
     def build_(self, mol=None):
         return self.setup_grids_(mol)
@@ -392,10 +524,17 @@ class Grids(object):
                                                radi_method=self.radi_method,
                                                level=self.level,
                                                prune_scheme=self.prune_scheme)
-        self.coords, self.weights = \
+        coords, weights = \
                 self.gen_partition(mol, atom_grids_tab, self.atomic_radii,
                                    self.becke_scheme)
+        self.coords, self.weights = arrange_grids(coords, weights, self.cutoff)
+        self.non0tab = numint.make_mask(mol, self.coords)
         pyscf.lib.logger.info(self, 'tot grids = %d', len(self.weights))
+        pyscf.lib.logger.debug(self, 'removed grids = %d',
+                               len(weights)-len(self.weights))
+        pyscf.lib.logger.debug(self, 'non-zero (shell, grid block) = %d / %d',
+                               numpy.count_nonzero(self.non0tab),
+                               self.non0tab.size)
         return self.coords, self.weights
 
     def kernel(self, mol=None):
@@ -5,6 +5,7 @@
 
 import ctypes
 import time
+import tempfile
 import numpy
 import scipy.linalg
 import pyscf.lib
@@ -128,10 +129,11 @@ def eval_rho(mol, ao, dm, non0tab=None, xctype='LDA', verbose=None):
         mol : an instance of :class:`Mole`
 
         ao : 2D array of shape (N,nao) for LDA, 3D array of shape (4,N,nao) for GGA
-            or (5,N,nao) for meta-GGA.  N is the number of grids, nao is the
-            number of AO functions.  If xctype is GGA, ao[0] is AO value
-            and ao[1:3] are the AO gradients.  If xctype is meta-GGA, ao[4:10]
-            are second derivatives of ao values.
+            or (4,N,nao)/(10,N,nao) for meta-GGA.  N is the number of grids,
+            nao is the number of AO functions.  If xctype is GGA, ao[0] is AO
+            value and ao[1:3] are the AO gradients.  If xctype is meta-GGA,
+            ao[4:10] are second derivatives of ao values.  Without the second
+            derivatives, the laplacian of the density is not evaluated.
         dm : 2D array
             Density matrix
 
@@ -188,12 +190,17 @@ def eval_rho(mol, ao, dm, non0tab=None, xctype='LDA', verbose=None):
         for i in range(1, 4):
             c1 = _dot_ao_dm(mol, ao[i], dm, nao, ngrids, non0tab)
             rho[i] = numpy.einsum('pi,pi->p', ao[0], c1) * 2 # *2 for +c.c.
-            rho[5] += numpy.einsum('pi,pi->p', c1, c1)
-        XX, YY, ZZ = 4, 7, 9
-        ao2 = ao[XX] + ao[YY] + ao[ZZ]
-        rho[4] = numpy.einsum('pi,pi->p', ao[0], ao2)
-        rho[4] += rho[5]
-        rho[4] *= 2
+            rho[5] += numpy.einsum('pi,pi->p', ao[i], c1)
+        if ao.shape[0] > 4:
+            XX, YY, ZZ = 4, 7, 9
+            ao2 = ao[XX] + ao[YY] + ao[ZZ]
+            c1 = _dot_ao_dm(mol, ao2, dm, nao, ngrids, non0tab)
+            rho[4] = numpy.einsum('pi,pi->p', ao[0], c1)
+            rho[4] += rho[5]
+            rho[4] *= 2
+        else:
+            # Laplacian is not available from the AO 1st derivatives
+            rho[4] = 0
 
         rho[5] *= .5
     return rho
@@ -210,10 +217,11 @@ def eval_rho2(mol, ao, mo_coeff, mo_occ, non0tab=None, xctype='LDA',
         mol : an instance of :class:`Mole`
 
         ao : 2D array of shape (N,nao) for LDA, 3D array of shape (4,N,nao) for GGA
-            or (5,N,nao) for meta-GGA.  N is the number of grids, nao is the
-            number of AO functions.  If xctype is GGA, ao[0] is AO value
-            and ao[1:3] are the AO gradients.  If xctype is meta-GGA, ao[4:10]
-            are second derivatives of ao values.
+            or (4,N,nao)/(10,N,nao) for meta-GGA.  N is the number of grids,
+            nao is the number of AO functions.  If xctype is GGA, ao[0] is AO
+            value and ao[1:3] are the AO gradients.  If xctype is meta-GGA,
+            ao[4:10] are second derivatives of ao values.  Without the second
+            derivatives, the laplacian of the density is not evaluated.
         dm : 2D array
             Density matrix
 
@@ -265,12 +273,15 @@ def eval_rho2(mol, ao, mo_coeff, mo_occ, non0tab=None, xctype='LDA',
                 c1 = _dot_ao_dm(mol, ao[i], cpos, nao, ngrids, non0tab)
                 rho[i] = numpy.einsum('pi,pi->p', c0, c1) * 2 # *2 for +c.c.
                 rho[5] += numpy.einsum('pi,pi->p', c1, c1)
-            XX, YY, ZZ = 4, 7, 9
-            ao2 = ao[XX] + ao[YY] + ao[ZZ]
-            c1 = _dot_ao_dm(mol, ao2, cpos, nao, ngrids, non0tab)
-            rho[4] = numpy.einsum('pi,pi->p', c0, c1)
-            rho[4] += rho[5]
-            rho[4] *= 2
+            if ao.shape[0] > 4:
+                XX, YY, ZZ = 4, 7, 9
+                ao2 = ao[XX] + ao[YY] + ao[ZZ]
+                c1 = _dot_ao_dm(mol, ao2, cpos, nao, ngrids, non0tab)
+                rho[4] = numpy.einsum('pi,pi->p', c0, c1)
+                rho[4] += rho[5]
+                rho[4] *= 2
+            else:
+                rho[4] = 0
 
             rho[5] *= .5
     else:
@@ -300,28 +311,30 @@ def eval_rho2(mol, ao, mo_coeff, mo_occ, non0tab=None, xctype='LDA',
             for i in range(1, 4):
                 c1 = _dot_ao_dm(mol, ao[i], cneg, nao, ngrids, non0tab)
                 rho[i] -= numpy.einsum('pi,pi->p', c0, c1) * 2 # *2 for +c.c.
-                rho5 -= numpy.einsum('pi,pi->p', c1, c1)
-            XX, YY, ZZ = 4, 7, 9
-            ao2 = ao[XX] + ao[YY] + ao[ZZ]
-            c1 = _dot_ao_dm(mol, ao2, cneg, nao, ngrids, non0tab)
-            rho[4] -= numpy.einsum('pi,pi->p', c0, c1) * 2
-            rho[4] -= rho5 * 2
+                rho5 += numpy.einsum('pi,pi->p', c1, c1)
+            if ao.shape[0] > 4:
+                XX, YY, ZZ = 4, 7, 9
+                ao2 = ao[XX] + ao[YY] + ao[ZZ]
+                c1 = _dot_ao_dm(mol, ao2, cneg, nao, ngrids, non0tab)
+                rho[4] -= numpy.einsum('pi,pi->p', c0, c1) * 2
+                rho[4] -= rho5 * 2
 
             rho[5] -= rho5 * .5
     return rho
 
 def eval_mat(mol, ao, weight, rho, vrho, vsigma=None, non0tab=None,
-             xctype='LDA', verbose=None):
+             xctype='LDA', verbose=None, vtau=None):
     '''Calculate XC potential matrix.
 
     Args:
         mol : an instance of :class:`Mole`
 
         ao : 2D array of shape (N,nao) for LDA, 3D array of shape (4,N,nao) for GGA
-            or (5,N,nao) for meta-GGA.  N is the number of grids, nao is the
-            number of AO functions.  If xctype is GGA, ao[0] is AO value
-            and ao[1:3] are the AO gradients.  If xctype is meta-GGA, ao[4:10]
-            are second derivatives of ao values.
+            or (4,N,nao)/(10,N,nao) for meta-GGA.  N is the number of grids,
+            nao is the number of AO functions.  If xctype is GGA, ao[0] is AO
+            value and ao[1:3] are the AO gradients.  If xctype is meta-GGA,
+            ao[4:10] are second derivatives of ao values.  Without the second
+            derivatives, the laplacian of the density is not evaluated.
         weight : 1D array
             Integral weights on grids.
         rho : 1D array of size N for LDA or 2D array for GGA/meta-GGA,
@@ -339,6 +352,8 @@ def eval_mat(mol, ao, weight, rho, vrho, vsigma=None, non0tab=None,
             array can be obtained by calling :func:`make_mask`
         verbose : int or object of :class:`Logger`
             No effects.
+        vtau : 1D array of size N
+            meta-GGA potential value (derivative wrt tau) on each grid
 
     Returns:
         XC potential matrix in 2D array of shape (nao,nao) where nao is the
@@ -374,7 +389,14 @@ def eval_mat(mol, ao, weight, rho, vrho, vsigma=None, non0tab=None,
         #mat = pyscf.lib.dot(ao[0].T, aow)
         mat = _dot_ao_ao(mol, ao[0], aow, nao, ngrids, non0tab)
     else:
-        raise NotImplementedError('meta-GGA')
+        assert(vsigma is not None and vtau is not None)
+        wv = numpy.empty((4,ngrids))
+        wv[0]  = weight * vrho * .5
+        wv[1:] = rho[1:4] * (weight * vsigma * 2)
+        aow = numpy.einsum('npi,np->pi', ao[:4], wv)
+        mat = _dot_ao_ao(mol, ao[0], aow, nao, ngrids, non0tab)
+        # *.25 for tau = 1/2 (\nabla f)^2 and mat + mat.T
+        mat += _tau_dot(mol, ao, .25*weight*vtau, nao, ngrids, non0tab)
     return mat + mat.T
 
 def eval_x(x_id, rho, spin=0, relativity=0, deriv=1, verbose=None):
@@ -706,6 +728,15 @@ def eval_xc(x_id, c_id, rho, spin=0, relativity=0, deriv=1, verbose=None):
     return exc, (vrho, vsigma, vlapl, vtau), fxc, kxc
 
 
+def _get_non0tab(ni, mol, grids):
+    '''The AO screening table of the grids.  The table generated by
+    grids.build_ is used if it is consistent with the grids.'''
+    nblk = (len(grids.weights)+BLKSIZE-1) // BLKSIZE
+    for non0tab in (getattr(grids, 'non0tab', None), ni.non0tab):
+        if non0tab is not None and non0tab.shape == (nblk,mol.nbas):
+            return non0tab
+    return make_mask(mol, numpy.ascontiguousarray(grids.coords))
+
 def _dot_ao_ao(mol, ao1, ao2, nao, ngrids, non0tab):
     '''return numpy.dot(ao1.T, ao2)'''
     natm = ctypes.c_int(mol._atm.shape[0])
@@ -724,6 +755,14 @@ def _dot_ao_ao(mol, ao1, ao2, nao, ngrids, non0tab):
                         mol._env.ctypes.data_as(ctypes.c_void_p))
     return vv
 
+def _tau_dot(mol, ao, wv, nao, ngrids, non0tab):
+    '''return sum_{i=x,y,z} numpy.dot(ao[i].T, ao[i]*wv)'''
+    vv = 0
+    for i in range(1, 4):
+        aow = numpy.einsum('pi,p->pi', ao[i], wv)
+        vv += _dot_ao_ao(mol, ao[i], aow, nao, ngrids, non0tab)
+    return vv
+
 def _dot_ao_dm(mol, ao, dm, nao, ngrids, non0tab):
     '''return numpy.dot(ao, dm)'''
     natm = ctypes.c_int(mol._atm.shape[0])
@@ -742,6 +781,25 @@ def _dot_ao_dm(mol, ao, dm, nao, ngrids, non0tab):
                         mol._env.ctypes.data_as(ctypes.c_void_p))
     return vm
 
+def _uks_mgga_mat(mol, ao, weight, rho_s, rho_o, vrho, vsigma_ss, vsigma_so,
+                  vtau, nao, non0tab):
+    '''Half of the meta-GGA potential matrix of spin s (the other half is its
+    transpose).  o is the opposite spin'''
+    ngrids = len(weight)
+    wv = numpy.empty((4,ngrids))
+    wv[0]  = weight * vrho * .5
+    wv[1:] = rho_s[1:4] * (weight * vsigma_ss * 2)
+    wv[1:]+= rho_o[1:4] * (weight * vsigma_so)
+    aow = numpy.einsum('npi,np->pi', ao, wv)
+    mat = _dot_ao_ao(mol, ao[0], aow, nao, ngrids, non0tab)
+    mat += _tau_dot(mol, ao, .25*weight*vtau, nao, ngrids, non0tab)
+    return mat
+
+def _check_vlapl(vlapl):
+    if vlapl is not None and numpy.any(vlapl != 0):
+        raise NotImplementedError('meta-GGA functional which depends on '
+                                  'the laplacian of density')
+
 def nr_vxc(mol, grids, x_id, c_id, dm, spin=0, relativity=0, hermi=1,
            max_memory=2000, verbose=None):
     if spin == 0:
@@ -807,11 +865,7 @@ def nr_rks_vxc(ni, mol, grids, x_id, c_id, dms, spin=0, relativity=0, hermi=1,
     xctype = _xc_type(x_id, c_id)
     ngrids = len(grids.weights)
     blksize = min(int(max_memory/6*1e6/8/nao/BLKSIZE)*BLKSIZE, ngrids)
-    if ni.non0tab is None:
-        non0tab = numpy.ones(((ngrids+BLKSIZE-1)//BLKSIZE,mol.nbas),
-                             dtype=numpy.int8)
-    else:
-        non0tab = ni.non0tab
+    non0tab = _get_non0tab(ni, mol, grids)
 
     nset = len(dms)
     nelec = numpy.zeros(nset)
@@ -860,8 +914,30 @@ def nr_rks_vxc(ni, mol, grids, x_id, c_id, dms, spin=0, relativity=0, hermi=1,
                 vmat[idm] += _dot_ao_ao(mol, ao[0], aow, nao, ip1-ip0, non0)
                 rho = exc = vxc = vrho = vsigma = wv = aow = None
     else:
-        buf = numpy.empty((6,blksize,nao))
-        raise NotImplementedError('meta-GGA')
+        buf = numpy.empty((4,blksize,nao))
+        for ip0 in range(0, ngrids, blksize):
+            ip1 = min(ngrids, ip0+blksize)
+            coords = grids.coords[ip0:ip1]
+            weight = grids.weights[ip0:ip1]
+            non0 = non0tab[ip0//BLKSIZE:]
+            ao = ni.eval_ao(mol, coords, deriv=1, non0tab=non0, out=buf)
+            for idm, dm in enumerate(dms):
+                rho = ni.eval_rho(mol, ao, dm, non0, xctype)
+                exc, vxc = ni.eval_xc(x_id, c_id, rho,
+                                      spin, relativity, 1, verbose)[:2]
+                vrho, vsigma, vlapl, vtau = vxc
+                _check_vlapl(vlapl)
+                den = rho[0] * weight
+                nelec[idm] += den.sum()
+                excsum[idm] += (den*exc).sum()
+# ref eval_mat function
+                wv = numpy.empty((4,ip1-ip0))
+                wv[0]  = weight * vrho * .5
+                wv[1:] = rho[1:4] * (weight * vsigma * 2)
+                aow = numpy.einsum('npi,np->pi', ao, wv)
+                vmat[idm] += _dot_ao_ao(mol, ao[0], aow, nao, ip1-ip0, non0)
+                vmat[idm] += _tau_dot(mol, ao, .25*weight*vtau, nao, ip1-ip0, non0)
+                rho = exc = vxc = vrho = vsigma = vtau = wv = aow = None
 
     for i in range(nset):
         vmat[i] = vmat[i] + vmat[i].T
@@ -914,11 +990,7 @@ def nr_uks_vxc(ni, mol, grids, x_id, c_id, dms, spin=0, relativity=0, hermi=1,
     ngrids = len(grids.weights)
 # NOTE to index ni.non0tab, the blksize needs to be the integer multiplier of BLKSIZE
     blksize = min(int(max_memory/6*1e6/8/nao/BLKSIZE)*BLKSIZE, ngrids)
-    if ni.non0tab is None:
-        non0tab = numpy.ones(((ngrids+BLKSIZE-1)//BLKSIZE,mol.nbas),
-                             dtype=numpy.int8)
-    else:
-        non0tab = ni.non0tab
+    non0tab = _get_non0tab(ni, mol, grids)
 
     nelec = numpy.zeros((2,nset))
     excsum = numpy.zeros(nset)
@@ -985,7 +1057,35 @@ def nr_uks_vxc(ni, mol, grids, x_id, c_id, dms, spin=0, relativity=0, hermi=1,
                 vmat[1,idm] += _dot_ao_ao(mol, ao[0], aow, nao, ip1-ip0, non0)
                 rho_a = rho_b = exc = vxc = vrho = vsigma = wv = aow = None
     else:
-        raise NotImplementedError('meta-GGA')
+        buf = numpy.empty((4,blksize,nao))
+        for ip0, ip1 in prange(0, ngrids, blksize):
+            coords = grids.coords[ip0:ip1]
+            weight = grids.weights[ip0:ip1]
+            non0 = non0tab[ip0//BLKSIZE:]
+            ao = ni.eval_ao(mol, coords, deriv=1, non0tab=non0, out=buf)
+            for idm in range(nset):
+                dm_a = dms[idm]
+                dm_b = dms[nset+idm]
+                rho_a = ni.eval_rho(mol, ao, dm_a, non0, xctype)
+                rho_b = ni.eval_rho(mol, ao, dm_b, non0, xctype)
+                exc, vxc = ni.eval_xc(x_id, c_id, (rho_a, rho_b),
+                                      1, relativity, 1, verbose)[:2]
+                vrho, vsigma, vlapl, vtau = vxc
+                _check_vlapl(vlapl)
+                den = rho_a[0]*weight
+                nelec[0,idm] += den.sum()
+                excsum[idm] += (den*exc).sum()
+                den = rho_b[0]*weight
+                nelec[1,idm] += den.sum()
+                excsum[idm] += (den*exc).sum()
+
+                vmat[0,idm] += _uks_mgga_mat(mol, ao, weight, rho_a, rho_b,
+                                             vrho[:,0], vsigma[:,0], vsigma[:,1],
+                                             vtau[:,0], nao, non0)
+                vmat[1,idm] += _uks_mgga_mat(mol, ao, weight, rho_b, rho_a,
+                                             vrho[:,1], vsigma[:,2], vsigma[:,1],
+                                             vtau[:,1], nao, non0)
+                rho_a = rho_b = exc = vxc = vrho = vsigma = vtau = None
 
     for i in range(nset):
         vmat[0,i] = vmat[0,i] + vmat[0,i].T
@@ -998,8 +1098,22 @@ def nr_uks_vxc(ni, mol, grids, x_id, c_id, dms, spin=0, relativity=0, hermi=1,
 
 
 class _NumInt(object):
+    '''Numerical integration of XC functional
+
+    Attributes:
+        max_ao_cache : int or float
+            The AO values (and derivatives) on the grids are kept between the
+            calls of nr_rks/nr_uks up to this size (in MB).  The grid blocks
+            which do not fit are recomputed.  Default is 0 (no cache)
+        ao_cache_mmap : bool
+            Whether to hold the cached AO values in memory-mapped temporary
+            files rather than in RAM.  Default is False
+    '''
     def __init__(self):
         self.non0tab = None
+        self.max_ao_cache = 0
+        self.ao_cache_mmap = False
+        self._ao_cache = None
 
     def nr_vxc(self, mol, grids, x_id, c_id, dm, spin=0, relativity=0, hermi=1,
                max_memory=2000, verbose=None):
@@ -1043,8 +1157,7 @@ class _NumInt(object):
             excsum is the XC functional value.  vmat is the XC potential matrix in
             2D array of shape (nao,nao) where nao is the number of AO functions.
         '''
-        if self.non0tab is None:
-            self.non0tab = self.make_mask(mol, grids.coords)
+        self.non0tab = _get_non0tab(self, mol, grids)
 
         if hermi != 1:
             return nr_rks_vxc(self, mol, grids, x_id, c_id, dms,
@@ -1076,11 +1189,10 @@ class _NumInt(object):
         if xctype == 'LDA':
             buf = numpy.empty((blksize,nao))
             for ip0, ip1 in prange(0, ngrids, blksize):
-                coords = grids.coords[ip0:ip1]
                 weight = grids.weights[ip0:ip1]
                 non0tab = self.non0tab[ip0//BLKSIZE:]
-                ao = self.eval_ao(mol, coords, deriv=0, non0tab=non0tab,
-                                  out=buf)
+                ao = self._eval_ao_cached(mol, grids, ip0, ip1, 0, non0tab,
+                                          buf)
                 for idm in range(nset):
                     rho = self.eval_rho2(mol, ao, natorb[idm], natocc[idm],
                                          non0tab, xctype)
@@ -1097,11 +1209,10 @@ class _NumInt(object):
         elif xctype == 'GGA':
             buf = numpy.empty((4,blksize,nao))
             for ip0, ip1 in prange(0, ngrids, blksize):
-                coords = grids.coords[ip0:ip1]
                 weight = grids.weights[ip0:ip1]
                 non0tab = self.non0tab[ip0//BLKSIZE:]
-                ao = self.eval_ao(mol, coords, deriv=1, non0tab=non0tab,
-                                  out=buf)
+                ao = self._eval_ao_cached(mol, grids, ip0, ip1, 1, non0tab,
+                                          buf)
                 for idm in range(nset):
                     rho = self.eval_rho2(mol, ao, natorb[idm], natocc[idm],
                                          non0tab, xctype)
@@ -1119,7 +1230,31 @@ class _NumInt(object):
                     vmat[idm] += _dot_ao_ao(mol, ao[0], aow, nao, ip1-ip0, non0tab)
                     rho = exc = vxc = vrho = vsigma = wv = aow = None
         else:
-            raise NotImplementedError('meta-GGA')
+            buf = numpy.empty((4,blksize,nao))
+            for ip0, ip1 in prange(0, ngrids, blksize):
+                weight = grids.weights[ip0:ip1]
+                non0tab = self.non0tab[ip0//BLKSIZE:]
+                ao = self._eval_ao_cached(mol, grids, ip0, ip1, 1, non0tab,
+                                          buf)
+                for idm in range(nset):
+                    rho = self.eval_rho2(mol, ao, natorb[idm], natocc[idm],
+                                         non0tab, xctype)
+                    exc, vxc = self.eval_xc(x_id, c_id, rho,
+                                            0, relativity, 1, verbose)[:2]
+                    vrho, vsigma, vlapl, vtau = vxc
+                    _check_vlapl(vlapl)
+                    den = rho[0] * weight
+                    nelec[idm] += den.sum()
+                    excsum[idm] += (den * exc).sum()
+# ref eval_mat function
+                    wv = numpy.empty((4,ip1-ip0))
+                    wv[0]  = weight * vrho * .5
+                    wv[1:] = rho[1:4] * (weight * vsigma * 2)
+                    aow = numpy.einsum('npi,np->pi', ao, wv)
+                    vmat[idm] += _dot_ao_ao(mol, ao[0], aow, nao, ip1-ip0, non0tab)
+                    vmat[idm] += _tau_dot(mol, ao, .25*weight*vtau, nao,
+                                          ip1-ip0, non0tab)
+                    rho = exc = vxc = vrho = vsigma = vtau = wv = aow = None
         for i in range(nset):
             vmat[i] = vmat[i] + vmat[i].T
         if nset == 1:
@@ -1157,8 +1292,7 @@ class _NumInt(object):
             excsum is the XC functional value.
             vmat is the XC potential matrix for (alpha,beta) spin.
         '''
-        if self.non0tab is None:
-            self.non0tab = self.make_mask(mol, grids.coords)
+        self.non0tab = _get_non0tab(self, mol, grids)
 
         if hermi != 1:
             return nr_uks_vxc(self, mol, grids, x_id, c_id, dms,
@@ -1192,10 +1326,10 @@ class _NumInt(object):
         if xctype == 'LDA':
             buf = numpy.empty((blksize,nao))
             for ip0, ip1 in prange(0, ngrids, blksize):
-                coords = grids.coords[ip0:ip1]
                 weight = grids.weights[ip0:ip1]
                 non0tab = self.non0tab[ip0//BLKSIZE:]
-                ao = self.eval_ao(mol, coords, deriv=0, non0tab=non0tab, out=buf)
+                ao = self._eval_ao_cached(mol, grids, ip0, ip1, 0, non0tab,
+                                          buf)
                 for idm in range(nset):
                     c_a, c_b = natorb[idm]
                     e_a, e_b = natocc[idm]
@@ -1219,10 +1353,10 @@ class _NumInt(object):
         elif xctype == 'GGA':
             buf = numpy.empty((4,blksize,nao))
             for ip0, ip1 in prange(0, ngrids, blksize):
-                coords = grids.coords[ip0:ip1]
                 weight = grids.weights[ip0:ip1]
                 non0tab = self.non0tab[ip0//BLKSIZE:]
-                ao = self.eval_ao(mol, coords, deriv=1, non0tab=non0tab, out=buf)
+                ao = self._eval_ao_cached(mol, grids, ip0, ip1, 1, non0tab,
+                                          buf)
                 for idm in range(nset):
                     c_a, c_b = natorb[idm]
                     e_a, e_b = natocc[idm]
@@ -1251,7 +1385,37 @@ class _NumInt(object):
                     vmat[1,idm] += _dot_ao_ao(mol, ao[0], aow, nao, ip1-ip0, non0tab)
                     rho_a = rho_b = exc = vxc = vrho = vsigma = wv = aow = None
         else:
-            raise NotImplementedError('meta-GGA')
+            buf = numpy.empty((4,blksize,nao))
+            for ip0, ip1 in prange(0, ngrids, blksize):
+                weight = grids.weights[ip0:ip1]
+                non0tab = self.non0tab[ip0//BLKSIZE:]
+                ao = self._eval_ao_cached(mol, grids, ip0, ip1, 1, non0tab,
+                                          buf)
+                for idm in range(nset):
+                    c_a, c_b = natorb[idm]
+                    e_a, e_b = natocc[idm]
+                    rho_a = self.eval_rho2(mol, ao, c_a, e_a, non0tab, xctype)
+                    rho_b = self.eval_rho2(mol, ao, c_b, e_b, non0tab, xctype)
+                    exc, vxc = self.eval_xc(x_id, c_id, (rho_a, rho_b),
+                                            1, relativity, 1, verbose)[:2]
+                    vrho, vsigma, vlapl, vtau = vxc
+                    _check_vlapl(vlapl)
+                    den = rho_a[0]*weight
+                    nelec[0,idm] += den.sum()
+                    excsum[idm] += (den*exc).sum()
+                    den = rho_b[0]*weight
+                    nelec[1,idm] += den.sum()
+                    excsum[idm] += (den*exc).sum()
+
+                    vmat[0,idm] += _uks_mgga_mat(mol, ao, weight, rho_a, rho_b,
+                                                 vrho[:,0], vsigma[:,0],
+                                                 vsigma[:,1], vtau[:,0], nao,
+                                                 non0tab)
+                    vmat[1,idm] += _uks_mgga_mat(mol, ao, weight, rho_b, rho_a,
+                                                 vrho[:,1], vsigma[:,2],
+                                                 vsigma[:,1], vtau[:,1], nao,
+                                                 non0tab)
+                    rho_a = rho_b = exc = vxc = vrho = vsigma = vtau = None
 
         for i in range(nset):
             vmat[0,i] = vmat[0,i] + vmat[0,i].T
@@ -1267,6 +1431,38 @@ class _NumInt(object):
         return eval_ao(mol, coords, deriv, relativity, bastart, bascount,
                        non0tab, out, verbose)
 
+    def _eval_ao_cached(self, mol, grids, ip0, ip1, deriv, non0tab, out):
+        '''AO values on the grids[ip0:ip1], looked up in the AO cache first.
+        The cache is dropped when grids.coords, mol or deriv is changed.'''
+        if self.max_ao_cache <= 0:
+            self._ao_cache = None
+            return self.eval_ao(mol, grids.coords[ip0:ip1], deriv=deriv,
+                                non0tab=non0tab, out=out)
+
+        cache = self._ao_cache
+        if (cache is None or cache['coords'] is not grids.coords or
+            cache['atm'] is not mol._atm or cache['bas'] is not mol._bas or
+            cache['env'] is not mol._env or cache['deriv'] != deriv):
+            cache = self._ao_cache = {'coords': grids.coords, 'atm': mol._atm,
+                                      'bas': mol._bas, 'env': mol._env,
+                                      'deriv': deriv, 'blocks': {}, 'size': 0}
+        if (ip0, ip1) in cache['blocks']:
+            return cache['blocks'][(ip0,ip1)]
+
+        ao = self.eval_ao(mol, grids.coords[ip0:ip1], deriv=deriv,
+                          non0tab=non0tab, out=out)
+        if cache['size'] + ao.nbytes <= self.max_ao_cache*1e6:
+            if self.ao_cache_mmap:
+                tmpf = tempfile.TemporaryFile()
+                aocopy = numpy.memmap(tmpf, dtype=ao.dtype, mode='w+',
+                                      shape=ao.shape)
+                aocopy[:] = ao
+            else:
+                aocopy = ao.copy()
+            cache['blocks'][(ip0,ip1)] = aocopy
+            cache['size'] += ao.nbytes
+        return ao
+
     def make_mask(self, mol, coords, relativity=0, bastart=0, bascount=None,
                   verbose=None):
         return make_mask(mol, coords, relativity, bastart, bascount, verbose)
@@ -1296,7 +1492,6 @@ def _xc_type(x_id, c_id):
         xctype = 'LDA'
     elif pyscf.dft.vxc.is_meta_gga(x_id) or pyscf.dft.vxc.is_meta_gga(c_id):
         xctype = 'MGGA'
-        raise NotImplementedError('meta-GGA')
     else:
         xctype = 'GGA'
     return xctype
@@ -28,6 +28,7 @@ class KnowValues(unittest.TestCase):
         grid.atomic_radii = radi.becke_atomic_radii_adjust(h2o, \
                 numpy.round(radi.BRAGG_RADII, 2))
         grid.atom_grid = {"H": (10, 50), "O": (10, 50),}
+        grid.cutoff = 0
         coord, weight = grid.setup_grids()
         self.assertAlmostEqual(numpy.linalg.norm(coord), 185.91245945279027, 9)
         self.assertAlmostEqual(numpy.linalg.norm(weight), 1720.1317185648893, 9)
@@ -54,6 +55,7 @@ class KnowValues(unittest.TestCase):
         grid = gen_grid.Grids(h2o)
         grid.prune_scheme = gen_grid.sg1_prune
         grid.atom_grid = {"H": (10, 50), "O": (10, 50),}
+        grid.cutoff = 0
         coord, weight = grid.setup_grids()
         self.assertAlmostEqual(numpy.linalg.norm(coord), 202.17732600266302, 9)
         self.assertAlmostEqual(numpy.linalg.norm(weight), 442.54536463517167, 9)
@@ -63,6 +65,61 @@ class KnowValues(unittest.TestCase):
         self.assertAlmostEqual(numpy.linalg.norm(coord), 151.01253616288849, 9)
         self.assertAlmostEqual(numpy.linalg.norm(weight), 586.59843503169827, 9)
 
+    def test_gen_partition(self):
+        def partition_ref(mol, atom_grids_tab, atomic_radii_adjust, becke_scheme):
+            atm_coords = numpy.array([mol.atom_coord(i) for i in range(mol.natm)])
+            atm_dist = radi._inter_distance(mol)
+            coords_all = []
+            weights_all = []
+            for ia in range(mol.natm):
+                coords, vol = atom_grids_tab[mol.atom_symbol(ia)]
+                coords = coords + atm_coords[ia]
+                grid_dist = numpy.array([numpy.linalg.norm(coords-r, axis=1)
+                                         for r in atm_coords])
+                pbecke = numpy.ones_like(grid_dist)
+                for i in range(mol.natm):
+                    for j in range(i):
+                        g = (grid_dist[i]-grid_dist[j]) / atm_dist[i,j]
+                        if atomic_radii_adjust is not None:
+                            g = atomic_radii_adjust(i, j, g)
+                        g = becke_scheme(g)
+                        pbecke[i] *= .5 * (1-g)
+                        pbecke[j] *= .5 * (1+g)
+                coords_all.append(coords)
+                weights_all.append(vol * pbecke[ia] / pbecke.sum(axis=0))
+            return numpy.vstack(coords_all), numpy.hstack(weights_all)
+
+        mol = gto.M(atom=[['H' if i % 3 else 'C', (0, 0, i*1.5)]
+                          for i in range(10)], verbose=0)
+        atom_grids_tab = gen_grid.gen_atomic_grids(mol, {"H": (20, 50),
+                                                         "C": (20, 50)})
+        a = numpy.random.random((mol.natm,mol.natm)) * .2
+        a = a - a.T
+        for adjust in (None, radi.treutler_atomic_radii_adjust(mol, radi.BRAGG_RADII),
+                       lambda i,j,g: g + a[i,j]*(1-g**2)):
+            for scheme in (gen_grid.original_becke, gen_grid.stratmann):
+                coords0, weights0 = partition_ref(mol, atom_grids_tab, adjust, scheme)
+                coords1, weights1 = gen_grid.gen_partition(mol, atom_grids_tab,
+                                                           adjust, scheme)
+                self.assertTrue(numpy.allclose(coords0, coords1))
+                self.assertTrue(numpy.allclose(weights0, weights1,
+                                               rtol=1e-12, atol=1e-12))
+
+    def test_arrange_grids(self):
+        grid = gen_grid.Grids(h2o)
+        grid.atom_grid = {"H": (10, 50), "O": (10, 50),}
+        grid.cutoff = 0
+        coord0, weight0 = grid.setup_grids()
+        grid.cutoff = 1e-9
+        coord, weight = grid.setup_grids()
+        self.assertTrue(weight.size <= weight0.size)
+        self.assertTrue(abs(weight).min() > 1e-9)
+        self.assertAlmostEqual(weight.sum(), weight0.sum(), 5)
+        self.assertTrue(numpy.all(grid.non0tab ==
+                                  dft.numint.make_mask(h2o, grid.coords)))
+        boxes = numpy.floor(coord/gen_grid.BOX_SIZE)
+        self.assertTrue(numpy.all(numpy.diff(boxes[:,0]) >= 0))
+
 
 if __name__ == "__main__":
     print("Test Grids")
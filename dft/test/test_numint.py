@@ -50,6 +50,44 @@ class KnowValues(unittest.TestCase):
                                      mf.grids.weights.size, non0tab)
         self.assertTrue(numpy.allclose(res0, res1))
 
+    def test_eval_rho_mgga(self):
+        ao = dft.numint.eval_ao(mol, mf.grids.coords, deriv=1)
+        numpy.random.seed(1)
+        dm = numpy.random.random((nao,nao))
+        dm = dm + dm.T
+        rho = dft.numint.eval_rho(mol, ao, dm, xctype='MGGA')
+        tau = numpy.einsum('xpi,ij,xpj->p', ao[1:4], dm, ao[1:4]) * .5
+        self.assertTrue(numpy.allclose(rho[5], tau))
+        e, c = numpy.linalg.eigh(dm)
+        rho2 = dft.numint.eval_rho2(mol, ao, c, e, xctype='MGGA')
+        self.assertTrue(numpy.allclose(rho, rho2))
+
+    def test_nr_rks_mgga(self):
+        x_id, c_id = dft.vxc.parse_xc_name('TPSS,TPSS')
+        dm = mf.get_init_guess(key='minao')
+        ni = dft.numint._NumInt()
+        res0 = dft.numint.nr_rks_vxc(ni, mol, mf.grids, x_id, c_id, dm)
+        res1 = ni.nr_rks(mol, mf.grids, x_id, c_id, dm)
+        self.assertAlmostEqual(res0[0], res1[0], 9)
+        self.assertAlmostEqual(res0[1], res1[1], 9)
+        self.assertTrue(numpy.allclose(res0[2], res1[2]))
+        res2 = ni.nr_uks(mol, mf.grids, x_id, c_id, dm)
+        self.assertAlmostEqual(res2[1], res1[1], 9)
+        self.assertTrue(numpy.allclose(res2[2][0], res1[2]))
+
+    def test_ao_cache(self):
+        x_id, c_id = dft.vxc.parse_xc_name('b88,p86')
+        dm = mf.get_init_guess(key='minao')
+        ni = dft.numint._NumInt()
+        res0 = ni.nr_rks(mol, mf.grids, x_id, c_id, dm)
+        ni.max_ao_cache = 2
+        res1 = ni.nr_rks(mol, mf.grids, x_id, c_id, dm)
+        self.assertTrue(0 < ni._ao_cache['size'] <= 2e6)
+        res2 = ni.nr_rks(mol, mf.grids, x_id, c_id, dm)
+        self.assertAlmostEqual(res1[1], res0[1], 9)
+        self.assertAlmostEqual(res2[1], res0[1], 9)
+        self.assertTrue(numpy.allclose(res2[2], res0[2]))
+
 if __name__ == "__main__":
     print("Test numint")
     unittest.main()
@@ -11,6 +11,8 @@
 #              MO integrals
 # direct_uhf   arbitary number of alpha and beta electrons, based on UHF
 #              MO integrals
+# selected_ci  selected CI (heat-bath selection) in the space of the selected
+#              alpha and beta strings
 #
 
 from pyscf.fci import cistring
@@ -27,6 +29,7 @@ from pyscf.fci.rdm import reorder_rdm
 from pyscf.fci.spin_op import spin_square
 from pyscf.fci.direct_spin1 import make_pspace_precond, make_diag_precond
 from pyscf.fci import direct_nosym
+from pyscf.fci import selected_ci
 
 def solver(mol, singlet=True):
     if mol.symmetry:
@@ -206,8 +206,8 @@ def symmetrize_wfn(ci, norb, nelec, orbsym, wfnsym=0):
         neleca = nelec - nelecb
     else:
         neleca, nelecb = nelec
-    strsa = numpy.asarray(cistring.gen_strings4orblist(range(norb), neleca))
-    strsb = numpy.asarray(cistring.gen_strings4orblist(range(norb), nelecb))
+    strsa = cistring.make_strings(range(norb), neleca)
+    strsb = cistring.make_strings(range(norb), nelecb)
     airreps = numpy.zeros(strsa.size, dtype=numpy.int32)
     birreps = numpy.zeros(strsb.size, dtype=numpy.int32)
     for i in range(norb):
@@ -5,6 +5,7 @@
 
 import ctypes
 import math
+import collections
 import numpy
 import pyscf.lib
 
@@ -26,26 +27,31 @@ def gen_strings4orblist(orb_list, nelec):
     >>> [bin(x) for x in gen_strings4orblist((3,1,0,2),2)]
     [0b1010, 0b1001, 0b11, 0b1100, 0b110, 0b101]
     '''
+    return make_strings(orb_list, nelec).tolist()
+
+def make_strings(orb_list, nelec):
+    '''Same to :func:`gen_strings4orblist`, but the strings are returned in
+    an int64 numpy array.
+    '''
+    orb_list = list(orb_list)
     assert(nelec >= 0)
-    if nelec == 0:
-        return [0]
-    def gen_str_iter(orb_list, nelec):
-        if nelec == 1:
-            res = [(1<<i) for i in orb_list]
-            res.reverse()
-        elif nelec >= len(orb_list):
-            n = 0
-            for i in orb_list:
-                n = n | (1<<i)
-            res = [n]
-        else:
-            restorb = orb_list[1:]
-            res = gen_str_iter(restorb, nelec)
-            for n in gen_str_iter(restorb, nelec-1):
-                res.append(n | (1<<orb_list[0]))
-        return res
-    strings = gen_str_iter(orb_list[::-1], nelec)
-    assert(strings.__len__() == num_strings(len(orb_list),nelec))
+    assert(nelec <= len(orb_list))
+    assert(max(orb_list+[0]) < 63)
+# strs[k] are the strings of k electrons in the orbitals which have been
+# scanned.  Adding orbital i to the orbital list, the strings of k electrons
+# are the old strings of k electrons followed by the old strings of k-1
+# electrons plus the occupied orbital i.
+    strs = [numpy.zeros(1, dtype=numpy.int64)]
+    for i in orb_list:
+        bit = numpy.int64(1) << i
+        new = [strs[0]]
+        for k in range(1, min(len(strs), nelec+1)):
+            new.append(numpy.hstack((strs[k], strs[k-1] | bit)))
+        if len(strs) <= nelec:
+            new.append(strs[-1] | bit)
+        strs = new
+    strings = strs[nelec]
+    assert(strings.size == num_strings(len(orb_list),nelec))
     return strings
 
 def num_strings(n, m):
@@ -87,19 +93,27 @@ def gen_linkstr_index(orb_list, nocc, strs=None):
     excitations, which do not change the string. The next nocc*nvir rows
     [a(:vir),i(:occ),str1,sign] are occupied-virtual exciations, starting from
     str0, annihilating i, creating a, to get str1.
+
+    The table of orb_list = range(norb) is taken from the cached
+    :class:`StringSpace` and it is read-only.
     '''
+    if strs is None and _is_range(orb_list):
+        return string_space(len(orb_list), nocc).link_index()
+    return _gen_linkstr_index(orb_list, nocc, strs, 0)
+
+def _gen_linkstr_index(orb_list, nocc, strs=None, tril=0):
     if strs is None:
-        strs = gen_strings4orblist(orb_list, nocc)
-    strs = numpy.array(strs, dtype=numpy.int64)
+        strs = make_strings(orb_list, nocc)
+    strs = numpy.asarray(strs, dtype=numpy.int64)
     norb = len(orb_list)
     nvir = norb - nocc
-    na = num_strings(norb, nocc)
+    na = strs.shape[0]
     link_index = numpy.empty((na,nocc*nvir+nocc,4), dtype=numpy.int32)
     libfci.FCIlinkstr_index(link_index.ctypes.data_as(ctypes.c_void_p),
                             ctypes.c_int(norb), ctypes.c_int(na),
                             ctypes.c_int(nocc),
                             strs.ctypes.data_as(ctypes.c_void_p),
-                            ctypes.c_int(0))
+                            ctypes.c_int(tril))
     return link_index
 
 def reform_linkstr_index(link_index):
@@ -122,19 +136,9 @@ def gen_linkstr_index_trilidx(orb_list, nocc, strs=None):
     So the resultant link_index has the structure ``[pq, *, str1, sign]``.
     It is identical to a call to ``reform_linkstr_index(gen_linkstr_index(...))``.
     '''
-    if strs is None:
-        strs = gen_strings4orblist(orb_list, nocc)
-    strs = numpy.array(strs, dtype=numpy.int64)
-    norb = len(orb_list)
-    nvir = norb - nocc
-    na = strs.shape[0]
-    link_index = numpy.empty((na,nocc*nvir+nocc,4), dtype=numpy.int32)
-    libfci.FCIlinkstr_index(link_index.ctypes.data_as(ctypes.c_void_p),
-                            ctypes.c_int(norb), ctypes.c_int(na),
-                            ctypes.c_int(nocc),
-                            strs.ctypes.data_as(ctypes.c_void_p),
-                            ctypes.c_int(1))
-    return link_index
+    if strs is None and _is_range(orb_list):
+        return string_space(len(orb_list), nocc).link_index(tril=True)
+    return _gen_linkstr_index(orb_list, nocc, strs, 1)
 
 # return [cre, des, target_address, parity]
 def gen_cre_str_index_o0(orb_list, nelec):
@@ -155,8 +159,7 @@ def gen_cre_str_index_o0(orb_list, nelec):
 def gen_cre_str_index_o1(orb_list, nelec):
     norb = len(orb_list)
     assert(nelec < norb)
-    strs = gen_strings4orblist(orb_list, nelec)
-    strs = numpy.array(strs, dtype=numpy.int64)
+    strs = make_strings(orb_list, nelec)
     na = strs.shape[0]
     link_index = numpy.empty((len(strs),norb-nelec,4), dtype=numpy.int32)
     libfci.FCIcre_str_index(link_index.ctypes.data_as(ctypes.c_void_p),
@@ -172,6 +175,8 @@ def gen_cre_str_index(orb_list, nelec):
     For given string str0, index[str0] is nvir x 4 array.  Each entry
     [i(cre),--,str1,sign] means starting from str0, creating i, to get str1.
     '''
+    if _is_range(orb_list):
+        return string_space(len(orb_list), nelec).cre_str_index()
     return gen_cre_str_index_o1(orb_list, nelec)
 
 # return [cre, des, target_address, parity]
@@ -192,8 +197,7 @@ def gen_des_str_index_o0(orb_list, nelec):
     return numpy.array(t, dtype=numpy.int32)
 def gen_des_str_index_o1(orb_list, nelec):
     assert(nelec > 0)
-    strs = gen_strings4orblist(orb_list, nelec)
-    strs = numpy.array(strs, dtype=numpy.int64)
+    strs = make_strings(orb_list, nelec)
     norb = len(orb_list)
     na = strs.shape[0]
     link_index = numpy.empty((len(strs),nelec,4), dtype=numpy.int32)
@@ -210,6 +214,8 @@ def gen_des_str_index(orb_list, nelec):
     For given string str0, index[str0] is nvir x 4 array.  Each entry
     [--,i(des),str1,sign] means starting from str0, annihilating i, to get str1.
     '''
+    if _is_range(orb_list):
+        return string_space(len(orb_list), nelec).des_str_index()
     return gen_des_str_index_o1(orb_list, nelec)
 
 
@@ -255,8 +261,26 @@ def addr2str_o1(norb, nelec, addr):
             nelec_left -= 1
     return str1
 def addr2str(norb, nelec, addr):
-    '''Convert CI determinant address to string'''
-    return addr2str_o1(norb, nelec, addr)
+    '''Convert CI determinant address to string.  For a list or an array
+    of addresses, the strings are returned in an int64 array.
+    '''
+    if numpy.ndim(addr) == 0:
+        return addr2str_o1(norb, nelec, addr)
+    addr = numpy.array(addr, dtype=numpy.int64)
+    assert(addr.size == 0 or addr.max() < num_strings(norb, nelec))
+    binom = _binom_table(norb, nelec)
+    strs = numpy.zeros_like(addr)
+    nelec_left = numpy.empty_like(addr)
+    nelec_left[:] = nelec
+# see addr2str_o1.  binom[i,k] = 0 for i < k, so the lowest nelec_left bits
+# are set when addr becomes 0
+    for i in reversed(range(norb)):
+        addrcum = binom[i,nelec_left]
+        occ = (nelec_left > 0) & (addr >= addrcum)
+        strs[occ] |= numpy.int64(1) << i
+        addr[occ] -= addrcum[occ]
+        nelec_left[occ] -= 1
+    return strs
 
 #def str2addr_o0(norb, nelec, string):
 #    if norb <= nelec or nelec == 0:
@@ -278,7 +302,21 @@ def addr2str(norb, nelec, addr):
 #            nelec_left -= 1
 #    return addr
 def str2addr(norb, nelec, string):
-    '''Convert the string to the CI determinant address'''
+    '''Convert the string to the CI determinant address.  For a list or an
+    array of strings, the addresses are returned in an int64 array.
+    '''
+    if numpy.ndim(string) > 0:
+        strs = numpy.asarray(string, dtype=numpy.int64)
+        binom = _binom_table(norb, nelec)
+        addr = numpy.zeros(strs.shape, dtype=numpy.int64)
+        nelec_left = numpy.empty_like(addr)
+        nelec_left[:] = nelec
+        for i in reversed(range(norb)):
+            occ = (strs >> i) & 1 > 0
+            addr[occ] += binom[i,nelec_left[occ]]
+            nelec_left[occ] -= 1
+        assert(numpy.all(nelec_left == 0))
+        return addr
     if isinstance(string, str):
         assert(string.count('1') == nelec)
         string = int(string, 2)
@@ -288,6 +326,124 @@ def str2addr(norb, nelec, string):
     return libfci.FCIstr2addr(ctypes.c_int(norb), ctypes.c_int(nelec),
                               ctypes.c_ulong(string))
 
+def _binom_table(norb, nelec):
+    '''binom[i,k] = num_strings(i, k) for k <= i, 0 for k > i'''
+    binom = numpy.zeros((norb+1,nelec+1), dtype=numpy.int64)
+    for i in range(norb+1):
+        for k in range(min(i,nelec)+1):
+            binom[i,k] = num_strings(i, k)
+    return binom
+
+def _is_range(orb_list):
+    orb_list = list(orb_list)
+    return orb_list == list(range(len(orb_list)))
+
+def gen_occslst(orb_list, nelec):
+    '''The occupied orbitals of the strings, int32 array of shape
+    (nstrs, nelec)'''
+    if _is_range(orb_list):
+        return string_space(len(orb_list), nelec).occslst()
+    strs = make_strings(orb_list, nelec)
+    return _strs2occslst(strs, orb_list, nelec)
+
+def _strs2occslst(strs, orb_list, nelec):
+    orb_list = numpy.asarray(orb_list, dtype=numpy.int64)
+    occ = (strs[:,None] >> orb_list) & 1 > 0
+    return numpy.asarray(numpy.where(occ)[1].reshape(len(strs),nelec),
+                         dtype=numpy.int32)
+
+
+class StringSpace(object):
+    '''The strings of nelec electrons in norb orbitals and the look-up
+    tables between them.  The tables are generated when they are first
+    requested and kept by the object.  They are shared by all callers thus
+    read-only.  Use :func:`string_space` to get the object from the cache.
+    '''
+    def __init__(self, norb, nelec):
+        self.norb = norb
+        self.nelec = nelec
+        self.nstrs = num_strings(norb, nelec)
+        self._tables = {}
+
+    def _get(self, key, make):
+        if key not in self._tables:
+            tab = make()
+            tab.flags.writeable = False
+            self._tables[key] = tab
+        return self._tables[key]
+
+    def strs(self):
+        '''The strings in int64 array'''
+        return self._get('strs', lambda: make_strings(range(self.norb),
+                                                      self.nelec))
+
+    def occslst(self):
+        '''The occupied orbitals of each string, (nstrs,nelec) int32 array'''
+        return self._get('occslst', lambda:
+                         _strs2occslst(self.strs(), range(self.norb), self.nelec))
+
+    def link_index(self, tril=False):
+        '''See :func:`gen_linkstr_index` and :func:`gen_linkstr_index_trilidx`'''
+        return self._get(('link', bool(tril)), lambda:
+                         _gen_linkstr_index(range(self.norb), self.nelec,
+                                            self.strs(), int(tril)))
+
+    def cre_str_index(self):
+        '''See :func:`gen_cre_str_index`'''
+        return self._get('cre', lambda:
+                         gen_cre_str_index_o1(range(self.norb), self.nelec))
+
+    def des_str_index(self):
+        '''See :func:`gen_des_str_index`'''
+        return self._get('des', lambda:
+                         gen_des_str_index_o1(range(self.norb), self.nelec))
+
+    def nbytes(self):
+        '''Memory (in bytes) of the tables generated so far'''
+        return sum([tab.nbytes for tab in self._tables.values()])
+
+    def addr2str(self, addr):
+        '''Strings of the given addresses'''
+        return self.strs()[addr]
+
+    def str2addr(self, strs):
+        '''Addresses of the given strings'''
+        return str2addr(self.norb, self.nelec, strs)
+
+# Least recently used StringSpace objects.  The FCI solvers, the density
+# matrices and the CASSCF macro iterations request the same tables many
+# times.  The strings of (norb,nelec+1) and (norb,nelec-1) are used by the
+# spin operators, so a few more than the alpha and beta spaces are kept.
+# The least recently used spaces are also dropped when the tables of the
+# cache exceed STRING_SPACE_CACHE_MAX_MEMORY (MB).
+STRING_SPACE_CACHE_SIZE = 12
+STRING_SPACE_CACHE_MAX_MEMORY = 1000
+_string_space_cache = collections.OrderedDict()
+def string_space(norb, nelec):
+    '''The cached :class:`StringSpace` of nelec electrons in norb orbitals.
+    string_space.cache_clear() releases all cached tables.
+    '''
+    key = (norb, nelec)
+    if key in _string_space_cache:
+        space = _string_space_cache.pop(key)
+    else:
+        space = StringSpace(norb, nelec)
+    _string_space_cache[key] = space
+    while len(_string_space_cache) > STRING_SPACE_CACHE_SIZE:
+        _string_space_cache.popitem(last=False)
+# The tables are generated after this call returns, the memory bound is
+# applied to the tables of the previous calls.  The requested space is kept.
+    nbytes = sum([x.nbytes() for x in _string_space_cache.values()])
+    while (nbytes > STRING_SPACE_CACHE_MAX_MEMORY*1e6 and
+           len(_string_space_cache) > 1):
+        nbytes -= _string_space_cache.popitem(last=False)[1].nbytes()
+    return space
+
+def _string_space_cache_clear():
+    _string_space_cache.clear()
+string_space.cache_clear = _string_space_cache_clear
+
+
 if __name__ == '__main__':
     #print(gen_strings4orblist(range(4), 2))
     #print(gen_linkstr_index(range(6), 3))
@@ -88,9 +88,8 @@ def make_hdiag(h1e, eri, norb, nelec):
         assert(neleca == nelecb)
     h1e = numpy.ascontiguousarray(h1e)
     eri = pyscf.ao2mo.restore(1, eri, norb)
-    link_index = cistring.gen_linkstr_index(range(norb), neleca)
-    na = link_index.shape[0]
-    occslist = numpy.asarray(link_index[:,:neleca,0], order='C')
+    occslist = cistring.gen_occslst(range(norb), neleca)
+    na = occslist.shape[0]
     hdiag = numpy.empty((na,na))
     jdiag = numpy.asarray(numpy.einsum('iijj->ij',eri), order='C')
     kdiag = numpy.asarray(numpy.einsum('ijji->ij',eri), order='C')
@@ -118,10 +117,10 @@ def pspace(h1e, eri, norb, nelec, hdiag, np=400):
 # symmetrize addra/addrb
     addra = addr // na
     addrb = addr % na
-    stra = numpy.array([cistring.addr2str(norb,neleca,ia) for ia in addra],
-                       dtype=numpy.long)
-    strb = numpy.array([cistring.addr2str(norb,neleca,ib) for ib in addrb],
-                       dtype=numpy.long)
+    stra = numpy.asarray(cistring.addr2str(norb, neleca, addra),
+                         dtype=numpy.long)
+    strb = numpy.asarray(cistring.addr2str(norb, neleca, addrb),
+                         dtype=numpy.long)
     np = len(addr)
     h0 = numpy.zeros((np,np))
     libfci.FCIpspace_h0tril(h0.ctypes.data_as(ctypes.c_void_p),
@@ -117,6 +117,60 @@ def contract_2e(eri, fcivec, norb, nelec, link_index=None):
                                 link_indexb.ctypes.data_as(ctypes.c_void_p))
     return ci1
 
+def contract_2e_multi(eri, fcivecs, norb, nelec, link_index=None,
+                      max_memory=2000):
+    '''Contract the 2-electron Hamiltonian with a list of FCI vectors.  The
+    vectors are contracted in batches whose size is determined by max_memory.
+    The vectors of a batch share the decoding of the link tables and the
+    dgemm calls, but the number of operations and the memory traffic per
+    vector are the same as :func:`contract_2e`.  The saving is modest (about
+    10% of the time of contracting the vectors one by one).
+
+    Returns:
+        A list of FCI vectors
+    '''
+    eri = pyscf.ao2mo.restore(4, eri, norb)
+    if link_index is None:
+        if isinstance(nelec, (int, numpy.integer)):
+            nelecb = nelec//2
+            neleca = nelec - nelecb
+        else:
+            neleca, nelecb = nelec
+        link_indexa = cistring.gen_linkstr_index_trilidx(range(norb), neleca)
+        link_indexb = cistring.gen_linkstr_index_trilidx(range(norb), nelecb)
+    else:
+        link_indexa, link_indexb = link_index
+
+    na, nlinka = link_indexa.shape[:2]
+    nb, nlinkb = link_indexb.shape[:2]
+    nnorb = norb * (norb+1) // 2
+# The C buffer is about BUFBASE(320)*strb_buflen(112)*nnorb for any number of
+# vectors, see FCIcontract_2e_spin1_multi.  The input and output vectors of a
+# batch are interleaved in the arrays [na,nb,nvec]
+    bufsize = min(320,na) * min(112,nb) * nnorb
+    mem_avail = max_memory - pyscf.lib.current_memory()[0]
+    blksize = max(1, int((mem_avail*1e6/8-bufsize)/(na*nb*2)))
+
+    ci1s = []
+    for p0, p1 in pyscf.lib.prange(0, len(fcivecs), blksize):
+        nvec = p1 - p0
+        ci0 = numpy.empty((na,nb,nvec))
+        for k in range(nvec):
+            ci0[:,:,k] = fcivecs[p0+k].reshape(na,nb)
+        ci1 = numpy.empty_like(ci0)
+        libfci.FCIcontract_2e_spin1_multi(eri.ctypes.data_as(ctypes.c_void_p),
+                                          ci0.ctypes.data_as(ctypes.c_void_p),
+                                          ci1.ctypes.data_as(ctypes.c_void_p),
+                                          ctypes.c_int(nvec), ctypes.c_int(norb),
+                                          ctypes.c_int(na), ctypes.c_int(nb),
+                                          ctypes.c_int(nlinka), ctypes.c_int(nlinkb),
+                                          link_indexa.ctypes.data_as(ctypes.c_void_p),
+                                          link_indexb.ctypes.data_as(ctypes.c_void_p))
+        ci0 = None
+        ci1s.extend([numpy.array(ci1[:,:,k]) for k in range(nvec)])
+        ci1 = None
+    return ci1s
+
 def make_hdiag(h1e, eri, norb, nelec):
     '''Diagonal Hamiltonian for Davidson preconditioner
     '''
@@ -127,13 +181,10 @@ def make_hdiag(h1e, eri, norb, nelec):
         neleca, nelecb = nelec
     h1e = numpy.ascontiguousarray(h1e)
     eri = pyscf.ao2mo.restore(1, eri, norb)
-    link_indexa = cistring.gen_linkstr_index(range(norb), neleca)
-    link_indexb = cistring.gen_linkstr_index(range(norb), nelecb)
-    na = link_indexa.shape[0]
-    nb = link_indexb.shape[0]
-
-    occslista = numpy.asarray(link_indexa[:,:neleca,0], order='C')
-    occslistb = numpy.asarray(link_indexb[:,:nelecb,0], order='C')
+    occslista = cistring.gen_occslst(range(norb), neleca)
+    occslistb = cistring.gen_occslst(range(norb), nelecb)
+    na = occslista.shape[0]
+    nb = occslistb.shape[0]
     hdiag = numpy.empty(na*nb)
     jdiag = numpy.asarray(numpy.einsum('iijj->ij',eri), order='C')
     kdiag = numpy.asarray(numpy.einsum('ijji->ij',eri), order='C')
@@ -180,10 +231,10 @@ def pspace(h1e, eri, norb, nelec, hdiag, np=400):
     addr = numpy.argsort(hdiag)[:np]
     addra = addr // nb
     addrb = addr % nb
-    stra = numpy.array([cistring.addr2str(norb,neleca,ia) for ia in addra],
-                       dtype=numpy.uint64)
-    strb = numpy.array([cistring.addr2str(norb,nelecb,ib) for ib in addrb],
-                       dtype=numpy.uint64)
+    stra = numpy.asarray(cistring.addr2str(norb, neleca, addra),
+                         dtype=numpy.uint64)
+    strb = numpy.asarray(cistring.addr2str(norb, nelecb, addrb),
+                         dtype=numpy.uint64)
     np = len(addr)
     h0 = numpy.zeros((np,np))
     libfci.FCIpspace_h0tril(h0.ctypes.data_as(ctypes.c_void_p),
@@ -411,10 +462,13 @@ def kernel_ms1(fci, h1e, eri, norb, nelec, ci0=None, link_index=None,
 
     precond = fci.make_precond(hdiag, pw, pv, addr)
 
+    if max_memory is None: max_memory = fci.max_memory
     h2e = fci.absorb_h1e(h1e, eri, norb, nelec, .5)
-    def hop(c):
-        hc = fci.contract_2e(h2e, c, norb, nelec, (link_indexa,link_indexb))
-        return hc.ravel()
+    def hop(cs):
+        hcs = fci.contract_2e_multi(h2e, cs, norb, nelec,
+                                    (link_indexa,link_indexb),
+                                    max_memory=max_memory)
+        return [hc.ravel() for hc in hcs]
 
     if ci0 is None:
         if hasattr(fci, 'get_init_guess'):
@@ -435,12 +489,12 @@ def kernel_ms1(fci, h1e, eri, norb, nelec, ci0=None, link_index=None,
     if lindep is None: lindep = fci.lindep
     if max_cycle is None: max_cycle = fci.max_cycle
     if max_space is None: max_space = fci.max_space
-    if max_memory is None: max_memory = fci.max_memory
     if verbose is None: verbose = pyscf.lib.logger.Logger(fci.stdout, fci.verbose)
     #e, c = pyscf.lib.davidson(hop, ci0, precond, tol=fci.conv_tol, lindep=fci.lindep)
-    e, c = fci.eig(hop, ci0, precond, tol=tol, lindep=lindep,
-                   max_cycle=max_cycle, max_space=max_space, nroots=nroots,
-                   max_memory=max_memory, verbose=verbose, **kwargs)
+    e, c = fci.eig_multi(hop, ci0, precond, tol=tol, lindep=lindep,
+                         max_cycle=max_cycle, max_space=max_space,
+                         nroots=nroots, max_memory=max_memory,
+                         verbose=verbose, **kwargs)
     if nroots > 1:
         return e, [ci.reshape(na,nb) for ci in c]
     else:
@@ -475,6 +529,16 @@ def make_diag_precond(hdiag, pspaceig, pspaceci, addr, level_shift=0):
         return x/hdiagd
     return precond
 
+def _method_overwritten(obj, name, cls=None):
+    '''Whether the method of FCISolver (or the given class cls) is replaced in
+    the subclass or by the instance attribute'''
+    if cls is None:
+        cls = FCISolver
+    fn = getattr(obj, name)
+    fn = getattr(fn, '__func__', fn)
+    fn0 = getattr(cls, name)
+    return fn is not getattr(fn0, '__func__', fn0)
+
 
 class FCISolver(object):
     def __init__(self, mol=None):
@@ -532,6 +596,21 @@ class FCISolver(object):
     def contract_2e(self, eri, fcivec, norb, nelec, link_index=None, **kwargs):
         return contract_2e(eri, fcivec, norb, nelec, link_index, **kwargs)
 
+    def contract_2e_multi(self, eri, fcivecs, norb, nelec, link_index=None,
+                          **kwargs):
+        '''Contract the 2e Hamiltonian with a list of FCI vectors.  The
+        solvers which overwrite contract_2e contract the vectors one by one.
+        '''
+        if _method_overwritten(self, 'contract_2e'):
+            kwargs.pop('max_memory', None)
+            return [self.contract_2e(eri, c, norb, nelec, link_index, **kwargs)
+                    for c in fcivecs]
+        else:
+            if 'max_memory' not in kwargs:
+                kwargs['max_memory'] = self.max_memory
+            return contract_2e_multi(eri, fcivecs, norb, nelec, link_index,
+                                     **kwargs)
+
     def eig(self, op, x0, precond, **kwargs):
         if kwargs['nroots'] == 1 and x0[0].size > 6.5e7: # 500MB
             lessio = True
@@ -539,6 +618,19 @@ class FCISolver(object):
             lessio = False
         return pyscf.lib.davidson(op, x0, precond, lessio=lessio, **kwargs)
 
+    def eig_multi(self, op, x0, precond, **kwargs):
+        '''Davidson diagonalization in which op computes H|c> for the list
+        of trial vectors of one iteration, see pyscf.lib.davidson1.  The
+        solvers which overwrite eig are called with one vector at a time.
+        '''
+        if _method_overwritten(self, 'eig'):
+            return self.eig(lambda x: op([x])[0], x0, precond, **kwargs)
+        if kwargs['nroots'] == 1 and x0[0].size > 6.5e7: # 500MB
+            lessio = True
+        else:
+            lessio = False
+        return pyscf.lib.davidson1(op, x0, precond, lessio=lessio, **kwargs)
+
     def make_precond(self, hdiag, pspaceig, pspaceci, addr):
         if pspaceig is None:
             return make_diag_precond(hdiag, pspaceig, pspaceci, addr,
@@ -16,6 +16,8 @@
 import sys
 import ctypes
 import numpy
+import scipy.sparse
+import scipy.linalg
 import pyscf.lib
 import pyscf.gto
 import pyscf.ao2mo
@@ -24,6 +26,7 @@ from pyscf import symm
 from pyscf.fci import cistring
 from pyscf.fci import direct_spin1
 from pyscf.fci import addons
+from pyscf.fci import rdm
 
 libfci = pyscf.lib.load_library('libfci')
 
@@ -62,6 +65,8 @@ def contract_1e(f1e, fcivec, norb, nelec, link_index=None, orbsym=[]):
 #       eri_{pq,rs} = (pq|rs) - (.5/Nelec) [\sum_q (pq|qs) + \sum_p (pq|rp)]
 # Please refer to the treatment in direct_spin1.absorb_h1e
 def contract_2e(eri, fcivec, norb, nelec, link_index=None, orbsym=[]):
+    if getattr(fcivec, '_irrep_blocks', None) is not None:
+        return contract_2e_blocked(eri, fcivec, norb, nelec)
     assert(fcivec.flags.c_contiguous)
     if not list(orbsym):
         return direct_spin1.contract_2e(eri, fcivec, norb, nelec, link_index)
@@ -99,6 +104,471 @@ def contract_2e(eri, fcivec, norb, nelec, link_index=None, orbsym=[]):
     return ci1
 
 
+# Irrep-blocked CI vector.  The alpha strings and the beta strings are grouped
+# by irreps.  Only the blocks C[Ia,Ib] of irrep(Ia) ^ irrep(Ib) == wfnsym are
+# stored, one block for each alpha irrep.  For D2h, it is ~1/8 of the (na,nb)
+# FCI vector.
+#
+# In the sigma build and the 2-pdm, the intermediate
+#       t1[pq,Ia,Ib] = \sum_J <Ia,Ib|E_pq|J> c_J
+# is non-zero only if irrep(pq) == irrep(Ia) ^ irrep(Ib) ^ wfnsym, so the
+# contraction t2 = (pq|rs) t1 of each (alpha-irrep, beta-irrep) pair needs
+# one irrep block of (pq|rs) only.  The string excitations E_pq|J> = sign|I>
+# are stored as sparse matrices, which are grouped by the irreps of I and pq.
+class SymmCIvector(numpy.ndarray):
+    '''1D array of the irrep-blocked CI coefficients.  _irrep_blocks is the
+    IrrepBlocks object which defines the layout of the blocks.
+    '''
+    def __array_finalize__(self, obj):
+        self._irrep_blocks = getattr(obj, '_irrep_blocks', None)
+
+def _as_SymmCIvector(civec, irrep_blocks):
+    civec = numpy.asarray(civec).ravel().view(SymmCIvector)
+    civec._irrep_blocks = irrep_blocks
+    return civec
+
+def _unpack_nelec(nelec):
+    if isinstance(nelec, (int, numpy.integer)):
+        nelecb = nelec//2
+        neleca = nelec - nelecb
+    else:
+        neleca, nelecb = nelec
+    return neleca, nelecb
+
+def _gen_strs_irrep(strs, orbsym):
+    irreps = numpy.zeros(len(strs), dtype=numpy.int32)
+    for i, ir in enumerate(orbsym):
+        irreps[numpy.bitwise_and(strs, 1<<i) > 0] ^= ir
+    return irreps
+
+def _link_matrices(pq, addr, sign, irreps, pqidx, nirrep):
+    '''mats[k][g] = (M, M.T) where M is the sparse matrix of shape
+    (npair_g*nstr_k, nstr_{k^g}) which maps J to (pq,I) for
+    E_pq|I> = sign|J>, I of irrep k and pq of irrep g.
+    '''
+    idx = [numpy.where(irreps == k)[0] for k in range(nirrep)]
+    loc = numpy.empty(len(irreps), dtype=numpy.int32)
+    for k in range(nirrep):
+        loc[idx[k]] = numpy.arange(len(idx[k]))
+    npair = sum([len(x) for x in pqidx])
+    pqirrep = numpy.empty(npair, dtype=numpy.int32)
+    pqloc = numpy.empty(npair, dtype=numpy.int32)
+    for g in range(nirrep):
+        pqirrep[pqidx[g]] = g
+        pqloc[pqidx[g]] = numpy.arange(len(pqidx[g]))
+
+    nlink = pq.shape[1]
+    mats = []
+    for k in range(nirrep):
+        nstr = len(idx[k])
+        pqk = pq[idx[k]].ravel()
+        row = pqloc[pqk] * nstr + numpy.repeat(numpy.arange(nstr), nlink)
+        col = loc[addr[idx[k]].ravel()]
+        val = numpy.asarray(sign[idx[k]].ravel(), dtype=numpy.double)
+        gk = pqirrep[pqk]
+        matk = []
+        for g in range(nirrep):
+            mask = gk == g
+            mat = scipy.sparse.csr_matrix((val[mask], (row[mask], col[mask])),
+                                          shape=(len(pqidx[g])*nstr,
+                                                 len(idx[k^g])))
+            matk.append((mat, mat.T.tocsr()))
+        mats.append(matk)
+    return mats
+
+class IrrepBlocks(object):
+    '''The layout of the irrep-blocked CI vector.
+
+    Attributes:
+        airreps, birreps : 1D int arrays
+            Irreps of alpha strings and beta strings.
+        aidx, bidx : list of 1D int arrays
+            aidx[k] are the addresses of the alpha strings of irrep k.
+        shapes : list of tuples
+            The shape of kth block, for the alpha strings of irrep k and the
+            beta strings of irrep k^wfnsym.
+        offsets : 1D int array
+            The offsets of the blocks in the blocked CI vector.
+        size : int
+            Total size of the blocked CI vector.
+    '''
+    def __init__(self, norb, nelec, orbsym, wfnsym=0):
+        neleca, nelecb = _unpack_nelec(nelec)
+# map irrep IDs of Dooh or Coov to D2h, C2v
+        orbsym = numpy.asarray(orbsym) % 10
+        wfnsym = wfnsym % 10
+        self.norb = norb
+        self.nelec = (neleca, nelecb)
+        self.orbsym = orbsym
+        self.wfnsym = wfnsym
+        self.nirrep = 1
+        while self.nirrep <= max(orbsym.max(), wfnsym):
+            self.nirrep *= 2
+
+        strsa = cistring.make_strings(range(norb), neleca)
+        self.airreps = _gen_strs_irrep(strsa, orbsym)
+        if neleca == nelecb:
+            self.birreps = self.airreps
+        else:
+            strsb = cistring.make_strings(range(norb), nelecb)
+            self.birreps = _gen_strs_irrep(strsb, orbsym)
+        self.aidx = [numpy.where(self.airreps == k)[0]
+                     for k in range(self.nirrep)]
+        self.bidx = [numpy.where(self.birreps == k)[0]
+                     for k in range(self.nirrep)]
+        self.shapes = [(len(self.aidx[k]), len(self.bidx[k^wfnsym]))
+                       for k in range(self.nirrep)]
+        self.offsets = numpy.cumsum([0] + [na*nb for na,nb in self.shapes])
+        self.size = self.offsets[-1]
+        self._link = {}
+
+    def pack(self, fcivec):
+        '''Extract the irrep-blocked CI vector from the (na,nb) FCI vector'''
+        na = len(self.airreps)
+        nb = len(self.birreps)
+        fcivec = numpy.asarray(fcivec).reshape(na,nb)
+        civec = numpy.empty(self.size)
+        for k, c in enumerate(self.split(civec)):
+            if c.size > 0:
+                c[:] = fcivec[self.aidx[k]][:,self.bidx[k^self.wfnsym]]
+        return _as_SymmCIvector(civec, self)
+
+    def unpack(self, civec):
+        '''Scatter the irrep-blocked CI vector to the (na,nb) FCI vector'''
+        fcivec = numpy.zeros((len(self.airreps),len(self.birreps)))
+        for k, c in enumerate(self.split(civec)):
+            if c.size > 0:
+                fcivec[self.aidx[k][:,None],self.bidx[k^self.wfnsym]] = c
+        return fcivec
+
+    def address(self):
+        '''The addresses in the (na,nb) FCI vector of the elements of the
+        irrep-blocked CI vector'''
+        nb = len(self.birreps)
+        return numpy.hstack([(self.aidx[k][:,None]*nb +
+                              self.bidx[k^self.wfnsym]).ravel()
+                             for k in range(self.nirrep)])
+
+    def split(self, civec):
+        '''2D views of the blocks of the irrep-blocked CI vector'''
+        civec = numpy.asarray(civec).ravel()
+        return [civec[self.offsets[k]:self.offsets[k+1]].reshape(self.shapes[k])
+                for k in range(self.nirrep)]
+
+    def link_matrices(self, tril=True):
+        '''The pair-irreps of (pq| and the sparse matrices of the alpha and
+        beta string excitations, see :func:`_link_matrices`.  For tril=True,
+        p>=q pairs are used, to match the 4-fold symmetry of integrals.
+        '''
+        if tril not in self._link:
+            norb = self.norb
+            pairirrep = self.orbsym[:,None] ^ self.orbsym
+            if tril:
+                pairirrep = pairirrep[numpy.tril_indices(norb)]
+                gen_link = cistring.gen_linkstr_index_trilidx
+            else:
+                pairirrep = pairirrep.ravel()
+                gen_link = cistring.gen_linkstr_index
+            pqidx = [numpy.where(pairirrep == g)[0] for g in range(self.nirrep)]
+
+            def make_mats(nelec, irreps):
+                link_index = gen_link(range(norb), nelec)
+                if tril:
+                    pq = link_index[:,:,0]
+                else:
+                    pq = link_index[:,:,0] * norb + link_index[:,:,1]
+                return _link_matrices(pq, link_index[:,:,2], link_index[:,:,3],
+                                      irreps, pqidx, self.nirrep)
+            neleca, nelecb = self.nelec
+            linka = make_mats(neleca, self.airreps)
+            if neleca == nelecb:
+                linkb = linka
+            else:
+                linkb = make_mats(nelecb, self.birreps)
+            self._link[tril] = (pqidx, linka, linkb)
+        return self._link[tril]
+
+def _t1_blocks(ci0, irrep_blocks, ka, kb, link):
+    '''The alpha and beta parts of t1[pq,Ia,Ib] = <Ia,Ib|E_pq|c> for the
+    alpha strings of irrep ka and the beta strings of irrep kb.
+    '''
+    pqidx, linka, linkb = link
+    wfnsym = irrep_blocks.wfnsym
+    g = ka ^ kb ^ wfnsym
+    npair = len(pqidx[g])
+    na = len(irrep_blocks.aidx[ka])
+    nb = len(irrep_blocks.bidx[kb])
+    t1a = t1b = 0
+    if ci0[ka^g].size > 0:
+        t1a = linka[ka][g][0].dot(ci0[ka^g]).reshape(npair,na,nb)
+    if ci0[ka].size > 0:
+        t1b = linkb[kb][g][0].dot(ci0[ka].T).reshape(npair,nb,na)
+        t1b = t1b.transpose(0,2,1)
+    return t1a, t1b
+
+def contract_2e_blocked(eri, civec, norb, nelec, irrep_blocks=None):
+    '''Contract the 2e Hamiltonian (see :func:`contract_2e`) with the
+    irrep-blocked CI vector.
+
+    Returns:
+        SymmCIvector of the same layout as civec
+    '''
+    if irrep_blocks is None:
+        irrep_blocks = civec._irrep_blocks
+    eri = pyscf.ao2mo.restore(4, eri, norb)
+    link = irrep_blocks.link_matrices(True)
+    pqidx, linka, linkb = link
+    nirrep = irrep_blocks.nirrep
+    wfnsym = irrep_blocks.wfnsym
+    eri = [eri[numpy.ix_(idx,idx)] for idx in pqidx]
+
+    ci0 = irrep_blocks.split(civec)
+    ci1 = numpy.zeros(irrep_blocks.size)
+    ci1blk = irrep_blocks.split(ci1)
+    for ka in range(nirrep):
+        na = len(irrep_blocks.aidx[ka])
+        for kb in range(nirrep):
+            g = ka ^ kb ^ wfnsym
+            npair = len(pqidx[g])
+            nb = len(irrep_blocks.bidx[kb])
+            if npair*na*nb == 0:
+                continue
+            t1a, t1b = _t1_blocks(ci0, irrep_blocks, ka, kb, link)
+            t1 = numpy.asarray(t1a + t1b).reshape(npair,-1)
+            if not t1.any():
+                continue
+            t2 = pyscf.lib.dot(eri[g], t1)
+            if ci1blk[ka^g].size > 0:
+                ci1blk[ka^g] += linka[ka][g][1].dot(t2.reshape(npair*na,nb))
+            if ci1blk[ka].size > 0:
+                t2 = t2.reshape(npair,na,nb).transpose(0,2,1)
+                ci1blk[ka] += linkb[kb][g][1].dot(t2.reshape(npair*nb,na)).T
+    return _as_SymmCIvector(ci1, irrep_blocks)
+
+def make_rdm1s_blocked(civec, norb, nelec, irrep_blocks=None):
+    '''Spin searated 1-particle density matrices of the irrep-blocked CI
+    vector
+    '''
+    if irrep_blocks is None:
+        irrep_blocks = civec._irrep_blocks
+    link = irrep_blocks.link_matrices(False)
+    pqidx = link[0]
+    ci0 = irrep_blocks.split(civec)
+    rdm1a = numpy.zeros(norb*norb)
+    rdm1b = numpy.zeros(norb*norb)
+# <c|E_pq|c> has contributions from the blocks of pair-irrep 0
+    for ka, c in enumerate(ci0):
+        if c.size > 0:
+            t1a, t1b = _t1_blocks(ci0, irrep_blocks, ka, ka^irrep_blocks.wfnsym,
+                                  link)
+            rdm1a[pqidx[0]] += numpy.dot(numpy.reshape(t1a, (len(pqidx[0]),-1)),
+                                         c.ravel())
+            rdm1b[pqidx[0]] += numpy.dot(numpy.reshape(t1b, (len(pqidx[0]),-1)),
+                                         c.ravel())
+    return rdm1a.reshape(norb,norb).T, rdm1b.reshape(norb,norb).T
+
+def make_rdm1_blocked(civec, norb, nelec, irrep_blocks=None):
+    '''Spin-traced 1-particle density matrix of the irrep-blocked CI vector
+    '''
+    rdm1a, rdm1b = make_rdm1s_blocked(civec, norb, nelec, irrep_blocks)
+    return rdm1a + rdm1b
+
+def make_rdm12_blocked(civec, norb, nelec, irrep_blocks=None, reorder=True):
+    '''Spin-traced 1- and 2-particle density matrices of the irrep-blocked
+    CI vector.  The 2-pdm has the same convention as
+    :func:`direct_spin1.make_rdm12`
+    '''
+    if irrep_blocks is None:
+        irrep_blocks = civec._irrep_blocks
+    link = irrep_blocks.link_matrices(False)
+    pqidx = link[0]
+    nirrep = irrep_blocks.nirrep
+    wfnsym = irrep_blocks.wfnsym
+    ci0 = irrep_blocks.split(civec)
+    rdm1 = numpy.zeros(norb*norb)
+    rdm2 = numpy.zeros((norb*norb,norb*norb))
+    for ka in range(nirrep):
+        na = len(irrep_blocks.aidx[ka])
+        for kb in range(nirrep):
+            g = ka ^ kb ^ wfnsym
+            nb = len(irrep_blocks.bidx[kb])
+            if len(pqidx[g])*na*nb == 0:
+                continue
+            t1a, t1b = _t1_blocks(ci0, irrep_blocks, ka, kb, link)
+            t1 = numpy.asarray(t1a + t1b).reshape(len(pqidx[g]),-1)
+            if g == 0:
+                rdm1[pqidx[0]] += numpy.dot(t1, ci0[ka].ravel())
+            rdm2[numpy.ix_(pqidx[g],pqidx[g])] += pyscf.lib.dot(t1, t1.T)
+# t1[pq] = E_qp|c>, so rdm2[pq,sr] = <c|E_pq E_rs|c>
+    rdm1 = rdm1.reshape(norb,norb).T
+    rdm2 = rdm2.reshape([norb]*4).transpose(0,1,3,2)
+    rdm2 = numpy.asarray(rdm2, order='C')
+    if reorder:
+        rdm1, rdm2 = rdm.reorder_rdm(rdm1, rdm2, inplace=True)
+    return rdm1, rdm2
+
+def make_hdiag_blocked(h1e, eri, norb, nelec, irrep_blocks):
+    '''Diagonal Hamiltonian of the irrep-blocked CI vector, computed block by
+    block without the (na,nb) array of direct_spin1.make_hdiag'''
+    neleca, nelecb = irrep_blocks.nelec
+    h1e = numpy.ascontiguousarray(h1e)
+    eri = pyscf.ao2mo.restore(1, eri, norb)
+    occslista = cistring.gen_occslst(range(norb), neleca)
+    occslistb = cistring.gen_occslst(range(norb), nelecb)
+    jdiag = numpy.asarray(numpy.einsum('iijj->ij',eri), order='C')
+    kdiag = numpy.asarray(numpy.einsum('ijji->ij',eri), order='C')
+    hdiag = numpy.empty(irrep_blocks.size)
+    for k, h in enumerate(irrep_blocks.split(hdiag)):
+        if h.size == 0:
+            continue
+        occsa = numpy.asarray(occslista[irrep_blocks.aidx[k]], order='C')
+        occsb = numpy.asarray(occslistb[irrep_blocks.bidx[k^irrep_blocks.wfnsym]],
+                              order='C')
+        libfci.FCImake_hdiag_uhf(h.ctypes.data_as(ctypes.c_void_p),
+                                 h1e.ctypes.data_as(ctypes.c_void_p),
+                                 h1e.ctypes.data_as(ctypes.c_void_p),
+                                 jdiag.ctypes.data_as(ctypes.c_void_p),
+                                 jdiag.ctypes.data_as(ctypes.c_void_p),
+                                 jdiag.ctypes.data_as(ctypes.c_void_p),
+                                 kdiag.ctypes.data_as(ctypes.c_void_p),
+                                 kdiag.ctypes.data_as(ctypes.c_void_p),
+                                 ctypes.c_int(norb),
+                                 ctypes.c_int(h.shape[0]),
+                                 ctypes.c_int(h.shape[1]),
+                                 ctypes.c_int(neleca), ctypes.c_int(nelecb),
+                                 occsa.ctypes.data_as(ctypes.c_void_p),
+                                 occsb.ctypes.data_as(ctypes.c_void_p))
+    return _as_SymmCIvector(hdiag, irrep_blocks)
+
+def pspace_blocked(h1e, eri, norb, nelec, hdiag, irrep_blocks, np=400):
+    '''pspace Hamiltonian of the lowest determinants of the irrep-blocked
+    hdiag.  The returned addr are the addresses in the blocked CI vector.
+    '''
+    neleca, nelecb = irrep_blocks.nelec
+    h1e = numpy.ascontiguousarray(h1e)
+    eri = pyscf.ao2mo.restore(1, eri, norb)
+    nb = len(irrep_blocks.birreps)
+    addr = numpy.argsort(hdiag)[:np]
+    addr0 = irrep_blocks.address()[addr]
+    stra = numpy.asarray(cistring.addr2str(norb, neleca, addr0 // nb),
+                         dtype=numpy.uint64)
+    strb = numpy.asarray(cistring.addr2str(norb, nelecb, addr0 % nb),
+                         dtype=numpy.uint64)
+    np = len(addr)
+    h0 = numpy.zeros((np,np))
+    libfci.FCIpspace_h0tril(h0.ctypes.data_as(ctypes.c_void_p),
+                            h1e.ctypes.data_as(ctypes.c_void_p),
+                            eri.ctypes.data_as(ctypes.c_void_p),
+                            stra.ctypes.data_as(ctypes.c_void_p),
+                            strb.ctypes.data_as(ctypes.c_void_p),
+                            ctypes.c_int(norb), ctypes.c_int(np))
+    for i in range(np):
+        h0[i,i] = hdiag[addr[i]]
+    h0 = pyscf.lib.hermi_triu_(h0)
+    return addr, h0
+
+def kernel_blocked(fci, h1e, eri, norb, nelec, ci0=None, wfnsym=0,
+                   tol=None, lindep=None, max_cycle=None, max_space=None,
+                   nroots=None, davidson_only=None, pspace_size=None,
+                   max_memory=None, verbose=None, **kwargs):
+    '''Davidson diagonalization in the space of the irrep-blocked CI vectors.
+    hdiag and the pspace are built for the blocks of the given wfnsym only.
+    The CI vectors are stored in the blocked layout inside this function;
+    FCISolver.kernel unpacks the results to the (na,nb) FCI vectors.
+
+    Returns:
+        The energies and the SymmCIvector(s)
+    '''
+    if nroots is None: nroots = fci.nroots
+    if davidson_only is None: davidson_only = fci.davidson_only
+    if pspace_size is None: pspace_size = fci.pspace_size
+    if tol is None: tol = fci.conv_tol
+    if lindep is None: lindep = fci.lindep
+    if max_cycle is None: max_cycle = fci.max_cycle
+    if max_space is None: max_space = fci.max_space
+    if max_memory is None: max_memory = fci.max_memory
+    if verbose is None: verbose = logger.Logger(fci.stdout, fci.verbose)
+
+    irrep_blocks = _get_irrep_blocks(fci, norb, nelec, wfnsym)
+    size = irrep_blocks.size
+    hdiag = make_hdiag_blocked(h1e, eri, norb, nelec, irrep_blocks)
+
+    pspace_size = min(pspace_size, size)
+    if pspace_size > 0:
+        addr, h0 = pspace_blocked(h1e, eri, norb, nelec, hdiag, irrep_blocks,
+                                  pspace_size)
+        pw, pv = scipy.linalg.eigh(h0)
+    else:
+        pw = pv = addr = None
+
+    if pspace_size >= size and not davidson_only:
+# The pspace contains all determinants of the symmetry
+        civec = numpy.zeros((nroots,size))
+        civec[:,addr] = pv[:,:nroots].T
+        civec = [_as_SymmCIvector(x, irrep_blocks) for x in civec]
+        if nroots > 1:
+            return pw[:nroots], civec
+        else:
+            return pw[0], civec[0]
+
+    precond = fci.make_precond(hdiag, pw, pv, addr)
+
+    h2e = fci.absorb_h1e(h1e, eri, norb, nelec, .5)
+    def hop(cs):
+        return [contract_2e_blocked(h2e, c, norb, nelec, irrep_blocks)
+                for c in cs]
+
+    if ci0 is not None:
+        if isinstance(ci0, numpy.ndarray) and ci0.ndim <= 2:
+            ci0 = [ci0]
+        ci0 = [_pack_civec(x, irrep_blocks) for x in ci0]
+# The initial guess of different symmetry has no overlap to the blocks
+        ci0 = [x for x in ci0 if numpy.linalg.norm(x) > 1e-8]
+    if not ci0:
+        ci0 = []
+        for addr in numpy.argsort(hdiag)[:nroots]:
+            x = numpy.zeros(size)
+            x[addr] = 1
+            ci0.append(x)
+
+    e, c = fci.eig_multi(hop, ci0, precond, tol=tol, lindep=lindep,
+                         max_cycle=max_cycle, max_space=max_space,
+                         nroots=nroots, max_memory=max_memory,
+                         verbose=verbose, **kwargs)
+    if nroots > 1:
+        return e, [_as_SymmCIvector(x, irrep_blocks) for x in c]
+    else:
+        return e, _as_SymmCIvector(c, irrep_blocks)
+
+def _get_irrep_blocks(fci, norb, nelec, wfnsym):
+    '''The IrrepBlocks of the solver, which is rebuilt (with its link
+    matrices) only when norb, nelec, orbsym or wfnsym are changed'''
+    neleca, nelecb = _unpack_nelec(nelec)
+    orbsym = numpy.asarray(fci.orbsym) % 10
+    irrep_blocks = getattr(fci, '_irrep_blocks', None)
+    if (irrep_blocks is None or irrep_blocks.norb != norb or
+        irrep_blocks.nelec != (neleca, nelecb) or
+        irrep_blocks.wfnsym != wfnsym % 10 or
+        not numpy.array_equal(irrep_blocks.orbsym, orbsym)):
+        irrep_blocks = IrrepBlocks(norb, (neleca, nelecb), orbsym, wfnsym)
+        fci._irrep_blocks = irrep_blocks
+    return irrep_blocks
+
+def _unpack_civec(civec):
+    if getattr(civec, '_irrep_blocks', None) is not None:
+        return civec._irrep_blocks.unpack(civec)
+    else:
+        return civec
+
+def _pack_civec(civec, irrep_blocks):
+    layout = getattr(civec, '_irrep_blocks', None)
+    if layout is irrep_blocks:
+        return numpy.asarray(civec).ravel()
+    elif layout is not None:
+        civec = layout.unpack(civec)
+    return numpy.asarray(irrep_blocks.pack(civec))
+
+
 def kernel(h1e, eri, norb, nelec, ci0=None, level_shift=1e-3, tol=1e-10,
            lindep=1e-14, max_cycle=50, max_space=12, nroots=1,
            davidson_only=False, pspace_size=400, orbsym=[], wfnsym=None,
@@ -130,20 +600,18 @@ def kernel(h1e, eri, norb, nelec, ci0=None, level_shift=1e-3, tol=1e-10,
         ci0 = addons.symm_initguess(norb, nelec, orbsym, wfnsym)
 
     e, c = cis.kernel(h1e, eri, norb, nelec, ci0, **unknown)
-    if cis.wfnsym is not None:
-        if cis.nroots > 1:
-            c = [addons.symmetrize_wfn(ci, norb, nelec, orbsym, wfnsym)
-                 for ci in c]
-        else:
-            c = addons.symmetrize_wfn(c, norb, nelec, orbsym, wfnsym)
     return e, c
 
 # dm_pq = <|p^+ q|>
 def make_rdm1(fcivec, norb, nelec, link_index=None):
+    if getattr(fcivec, '_irrep_blocks', None) is not None:
+        return make_rdm1_blocked(fcivec, norb, nelec)
     return direct_spin1.make_rdm1(fcivec, norb, nelec, link_index)
 
 # alpha and beta 1pdm
 def make_rdm1s(fcivec, norb, nelec, link_index=None):
+    if getattr(fcivec, '_irrep_blocks', None) is not None:
+        return make_rdm1s_blocked(fcivec, norb, nelec)
     return direct_spin1.make_rdm1s(fcivec, norb, nelec, link_index)
 
 # dm_pq,rs = <|p^+ q r^+ s|>
@@ -151,17 +619,22 @@ def make_rdm1s(fcivec, norb, nelec, link_index=None):
 # need call reorder_rdm for this rdm2 to get standard 2pdm
 
 def make_rdm12(fcivec, norb, nelec, link_index=None, reorder=True):
+    if getattr(fcivec, '_irrep_blocks', None) is not None:
+        return make_rdm12_blocked(fcivec, norb, nelec, reorder=reorder)
     return direct_spin1.make_rdm12(fcivec, norb, nelec, link_index, reorder)
 
 # dm_pq = <I|p^+ q|J>
 def trans_rdm1s(cibra, ciket, norb, nelec, link_index=None):
+    cibra, ciket = _unpack_civec(cibra), _unpack_civec(ciket)
     return direct_spin1.trans_rdm1s(cibra, ciket, norb, nelec, link_index)
 
 def trans_rdm1(cibra, ciket, norb, nelec, link_index=None):
+    cibra, ciket = _unpack_civec(cibra), _unpack_civec(ciket)
     return direct_spin1.trans_rdm1(cibra, ciket, norb, nelec, link_index)
 
 # dm_pq,rs = <I|p^+ q r^+ s|J>
 def trans_rdm12(cibra, ciket, norb, nelec, link_index=None, reorder=True):
+    cibra, ciket = _unpack_civec(cibra), _unpack_civec(ciket)
     return direct_spin1.trans_rdm12(cibra, ciket, norb, nelec, link_index, reorder)
 
 def energy(h1e, eri, fcivec, norb, nelec, link_index=None, orbsym=[]):
@@ -184,18 +657,11 @@ def _id_wfnsym(cis, norb, nelec, wfnsym):
     return wfnsym
 
 def get_init_guess(norb, nelec, nroots, hdiag, orbsym, wfnsym=0):
-    if isinstance(nelec, (int, numpy.integer)):
-        nelecb = nelec//2
-        neleca = nelec - nelecb
-    else:
-        neleca, nelecb = nelec
-    strsa = numpy.asarray(cistring.gen_strings4orblist(range(norb), neleca))
-    strsb = numpy.asarray(cistring.gen_strings4orblist(range(norb), nelecb))
-    airreps = numpy.zeros(strsa.size, dtype=numpy.int32)
-    birreps = numpy.zeros(strsb.size, dtype=numpy.int32)
-    for i in range(norb):
-        airreps[numpy.bitwise_and(strsa, 1<<i) > 0] ^= orbsym[i]
-        birreps[numpy.bitwise_and(strsb, 1<<i) > 0] ^= orbsym[i]
+    neleca, nelecb = _unpack_nelec(nelec)
+    strsa = cistring.make_strings(range(norb), neleca)
+    strsb = cistring.make_strings(range(norb), nelecb)
+    airreps = _gen_strs_irrep(strsa, orbsym)
+    birreps = _gen_strs_irrep(strsb, orbsym)
     na = len(strsa)
     nb = len(strsb)
 
@@ -218,6 +684,7 @@ class FCISolver(direct_spin1.FCISolver):
     def __init__(self, mol=None, **kwargs):
         self.orbsym = []
         self.wfnsym = None
+        self._irrep_blocks = None
         direct_spin1.FCISolver.__init__(self, mol, **kwargs)
         self.davidson_only = True
         self.pspace_size = 0  # Improper pspace size may break symmetry
@@ -250,6 +717,18 @@ class FCISolver(direct_spin1.FCISolver):
             orbsym = self.orbsym
         return contract_2e(eri, fcivec, norb, nelec, link_index, orbsym, **kwargs)
 
+    def make_rdm1s(self, fcivec, norb, nelec, link_index=None):
+        return make_rdm1s(fcivec, norb, nelec, link_index)
+
+    def make_rdm1(self, fcivec, norb, nelec, link_index=None):
+        return make_rdm1(fcivec, norb, nelec, link_index)
+
+    def make_rdm12(self, fcivec, norb, nelec, link_index=None, reorder=True):
+        return make_rdm12(fcivec, norb, nelec, link_index, reorder)
+
+    def make_rdm2(self, fcivec, norb, nelec, link_index=None, reorder=True):
+        return make_rdm12(fcivec, norb, nelec, link_index, reorder)[1]
+
     def get_init_guess(self, norb, nelec, nroots, hdiag):
         wfnsym = _id_wfnsym(self, norb, nelec, self.wfnsym)
         return get_init_guess(norb, nelec, nroots, hdiag, self.orbsym, wfnsym)
@@ -284,17 +763,29 @@ class FCISolver(direct_spin1.FCISolver):
             pyscf.gto.mole.check_sanity(self, self._keys, self.stdout)
 
         wfnsym = self.guess_wfnsym(norb, nelec, ci0, self.wfnsym, **kwargs)
-        e, c = direct_spin1.kernel_ms1(self, h1e, eri, norb, nelec, ci0, None,
-                                       tol, lindep, max_cycle, max_space, nroots,
-                                       davidson_only, pspace_size, **kwargs)
-        if self.wfnsym is not None:
-            # should I remove the non-symmetric contributions in each
-            # call of contract_2e?
+        if (list(self.orbsym) and
+            not direct_spin1._method_overwritten(self, 'contract_2e', FCISolver)):
+# Davidson iterations on the irrep-blocked CI vectors.  The blocked layout is
+# internal to the solver: the FCI vectors of (na,nb) are restored in the end
+# for the callers (e.g. CASSCF) and make_hdiag, pspace of the solver keep
+# working on the dense (na,nb) space
+            e, c = kernel_blocked(self, h1e, eri, norb, nelec, ci0, wfnsym,
+                                  tol, lindep, max_cycle, max_space, nroots,
+                                  davidson_only, pspace_size, **kwargs)
             if nroots > 1:
-                c = [addons.symmetrize_wfn(ci, norb, nelec, self.orbsym, wfnsym)
-                     for ci in c]
+                c = [x._irrep_blocks.unpack(x) for x in c]
             else:
-                c = addons.symmetrize_wfn(c, norb, nelec, self.orbsym, wfnsym)
+                c = c._irrep_blocks.unpack(c)
+        else:
+            e, c = direct_spin1.kernel_ms1(self, h1e, eri, norb, nelec, ci0, None,
+                                           tol, lindep, max_cycle, max_space, nroots,
+                                           davidson_only, pspace_size, **kwargs)
+            if self.wfnsym is not None:
+                if nroots > 1:
+                    c = [addons.symmetrize_wfn(ci, norb, nelec, self.orbsym, wfnsym)
+                         for ci in c]
+                else:
+                    c = addons.symmetrize_wfn(c, norb, nelec, self.orbsym, wfnsym)
         if orbsym is not None:
             self.orbsym = orbsym_bak
         if wfnsym_bak is not None:
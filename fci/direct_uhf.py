@@ -120,13 +120,10 @@ def make_hdiag(h1e, eri, norb, nelec):
     g2e_ab = pyscf.ao2mo.restore(1, eri[1], norb)
     g2e_bb = pyscf.ao2mo.restore(1, eri[2], norb)
 
-    link_indexa = cistring.gen_linkstr_index(range(norb), neleca)
-    link_indexb = cistring.gen_linkstr_index(range(norb), nelecb)
-    na = link_indexa.shape[0]
-    nb = link_indexb.shape[0]
-
-    occslista = numpy.asarray(link_indexa[:,:neleca,0], order='C')
-    occslistb = numpy.asarray(link_indexb[:,:nelecb,0], order='C')
+    occslista = cistring.gen_occslst(range(norb), neleca)
+    occslistb = cistring.gen_occslst(range(norb), nelecb)
+    na = occslista.shape[0]
+    nb = occslistb.shape[0]
     hdiag = numpy.empty(na*nb)
     jdiag_aa = numpy.asarray(numpy.einsum('iijj->ij',g2e_aa), order='C')
     jdiag_ab = numpy.asarray(numpy.einsum('iijj->ij',g2e_ab), order='C')
@@ -185,10 +182,10 @@ def pspace(h1e, eri, norb, nelec, hdiag, np=400):
     addr = numpy.argsort(hdiag)[:np]
     addra = addr // nb
     addrb = addr % nb
-    stra = numpy.array([cistring.addr2str(norb,neleca,ia) for ia in addra],
-                       dtype=numpy.long)
-    strb = numpy.array([cistring.addr2str(norb,nelecb,ib) for ib in addrb],
-                       dtype=numpy.long)
+    stra = numpy.asarray(cistring.addr2str(norb, neleca, addra),
+                         dtype=numpy.long)
+    strb = numpy.asarray(cistring.addr2str(norb, nelecb, addrb),
+                         dtype=numpy.long)
     np = len(addr)
     h0 = numpy.zeros((np,np))
     libfci.FCIpspace_h0tril_uhf(h0.ctypes.data_as(ctypes.c_void_p),
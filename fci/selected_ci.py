@@ -0,0 +1,856 @@
+#!/usr/bin/env python
+#
+# Author: Qiming Sun <osirpt.sun@gmail.com>
+#
+# Selected CI
+#
+# The CI space is the direct product of the selected alpha strings and the
+# selected beta strings.  Starting from the HF determinant, the strings are
+# added iteratively by the heat-bath criterion |H_{ai} c_i| > select_cutoff
+# (CIPSI like space growth), and the CI problem is solved in the selected
+# space.  The Epstein-Nesbet second order correction can be computed from the
+# determinants selected with the smaller cutoff pt2_cutoff.
+#
+# The CI vector is an SCIvector, a 2D array with the attribute _strs which
+# holds the alpha strings (rows) and beta strings (columns).  The sigma vector
+# is built by the exact string Hamiltonians of the same-spin part (which are
+# stored as sparse matrices) and the alpha-beta part of the 2e Hamiltonian
+# which is contracted with the link tables of the selected strings.  The
+# strings are saved in int64, which limits the number of orbitals to 63.
+#
+
+from functools import reduce
+import numpy
+import scipy.sparse
+import pyscf.lib
+import pyscf.gto
+from pyscf.lib import logger
+import pyscf.ao2mo
+from pyscf.fci import cistring
+from pyscf.fci import direct_spin1
+
+class SCIvector(numpy.ndarray):
+    '''CI coefficients of the selected determinants.  _strs is the tuple of
+    the alpha strings and the beta strings (sorted int64 arrays) of the rows
+    and columns.
+    '''
+    def __array_finalize__(self, obj):
+        self._strs = getattr(obj, '_strs', None)
+
+def _as_SCIvector(civec, ci_strs):
+    civec = numpy.asarray(civec).view(SCIvector)
+    civec._strs = ci_strs
+    return civec
+
+def _unpack_nelec(nelec):
+    if isinstance(nelec, (int, numpy.integer)):
+        nelecb = nelec//2
+        neleca = nelec - nelecb
+    else:
+        neleca, nelecb = nelec
+    return neleca, nelecb
+
+
+_M1 = numpy.uint64(0x5555555555555555)
+_M2 = numpy.uint64(0x3333333333333333)
+_M4 = numpy.uint64(0x0f0f0f0f0f0f0f0f)
+_H01 = numpy.uint64(0x0101010101010101)
+def _popcount(x):
+    '''Number of 1 bits of each int64 element'''
+    x = numpy.asarray(x, dtype=numpy.int64).view(numpy.uint64)
+    x = x - ((x >> numpy.uint64(1)) & _M1)
+    x = (x & _M2) + ((x >> numpy.uint64(2)) & _M2)
+    x = (x + (x >> numpy.uint64(4))) & _M4
+    return ((x * _H01) >> numpy.uint64(56)).astype(numpy.int32)
+
+def _bit_index(x):
+    '''The orbital index of the strings which have only one bit'''
+    return numpy.log2(numpy.asarray(x, dtype=float)).round().astype(int)
+
+def _parity(strs, i, a):
+    '''The sign of a_a^+ a_i |str>, for orbital i occupied and a unoccupied'''
+    lo = numpy.minimum(i, a)
+    hi = numpy.maximum(i, a)
+    mask = (numpy.left_shift(1, hi) - 1) ^ (numpy.left_shift(1, lo+1) - 1)
+    return 1. - (_popcount(strs & mask) % 2) * 2
+
+def _occ_table(strs, norb):
+    '''Occupancy (bool) of each orbital for each string'''
+    strs = numpy.asarray(strs, dtype=numpy.int64)
+    return ((strs[:,None] >> numpy.arange(norb)) & 1).astype(bool)
+
+def _hf_strs(nelec):
+    neleca, nelecb = _unpack_nelec(nelec)
+    return (numpy.array([(1<<neleca)-1], dtype=numpy.int64),
+            numpy.array([(1<<nelecb)-1], dtype=numpy.int64))
+
+
+def string_pairs(strs1, strs2, norb, max_memory=2000):
+    '''The pairs of strings (I in strs1, J in strs2) which are identical or
+    connected by single and double excitations.
+
+    Returns:
+        diag : (I, J) of identical strings
+        singles : (I, J, a, i, sign) for |I> = sign * a_a^+ a_i |J>
+        doubles : (I, J, a, i, b, j, sign) for
+            |I> = sign * a_a^+ a_i a_b^+ a_j |J>
+    '''
+    strs1 = numpy.asarray(strs1, dtype=numpy.int64)
+    strs2 = numpy.asarray(strs2, dtype=numpy.int64)
+    n2 = len(strs2)
+    blksize = max(1, int(max_memory*1e6/8/(n2*3+1)))
+    diag = [[], []]
+    singles = [[] for i in range(5)]
+    doubles = [[] for i in range(7)]
+    for i0, i1 in pyscf.lib.prange(0, len(strs1), blksize):
+        x = strs1[i0:i1,None] ^ strs2
+        nx = _popcount(x)
+
+        I, J = numpy.where(nx == 0)
+        diag[0].append(I+i0)
+        diag[1].append(J)
+
+        I, J = numpy.where(nx == 2)
+        xx = x[I,J]
+        I += i0
+        a = _bit_index(strs1[I] & xx)
+        i = _bit_index(strs2[J] & xx)
+        for lst, v in zip(singles, (I, J, a, i, _parity(strs2[J], i, a))):
+            lst.append(v)
+
+        I, J = numpy.where(nx == 4)
+        xx = x[I,J]
+        I += i0
+        pbits = strs1[I] & xx
+        hbits = strs2[J] & xx
+        abits = pbits & -pbits
+        ibits = hbits & -hbits
+        a = _bit_index(abits)
+        b = _bit_index(pbits ^ abits)
+        i = _bit_index(ibits)
+        j = _bit_index(hbits ^ ibits)
+        sign = _parity(strs2[J], i, a)
+        sign *= _parity(strs2[J] ^ ibits | abits, j, b)
+        for lst, v in zip(doubles, (I, J, a, i, b, j, sign)):
+            lst.append(v)
+        x = nx = None
+    diag = [numpy.hstack(v) for v in diag]
+    singles = [numpy.hstack(v) for v in singles]
+    doubles = [numpy.hstack(v) for v in doubles]
+    return diag, singles, doubles
+
+def string_hamiltonian(h1e, eri, strs1, strs2, norb, pairs=None):
+    '''Matrix elements (scipy.sparse.csr_matrix) of the 1-spin Hamiltonian
+    h_{pq} p^+ q + 1/2 (pq|rs) p^+ r^+ s q between the strings strs1 and
+    strs2.
+    '''
+    if pairs is None:
+        pairs = string_pairs(strs1, strs2, norb)
+    diag, singles, doubles = pairs
+    eri = pyscf.ao2mo.restore(1, eri, norb)
+    occ = _occ_table(strs2, norb).astype(float)
+
+    I, J = diag
+    jkdiag = numpy.einsum('iijj->ij', eri) - numpy.einsum('ijji->ij', eri)
+    o = occ[J]
+    vdiag = (numpy.dot(o, h1e.diagonal()) +
+             numpy.einsum('kp,pq,kq->k', o, jkdiag, o) * .5)
+
+    I1, J1, a, i, sign = singles
+    jk = numpy.einsum('aikk->aik', eri) - numpy.einsum('akki->aik', eri)
+    v1 = numpy.einsum('mk,mk->m', jk[a,i], occ[J1]) + h1e[a,i]
+    v1 *= sign
+
+    I2, J2, a, i, b, j, sign = doubles
+    v2 = (eri[a,i,b,j] - eri[a,j,b,i]) * sign
+
+    rows = numpy.hstack((I, I1, I2))
+    cols = numpy.hstack((J, J1, J2))
+    vals = numpy.hstack((vdiag, v1, v2))
+    return scipy.sparse.csr_matrix((vals, (rows, cols)),
+                                   shape=(len(strs1),len(strs2)))
+
+def gen_linkstr_index(strs1, strs2, norb, pairs=None):
+    '''Look up tables of the operators E_pq = p^+ q between the strings.
+    link_index[p*norb+q] is (I, J, sign) for |I> = sign * p^+ q |J>, I in
+    strs1 and J in strs2, sorted by J.
+    '''
+    if pairs is None:
+        pairs = string_pairs(strs1, strs2, norb)
+    diag, singles = pairs[:2]
+    I, J = diag
+    occ = _occ_table(numpy.asarray(strs2)[J], norb)
+    I1, J1, a, i, sign = singles
+    pq = a * norb + i
+    idx = numpy.lexsort((J1, pq))
+    I1, J1, pq, sign = I1[idx], J1[idx], pq[idx], sign[idx]
+    bounds = numpy.searchsorted(pq, numpy.arange(norb*norb+1))
+    idx = numpy.argsort(J)
+    I, J, occ = I[idx], J[idx], occ[idx]
+
+    link_index = []
+    for p in range(norb):
+        for q in range(norb):
+            if p == q:
+                mask = occ[:,p]
+                link_index.append((I[mask], J[mask], numpy.ones(mask.sum())))
+            else:
+                k0, k1 = bounds[p*norb+q], bounds[p*norb+q+1]
+                link_index.append((I1[k0:k1], J1[k0:k1], sign[k0:k1]))
+    return link_index
+
+def _link_range(link, j0, j1):
+    I, J, sign = link
+    k0, k1 = numpy.searchsorted(J, (j0, j1))
+    return I[k0:k1], J[k0:k1], sign[k0:k1]
+
+def _link_cols(link, i0, i1):
+    '''The entries of the link table which point to the strings [i0:i1] of
+    the output vector (the indices are shifted by i0)'''
+    I, J, sign = link
+    mask = (I >= i0) & (I < i1)
+    return I[mask]-i0, J[mask], sign[mask]
+
+def _blocks_2d(nrow, ncol, unit, max_memory):
+    '''Block sizes of the rows and the columns so that the intermediates of
+    unit doubles per element (row, col) fit in max_memory'''
+    max_memory = max(0, max_memory - pyscf.lib.current_memory()[0])
+    nelem = max(1, int(max_memory*1e6/8/unit))
+    colsize = max(1, min(ncol, nelem))
+    rowsize = max(1, min(nrow, nelem//colsize))
+    return rowsize, colsize
+
+def contract_ab(eri, civec, norb, linka, linkb, shape, max_memory=2000):
+    '''sum_{pq,rs} eri[pq,rs] E^alpha_pq E^beta_rs |civec>.  linka and linkb
+    are the link tables from the strings of civec to the strings of the
+    output vector of the given shape.
+    '''
+    eri = pyscf.ao2mo.restore(1, eri, norb).reshape(norb*norb,-1)
+    nn = norb * norb
+    na, nb = shape
+    ci1 = numpy.zeros((na,nb))
+# The columns (beta strings of ci1) are blocked as well when one row of the
+# intermediates does not fit in max_memory
+    blksize, colsize = _blocks_2d(civec.shape[0], nb, nn*2+1, max_memory)
+    for c0, c1 in pyscf.lib.prange(0, nb, colsize):
+        if colsize < nb:
+            linkb_blk = [_link_cols(x, c0, c1) for x in linkb]
+        else:
+            linkb_blk = linkb
+        for j0, j1 in pyscf.lib.prange(0, civec.shape[0], blksize):
+            t1 = numpy.zeros((nn,j1-j0,c1-c0))
+            for rs in range(nn):
+                I, J, sign = linkb_blk[rs]
+                t1[rs][:,I] = civec[j0:j1,J] * sign
+            g = pyscf.lib.dot(eri, t1.reshape(nn,-1)).reshape(nn,j1-j0,c1-c0)
+            t1 = None
+            for pq in range(nn):
+                I, J, sign = _link_range(linka[pq], j0, j1)
+                ci1[I,c0:c1] += g[pq][J-j0] * sign[:,None]
+            g = None
+    return ci1
+
+def make_hdiag(h1e, eri, ci_strs, norb, nelec):
+    '''Diagonal Hamiltonian of the selected determinants'''
+    eri = pyscf.ao2mo.restore(1, eri, norb)
+    diagj = numpy.einsum('iijj->ij', eri)
+    diagk = numpy.einsum('ijji->ij', eri)
+    occa = _occ_table(ci_strs[0], norb).astype(float)
+    occb = _occ_table(ci_strs[1], norb).astype(float)
+    ea = (numpy.dot(occa, h1e.diagonal()) +
+          numpy.einsum('kp,pq,kq->k', occa, diagj-diagk, occa) * .5)
+    eb = (numpy.dot(occb, h1e.diagonal()) +
+          numpy.einsum('kp,pq,kq->k', occb, diagj-diagk, occb) * .5)
+    hdiag = ea[:,None] + eb + reduce(numpy.dot, (occa, diagj, occb.T))
+    return hdiag.ravel()
+
+def absorb_h1e(h1e, eri, norb, nelec, fac=1):
+    return direct_spin1.absorb_h1e(h1e, eri, norb, nelec, fac)
+
+
+class _Hamiltonian(object):
+    '''H|c> between the selected spaces of the input and output vectors.  The
+    Hamiltonian is given by the (absorbed) 2e integrals as in
+    direct_spin1.contract_2e
+    '''
+    def __init__(self, h2e, norb, strs_out, strs_in, max_memory=2000,
+                 beta=None):
+        '''beta can be the _Hamiltonian object of the same beta strings, whose
+        beta string Hamiltonian and link tables are reused.'''
+        h2e = pyscf.ao2mo.restore(1, h2e, norb)
+        # sum_{pqrs} w_{pq,rs} E_pq E_rs for one spin
+        #   = sum_{ps} (sum_q w_{pq,qs}) p^+ s + sum_{pqrs} w_{pq,rs} p^+ r^+ s q
+        f1e = numpy.einsum('pqqs->ps', h2e)
+        self.norb = norb
+        self.strs_out = strs_out
+        self.strs_in = strs_in
+        self.shape_out = (len(strs_out[0]), len(strs_out[1]))
+        self.max_memory = max_memory
+        pairsa = string_pairs(strs_out[0], strs_in[0], norb, max_memory)
+        self.haa = string_hamiltonian(f1e, h2e*2, strs_out[0], strs_in[0],
+                                      norb, pairsa)
+        self.linka = gen_linkstr_index(strs_out[0], strs_in[0], norb, pairsa)
+        pairsa = None
+        if beta is not None:
+            self.hbb = beta.hbb
+            self.linkb = beta.linkb
+        elif (strs_out[1] is strs_out[0]) and (strs_in[1] is strs_in[0]):
+            self.hbb = self.haa
+            self.linkb = self.linka
+        else:
+            pairsb = string_pairs(strs_out[1], strs_in[1], norb, max_memory)
+            self.hbb = string_hamiltonian(f1e, h2e*2, strs_out[1], strs_in[1],
+                                          norb, pairsb)
+            self.linkb = gen_linkstr_index(strs_out[1], strs_in[1], norb, pairsb)
+        self.eri_ab = h2e * 2
+# The positions of the input strings in the output strings (for the terms
+# which do not change the string of the other spin)
+        self.addra = _str2idx(strs_out[0], strs_in[0])
+        self.addrb = _str2idx(strs_out[1], strs_in[1])
+
+    def __call__(self, civec):
+        na, nb = self.shape_out
+        civec = numpy.asarray(civec).reshape(len(self.strs_in[0]),-1)
+        ci1 = contract_ab(self.eri_ab, civec, self.norb, self.linka,
+                          self.linkb, self.shape_out, self.max_memory)
+        addra, addrb = self.addra, self.addrb
+        ci1[:,addrb[addrb>=0]] += self.haa.dot(civec[:,addrb>=0])
+        ci1[addra[addra>=0]] += self.hbb.dot(civec[addra>=0].T).T
+        return ci1
+
+def _str2idx(strs_out, strs_in):
+    '''The index of strs_in in strs_out.  -1 for the missing strings'''
+    idx = numpy.searchsorted(strs_out, strs_in)
+    idx[idx == len(strs_out)] = 0
+    idx[strs_out[idx] != strs_in] = -1
+    return idx
+
+def contract_2e(eri, civec_strs, norb, nelec, link_index=None, max_memory=2000):
+    '''Contract the 2-electron Hamiltonian (with absorbed 1-electron part, see
+    direct_spin1.contract_2e) with the selected CI vector.  link_index can be
+    the _Hamiltonian object of the space of civec_strs.
+    '''
+    ci_strs = civec_strs._strs
+    if link_index is None:
+        link_index = _Hamiltonian(eri, norb, ci_strs, ci_strs, max_memory)
+    return _as_SCIvector(link_index(civec_strs), ci_strs)
+
+
+def select_strs(h1e, eri, civec_strs, norb, nelec, select_cutoff,
+                eri_pq_max=None):
+    '''Strings connected to the strings of civec_strs which satisfy the
+    heat-bath criterion |H_{ai} c_i| > select_cutoff.  The (largest)
+    coefficient of each string is used for c_i.
+
+    Returns:
+        The alpha and beta strings, including the strings of civec_strs
+    '''
+    eri = pyscf.ao2mo.restore(1, eri, norb)
+    if eri_pq_max is None:
+        eri_pq_max = abs(eri.reshape(norb**2,-1)).max(axis=1).reshape(norb,norb)
+    civec = abs(numpy.asarray(civec_strs))
+    strsa, strsb = civec_strs._strs
+    strsa = _select_strs(h1e, eri, eri_pq_max, civec.max(axis=1), strsa,
+                         norb, select_cutoff)
+    strsb = _select_strs(h1e, eri, eri_pq_max, civec.max(axis=0), strsb,
+                         norb, select_cutoff)
+    neleca, nelecb = _unpack_nelec(nelec)
+    if neleca == nelecb:
+        strsa = strsb = numpy.union1d(strsa, strsb)
+    return strsa, strsb
+
+def _select_strs(h1e, eri, eri_pq_max, cmax, strs, norb, select_cutoff):
+    occ = _occ_table(strs, norb)
+    cutoff = select_cutoff / max(cmax.max(), 1e-300)
+    new_strs = [strs]
+# single excitations.  The integrals of the simultaneous excitation of the
+# other electron (eri_pq_max) are included in the screening
+    v1 = numpy.maximum(abs(h1e), eri_pq_max)
+    for i in range(norb):
+        for a in range(norb):
+            if a != i and v1[a,i] > cutoff:
+                mask = occ[:,i] & ~occ[:,a] & (cmax*v1[a,i] > select_cutoff)
+                new_strs.append(strs[mask] ^ (1<<i) | (1<<a))
+# same-spin double excitations
+    for i in range(norb):
+        for j in range(i):
+            v2 = abs(eri[:,i,:,j] - eri[:,j,:,i])
+            a, b = numpy.where(numpy.tril(v2, -1) > cutoff)
+            if len(a) == 0:
+                continue
+            v2 = v2[a,b]
+            idx = numpy.where(occ[:,i] & occ[:,j])[0]
+            mask = ((cmax[idx,None]*v2 > select_cutoff) &
+                    ~occ[idx][:,a] & ~occ[idx][:,b])
+            k, l = numpy.where(mask)
+            new_strs.append(strs[idx[k]] ^ ((1<<i) | (1<<j))
+                            | numpy.left_shift(1, a[l])
+                            | numpy.left_shift(1, b[l]))
+    return numpy.unique(numpy.hstack(new_strs).astype(numpy.int64))
+
+def enlarge_space(myci, civec_strs, h1e, eri, norb, nelec, select_cutoff=None,
+                  eri_pq_max=None):
+    '''Add the selected strings to the space of civec_strs.  The CI
+    coefficients of the new determinants are 0.
+    '''
+    if select_cutoff is None: select_cutoff = myci.select_cutoff
+    ci_strs = select_strs(h1e, eri, civec_strs, norb, nelec, select_cutoff,
+                          eri_pq_max)
+    return _embed(civec_strs, ci_strs)
+
+def _embed(civec_strs, ci_strs):
+    addra = numpy.searchsorted(ci_strs[0], civec_strs._strs[0])
+    addrb = numpy.searchsorted(ci_strs[1], civec_strs._strs[1])
+    ci1 = numpy.zeros((len(ci_strs[0]),len(ci_strs[1])))
+    ci1[addra[:,None],addrb] = civec_strs
+    return _as_SCIvector(ci1, ci_strs)
+
+
+def kernel(h1e, eri, norb, nelec, ci0=None, level_shift=1e-3, tol=1e-10,
+           lindep=1e-14, max_cycle=50, max_space=12, select_cutoff=1e-3,
+           **kwargs):
+    return direct_spin1._kfactory(SelectedCI, h1e, eri, norb, nelec, ci0,
+                                  level_shift, tol, lindep, max_cycle,
+                                  max_space, 1, True, 0,
+                                  select_cutoff=select_cutoff, **kwargs)
+
+def kernel_float_space(myci, h1e, eri, norb, nelec, ci0=None,
+                       tol=None, lindep=None, max_cycle=None, max_space=None,
+                       nroots=None, max_memory=None, verbose=None, **kwargs):
+    '''Grow the selected space until no strings are added (or the energy is
+    converged), and solve the CI problem in the final space.
+    '''
+    if verbose is None:
+        log = logger.Logger(myci.stdout, myci.verbose)
+    elif isinstance(verbose, logger.Logger):
+        log = verbose
+    else:
+        log = logger.Logger(myci.stdout, verbose)
+    if nroots is None: nroots = myci.nroots
+    assert(nroots == 1)
+    if tol is None: tol = myci.conv_tol
+    if max_memory is None: max_memory = myci.max_memory
+
+    h1e = numpy.ascontiguousarray(h1e)
+    eri = pyscf.ao2mo.restore(1, eri, norb)
+    eri_pq_max = abs(eri.reshape(norb**2,-1)).max(axis=1).reshape(norb,norb)
+    h2e = absorb_h1e(h1e, eri, norb, nelec, .5)
+
+    ci0 = _init_civec(ci0, norb, nelec)
+    e = e_last = None
+    for icycle in range(myci.max_cycle_grow):
+        ci_strs = ci0._strs
+        ci0 = enlarge_space(myci, ci0, h1e, eri, norb, nelec,
+                            eri_pq_max=eri_pq_max)
+        if e_last is not None and ci0.shape == ci_strs_shape(ci_strs):
+            log.debug('Selected space is converged')
+            break
+        e, ci0 = _kernel_fixed_space(myci, h2e, ci0, norb, nelec, tol, lindep,
+                                     max_cycle, max_space, max_memory, log)
+        if e_last is None:
+            log.info('Selected CI cycle %d  space %s  E = %.15g',
+                     icycle, ci0.shape, e)
+        else:
+            log.info('Selected CI cycle %d  space %s  E = %.15g  dE = %.8g',
+                     icycle, ci0.shape, e, e-e_last)
+            if abs(e - e_last) < tol:
+                break
+        e_last = e
+    if e is None:  # max_cycle_grow = 0, no strings are selected
+        e, ci0 = _kernel_fixed_space(myci, h2e, ci0, norb, nelec, tol, lindep,
+                                     max_cycle, max_space, max_memory, log)
+
+    if myci.pt2:
+        myci.e_pt2 = enpt2(myci, h1e, eri, ci0, norb, nelec, e,
+                           myci.pt2_cutoff, max_memory)
+        log.note('Selected CI E = %.15g  E(PT2) = %.15g  E+E(PT2) = %.15g',
+                 e, myci.e_pt2, e+myci.e_pt2)
+    return e, ci0
+
+def ci_strs_shape(ci_strs):
+    return (len(ci_strs[0]), len(ci_strs[1]))
+
+def _init_civec(ci0, norb, nelec):
+    if isinstance(ci0, SCIvector) and ci0._strs is not None:
+        return _as_SCIvector(numpy.array(ci0), ci0._strs)
+    ci_strs = _hf_strs(nelec)
+    return _as_SCIvector(numpy.ones((1,1)), ci_strs)
+
+def _kernel_fixed_space(myci, h2e, ci0, norb, nelec, tol=None, lindep=None,
+                        max_cycle=None, max_space=None, max_memory=None,
+                        log=None):
+    '''Solve the CI problem in the space of ci0'''
+    if tol is None: tol = myci.conv_tol
+    if lindep is None: lindep = myci.lindep
+    if max_cycle is None: max_cycle = myci.max_cycle
+    if max_space is None: max_space = myci.max_space
+    if max_memory is None: max_memory = myci.max_memory
+    if log is None: log = logger.Logger(myci.stdout, myci.verbose)
+
+    ci_strs = ci0._strs
+    shape = ci_strs_shape(ci_strs)
+    hop = _Hamiltonian(h2e, norb, ci_strs, ci_strs, max_memory)
+# same-spin parts from the string Hamiltonians, plus the alpha-beta part
+# 2 w_{pp,qq} n^alpha_p n^beta_q
+    occa = _occ_table(ci_strs[0], norb).astype(float)
+    occb = _occ_table(ci_strs[1], norb).astype(float)
+    diagj = numpy.einsum('iijj->ij', hop.eri_ab)
+    hdiag = (hop.haa.diagonal()[:,None] + hop.hbb.diagonal() +
+             reduce(numpy.dot, (occa, diagj, occb.T)))
+    hdiag = hdiag.ravel()
+    if hdiag.size == 1:
+        return hdiag[0], _as_SCIvector(numpy.ones(shape), ci_strs)
+
+    precond = myci.make_precond(hdiag, None, None, None)
+    ci0 = numpy.asarray(ci0).ravel()
+    if numpy.dot(ci0, ci0) < 1e-12:
+        ci0 = numpy.zeros(hdiag.size)
+        ci0[numpy.argmin(hdiag)] = 1
+    e, c = myci.eig(lambda c: hop(c).ravel(), [ci0], precond, tol=tol,
+                    lindep=lindep, max_cycle=max_cycle, max_space=max_space,
+                    nroots=1, max_memory=max_memory, verbose=log)
+    return e, _as_SCIvector(c.reshape(shape), ci_strs)
+
+def enpt2(myci, h1e, eri, civec_strs, norb, nelec, e_ci=None, pt2_cutoff=None,
+          max_memory=2000):
+    '''Epstein-Nesbet second order energy correction.  The first order
+    interacting determinants are taken from the direct product space of the
+    strings selected by pt2_cutoff.  The external space is processed in
+    blocks of the alpha strings, and only the determinants D with
+    |<D|H|civec>| > pt2_cutoff are included in the correction.
+    '''
+    if pt2_cutoff is None: pt2_cutoff = myci.pt2_cutoff
+    eri = pyscf.ao2mo.restore(1, eri, norb)
+    h2e = absorb_h1e(h1e, eri, norb, nelec, .5)
+    ci_strs = civec_strs._strs
+    civec = numpy.asarray(civec_strs)
+    if e_ci is None:
+        hc = contract_2e(h2e, civec_strs, norb, nelec, max_memory=max_memory)
+        e_ci = numpy.dot(civec.ravel(), hc.ravel())
+
+    ext_strs = select_strs(h1e, eri, civec_strs, norb, nelec, pt2_cutoff)
+    ext_a, ext_b = ext_strs
+    nb = len(ext_b)
+    diagj = numpy.einsum('iijj->ij', eri)
+    diagk = numpy.einsum('ijji->ij', eri)
+    def e_ss(occ):
+        return (numpy.dot(occ, h1e.diagonal()) +
+                numpy.einsum('kp,pq,kq->k', occ, diagj-diagk, occ) * .5)
+    occb = _occ_table(ext_b, norb).astype(float)
+    eb = e_ss(occb)
+    addrb = numpy.searchsorted(ext_b, ci_strs[1])
+
+    max_memory = max(0, max_memory - pyscf.lib.current_memory()[0])
+    blksize = max(1, min(len(ext_a), int(max_memory*.5e6/8/(nb*3+1))))
+    hop = None
+    e_pt2 = 0
+    for i0, i1 in pyscf.lib.prange(0, len(ext_a), blksize):
+        strs_out = (ext_a[i0:i1], ext_b)
+        hop = _Hamiltonian(h2e, norb, strs_out, ci_strs, max_memory, hop)
+        hc = hop(civec)
+        # remove the determinants of the selected space
+        addra = hop.addra[hop.addra >= 0]
+        hc[addra[:,None],addrb] = 0
+        I, J = numpy.where(abs(hc) > pt2_cutoff)
+        if len(I) == 0:
+            continue
+        hc = hc[I,J]
+        occa = _occ_table(strs_out[0][I], norb).astype(float)
+        hdiag = (e_ss(occa) + eb[J] +
+                 numpy.einsum('kp,kp->k', numpy.dot(occa, diagj), occb[J]))
+        de = e_ci - hdiag
+        de[abs(de) < 1e-12] = 1e-12
+        e_pt2 += numpy.dot(hc**2, 1./de)
+        hc = occa = hdiag = de = None
+    return e_pt2
+
+
+def _make_rdm12_ss(civec, strs, norb, pairs):
+    '''Same-spin 1- and 2-particle density matrices.  The rows of civec are
+    the strings of the spin.  dm2[p,q,r,s] = <p^+ r^+ s q>'''
+    diag, singles, doubles = pairs
+    occ = _occ_table(strs, norb).astype(float)
+    ddiag = numpy.einsum('ij,ij->i', civec, civec)
+    dm1 = numpy.diag(numpy.dot(ddiag, occ))
+    dm2 = numpy.zeros((norb,norb,norb,norb))
+    idx = numpy.arange(norb)
+
+    m = numpy.dot(occ.T*ddiag, occ)
+    dm2[idx[:,None],idx[:,None],idx,idx] += m
+    dm2[idx[:,None],idx,idx,idx[:,None]] -= m
+
+    I, J, a, i, sign = singles
+    d = _pair_dot(civec, I, J) * sign
+    numpy.add.at(dm1, (a,i), d)
+    common = occ[J]
+    common[numpy.arange(len(J)),i] = 0
+    x = numpy.zeros((norb,norb,norb))
+    numpy.add.at(x, (a,i), common*d[:,None])
+    #:dm2[a,i,k,k] += x[a,i,k]
+    #:dm2[k,k,a,i] += x[a,i,k]
+    #:dm2[a,k,k,i] -= x[a,i,k]
+    #:dm2[k,i,a,k] -= x[a,i,k]
+    dm2[:,:,idx,idx] += x
+    dm2[idx,idx] += x.transpose(2,0,1)
+    dm2[:,idx,idx,:] -= x.transpose(0,2,1)
+    dm2[idx,:,:,idx] -= x.transpose(2,1,0)
+
+    I, J, a, i, b, j, sign = doubles
+    d = _pair_dot(civec, I, J) * sign
+    numpy.add.at(dm2, (a,i,b,j), d)
+    numpy.add.at(dm2, (b,j,a,i), d)
+    numpy.add.at(dm2, (a,j,b,i), -d)
+    numpy.add.at(dm2, (b,i,a,j), -d)
+    return dm1, dm2
+
+def _pair_dot(civec, I, J, blksize=4000):
+    '''dot(civec[I[k]], civec[J[k]]) for each k'''
+    d = numpy.empty(len(I))
+    for k0, k1 in pyscf.lib.prange(0, len(I), blksize):
+        d[k0:k1] = numpy.einsum('ij,ij->i', civec[I[k0:k1]], civec[J[k0:k1]])
+    return d
+
+def _make_rdm2ab(civec, norb, linka, linkb, max_memory=2000):
+    '''dm2ab[p,q,r,s] = <p_alpha^+ q_alpha r_beta^+ s_beta>'''
+    na, nb = civec.shape
+    nn = norb * norb
+    dm2 = numpy.zeros((nn,nn))
+    blksize, colsize = _blocks_2d(na, nb, nn*2+1, max_memory)
+    for c0, c1 in pyscf.lib.prange(0, nb, colsize):
+        if colsize < nb:
+            linkb_blk = [_link_cols(x, c0, c1) for x in linkb]
+        else:
+            linkb_blk = linkb
+        for j0, j1 in pyscf.lib.prange(0, na, blksize):
+            t1 = numpy.zeros((nn,j1-j0,c1-c0))
+            for rs in range(nn):
+                I, J, sign = linkb_blk[rs]
+                t1[rs][:,I] = civec[j0:j1,J] * sign
+            t2 = numpy.zeros((nn,j1-j0,c1-c0))
+            for pq in range(nn):
+                I, J, sign = _link_range(linka[pq], j0, j1)
+                t2[pq][J-j0] = civec[I,c0:c1] * sign[:,None]
+            dm2 += pyscf.lib.dot(t2.reshape(nn,-1), t1.reshape(nn,-1).T)
+            t1 = t2 = None
+    return dm2.reshape(norb,norb,norb,norb)
+
+def make_rdm12s(civec_strs, norb, nelec, max_memory=2000):
+    r'''Spin separated 1- and 2-particle density matrices of the selected CI
+    vector.  The 2pdm is :math:`\langle p^\dagger q^\dagger s r\rangle` but is
+    stored as [p,r,q,s]
+    '''
+    strsa, strsb = civec_strs._strs
+    civec = numpy.asarray(civec_strs)
+    pairsa = string_pairs(strsa, strsa, norb, max_memory)
+    if strsb is strsa:
+        pairsb = pairsa
+    else:
+        pairsb = string_pairs(strsb, strsb, norb, max_memory)
+    dm1a, dm2aa = _make_rdm12_ss(civec, strsa, norb, pairsa)
+    dm1b, dm2bb = _make_rdm12_ss(civec.T, strsb, norb, pairsb)
+    linka = gen_linkstr_index(strsa, strsa, norb, pairsa)
+    linkb = gen_linkstr_index(strsb, strsb, norb, pairsb)
+    dm2ab = _make_rdm2ab(civec, norb, linka, linkb, max_memory)
+    return (dm1a, dm1b), (dm2aa, dm2ab, dm2bb)
+
+def make_rdm12(civec_strs, norb, nelec, max_memory=2000):
+    r'''Spin traced 1- and 2-particle density matrices of the selected CI
+    vector.  The 2pdm is :math:`\langle p^\dagger q^\dagger s r\rangle` but is
+    stored as [p,r,q,s]
+    '''
+    (dm1a, dm1b), (dm2aa, dm2ab, dm2bb) = \
+            make_rdm12s(civec_strs, norb, nelec, max_memory)
+    return dm1a+dm1b, dm2aa+dm2ab+dm2ab.transpose(2,3,0,1)+dm2bb
+
+def make_rdm1s(civec_strs, norb, nelec):
+    strsa, strsb = civec_strs._strs
+    civec = numpy.asarray(civec_strs)
+    dm1a = _make_rdm1_ss(civec, strsa, norb)
+    dm1b = _make_rdm1_ss(civec.T, strsb, norb)
+    return dm1a, dm1b
+
+def _make_rdm1_ss(civec, strs, norb):
+    diag, singles, doubles = string_pairs(strs, strs, norb)
+    occ = _occ_table(strs, norb).astype(float)
+    dm1 = numpy.diag(numpy.dot(numpy.einsum('ij,ij->i', civec, civec), occ))
+    I, J, a, i, sign = singles
+    numpy.add.at(dm1, (a,i), _pair_dot(civec, I, J) * sign)
+    return dm1
+
+def make_rdm1(civec_strs, norb, nelec):
+    dm1a, dm1b = make_rdm1s(civec_strs, norb, nelec)
+    return dm1a + dm1b
+
+def spin_square(civec_strs, norb, nelec, max_memory=2000):
+    '''<S^2> = Sz(Sz+1) + n_beta - \sum_{ij} <E^alpha_ij E^beta_ji>'''
+    neleca, nelecb = _unpack_nelec(nelec)
+    strsa, strsb = civec_strs._strs
+    linka = gen_linkstr_index(strsa, strsa, norb)
+    if strsb is strsa:
+        linkb = linka
+    else:
+        linkb = gen_linkstr_index(strsb, strsb, norb)
+    dm2ab = _make_rdm2ab(numpy.asarray(civec_strs), norb, linka, linkb,
+                         max_memory)
+    sz = (neleca - nelecb) * .5
+    ss = sz * (sz+1) + nelecb - numpy.einsum('ijji->', dm2ab)
+    s = numpy.sqrt(ss+.25) - .5
+    multip = s*2+1
+    return ss, multip
+
+
+def to_fci(civec_strs, norb, nelec):
+    '''Dense FCI vector of the selected CI vector'''
+    neleca, nelecb = _unpack_nelec(nelec)
+    strsa, strsb = civec_strs._strs
+    na = cistring.num_strings(norb, neleca)
+    nb = cistring.num_strings(norb, nelecb)
+    addra = cistring.str2addr(norb, neleca, strsa)
+    addrb = cistring.str2addr(norb, nelecb, strsb)
+    fcivec = numpy.zeros((na,nb))
+    fcivec[addra[:,None],addrb] = civec_strs
+    return fcivec
+
+def from_fci(fcivec, ci_strs, norb, nelec):
+    '''The coefficients of the given selected strings in the FCI vector'''
+    neleca, nelecb = _unpack_nelec(nelec)
+    strsa = numpy.asarray(ci_strs[0], dtype=numpy.int64)
+    strsb = numpy.asarray(ci_strs[1], dtype=numpy.int64)
+    na = cistring.num_strings(norb, neleca)
+    addra = cistring.str2addr(norb, neleca, strsa)
+    addrb = cistring.str2addr(norb, nelecb, strsb)
+    fcivec = numpy.asarray(fcivec).reshape(na,-1)
+    civec = fcivec[addra[:,None],addrb]
+    return _as_SCIvector(civec, (strsa, strsb))
+
+
+class SelectedCI(direct_spin1.FCISolver):
+    '''Selected CI solver.  It can be assigned to CASSCF.fcisolver.
+
+    Attributes:
+        select_cutoff : float
+            The heat-bath threshold |H_{ai} c_i| to select new strings.
+        max_cycle_grow : int
+            Max number of cycles to grow the selected space.
+        pt2 : bool
+            Whether to compute the Epstein-Nesbet second order correction
+            (saved in e_pt2) after the selected CI.
+        pt2_cutoff : float
+            The heat-bath threshold to select the determinants of the
+            perturbative correction.
+
+    Examples:
+
+    >>> mc = mcscf.CASSCF(mf, 20, 20)
+    >>> mc.fcisolver = fci.selected_ci.SelectedCI(mol)
+    >>> mc.fcisolver.select_cutoff = 1e-4
+    >>> mc.kernel()
+    '''
+    def __init__(self, mol=None):
+        direct_spin1.FCISolver.__init__(self, mol)
+        self.select_cutoff = 1e-3
+        self.max_cycle_grow = 20
+        self.pt2 = False
+        self.pt2_cutoff = 1e-5
+        self.davidson_only = True
+        self.pspace_size = 0
+##################################################
+# don't modify the following attributes, they are not input options
+        self.e_pt2 = None
+        self._keys = set(self.__dict__.keys())
+
+    def dump_flags(self, verbose=None):
+        direct_spin1.FCISolver.dump_flags(self, verbose)
+        if verbose is None: verbose = self.verbose
+        log = logger.Logger(self.stdout, verbose)
+        log.info('select_cutoff = %g', self.select_cutoff)
+        log.info('max_cycle_grow = %d', self.max_cycle_grow)
+        log.info('pt2 = %s  pt2_cutoff = %g', self.pt2, self.pt2_cutoff)
+
+    def contract_2e(self, eri, civec_strs, norb, nelec, link_index=None,
+                    **kwargs):
+        return contract_2e(eri, civec_strs, norb, nelec, link_index,
+                           self.max_memory)
+
+    def make_hdiag(self, h1e, eri, ci_strs, norb, nelec):
+        return make_hdiag(h1e, eri, ci_strs, norb, nelec)
+
+    def enlarge_space(self, civec_strs, h1e, eri, norb, nelec):
+        return enlarge_space(self, civec_strs, h1e, eri, norb, nelec)
+
+    def kernel(self, h1e, eri, norb, nelec, ci0=None, **kwargs):
+        if self.verbose > logger.QUIET:
+            pyscf.gto.mole.check_sanity(self, self._keys, self.stdout)
+        assert(norb < 64)
+        return kernel_float_space(self, h1e, eri, norb, nelec, ci0, **kwargs)
+
+    def approx_kernel(self, h1e, eri, norb, nelec, ci0=None, **kwargs):
+        '''Solve the CI problem in the space of ci0 without the selection.
+        This is used by the CASSCF micro iterations.'''
+        if not isinstance(ci0, SCIvector) or ci0._strs is None:
+            return self.kernel(h1e, eri, norb, nelec, ci0, **kwargs)
+        h2e = self.absorb_h1e(h1e, eri, norb, nelec, .5)
+        return _kernel_fixed_space(self, h2e, ci0, norb, nelec,
+                                   max_cycle=kwargs.get('max_cycle', None))
+
+    def enpt2(self, h1e, eri, civec_strs, norb, nelec, e_ci=None):
+        self.e_pt2 = enpt2(self, h1e, eri, civec_strs, norb, nelec, e_ci,
+                           self.pt2_cutoff, self.max_memory)
+        return self.e_pt2
+
+    def spin_square(self, civec_strs, norb, nelec):
+        return spin_square(civec_strs, norb, nelec, self.max_memory)
+
+    def make_rdm1s(self, civec_strs, norb, nelec, link_index=None):
+        return make_rdm1s(civec_strs, norb, nelec)
+
+    def make_rdm1(self, civec_strs, norb, nelec, link_index=None):
+        return make_rdm1(civec_strs, norb, nelec)
+
+    def make_rdm12s(self, civec_strs, norb, nelec, link_index=None,
+                    reorder=True):
+        return make_rdm12s(civec_strs, norb, nelec, self.max_memory)
+
+    def make_rdm12(self, civec_strs, norb, nelec, link_index=None,
+                   reorder=True):
+        return make_rdm12(civec_strs, norb, nelec, self.max_memory)
+
+    def make_rdm2(self, civec_strs, norb, nelec, link_index=None,
+                  reorder=True):
+        return make_rdm12(civec_strs, norb, nelec, self.max_memory)[1]
+
+SCI = SelectedCI
+
+
+if __name__ == '__main__':
+    from pyscf import gto
+    from pyscf import scf
+    from pyscf import ao2mo
+
+    mol = gto.Mole()
+    mol.verbose = 0
+    mol.output = None
+    mol.atom = [
+        ['H', ( 1.,-1.    , 0.   )],
+        ['H', ( 0.,-1.    ,-1.   )],
+        ['H', ( 1.,-0.5   ,-1.   )],
+        ['H', ( 0.,-0.    ,-1.   )],
+        ['H', ( 1.,-0.5   , 0.   )],
+        ['H', ( 0., 1.    , 1.   )],
+        ['H', ( 1., 2.    , 3.   )],
+        ['H', ( 1., 2.    , 4.   )],
+    ]
+    mol.basis = 'sto-3g'
+    mol.build()
+
+    m = scf.RHF(mol)
+    m.kernel()
+    norb = m.mo_coeff.shape[1]
+    nelec = mol.nelectron
+    h1e = reduce(numpy.dot, (m.mo_coeff.T, m.get_hcore(), m.mo_coeff))
+    eri = ao2mo.kernel(m._eri, m.mo_coeff, compact=False)
+    eri = eri.reshape(norb,norb,norb,norb)
+
+    e1, c1 = kernel(h1e, eri, norb, nelec, select_cutoff=1e-6)
+    e2, c2 = direct_spin1.kernel(h1e, eri, norb, nelec)
+    print(e1, e1 - e2)
@@ -58,6 +58,36 @@ class KnowValues(unittest.TestCase):
                 [[ 2, 3, 3,-1], [ 3, 6, 2, 1]]],
         self.assertTrue(numpy.allclose(idx, idx0))
 
+    def test_addr2str_array(self):
+        strs = fci.cistring.make_strings(range(7), 4)
+        self.assertTrue(numpy.all(fci.cistring.addr2str(7, 4, range(len(strs))) == strs))
+        self.assertTrue(numpy.all(fci.cistring.str2addr(7, 4, strs) == range(len(strs))))
+        self.assertEqual(fci.cistring.addr2str(7, 4, [9])[0], int('0b110011',2))
+        occslst = fci.cistring.gen_occslst(range(7), 4)
+        self.assertEqual(occslst[9].tolist(), [0, 1, 4, 5])
+
+    def test_string_space_cache(self):
+        idx1 = fci.cistring.gen_linkstr_index_trilidx(range(8), 4)
+        idx2 = fci.cistring.gen_linkstr_index_trilidx(range(8), 4)
+        self.assertTrue(idx1 is idx2)
+        self.assertFalse(idx1.flags.writeable)
+        ref = fci.cistring._gen_linkstr_index(range(8), 4, None, 1)
+        self.assertTrue(numpy.all(idx1[:,:,[0,2,3]] == ref[:,:,[0,2,3]]))
+
+        fci.cistring.string_space.cache_clear()
+        idx2 = fci.cistring.gen_linkstr_index_trilidx(range(8), 4)
+        self.assertFalse(idx1 is idx2)
+        self.assertTrue(numpy.all(idx1[:,:,[0,2,3]] == idx2[:,:,[0,2,3]]))
+
+        max_memory_bak = fci.cistring.STRING_SPACE_CACHE_MAX_MEMORY
+        fci.cistring.STRING_SPACE_CACHE_MAX_MEMORY = idx2.nbytes*1.5e-6
+        fci.cistring.gen_linkstr_index_trilidx(range(8), 3)
+        fci.cistring.gen_linkstr_index_trilidx(range(8), 2)
+        self.assertFalse((8,4) in fci.cistring._string_space_cache)
+        self.assertTrue((8,3) in fci.cistring._string_space_cache)
+        self.assertTrue((8,2) in fci.cistring._string_space_cache)
+        fci.cistring.STRING_SPACE_CACHE_MAX_MEMORY = max_memory_bak
+
 
 if __name__ == "__main__":
     print("Full Tests for CI string")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+import unittest
+from functools import reduce
+import numpy
+from pyscf import gto
+from pyscf import scf
+from pyscf import ao2mo
+from pyscf import fci
+from pyscf import mcscf
+from pyscf.fci import selected_ci
+
+mol = gto.Mole()
+mol.verbose = 0
+mol.output = None
+mol.atom = [
+    ['H', ( 1.,-1.    , 0.   )],
+    ['H', ( 0.,-1.    ,-1.   )],
+    ['H', ( 0.,-0.5   ,-0.   )],
+    ['H', ( 0.,-0.    ,-1.   )],
+    ['H', ( 1.,-0.5   , 0.   )],
+    ['H', ( 0., 1.    , 1.   )],
+]
+
+mol.basis = {'H': 'sto-3g'}
+mol.build()
+
+m = scf.RHF(mol)
+m.conv_tol = 1e-15
+ehf = m.scf()
+
+norb = m.mo_coeff.shape[1]
+nelec = (mol.nelectron//2, mol.nelectron//2)
+h1e = reduce(numpy.dot, (m.mo_coeff.T, m.get_hcore(), m.mo_coeff))
+g2e = ao2mo.incore.general(m._eri, (m.mo_coeff,)*4, compact=False)
+g2e = g2e.reshape([norb]*4)
+
+def full_strs(norb, nelec):
+    strsa = fci.cistring.gen_strings4orblist(range(norb), nelec[0])
+    strsb = fci.cistring.gen_strings4orblist(range(norb), nelec[1])
+    return (numpy.asarray(strsa, dtype=numpy.int64),
+            numpy.asarray(strsb, dtype=numpy.int64))
+
+class KnowValues(unittest.TestCase):
+    def test_contract(self):
+        neleci = (nelec[0], nelec[1]-1)
+        ci_strs = full_strs(norb, neleci)
+        numpy.random.seed(1)
+        ci0 = numpy.random.random((len(ci_strs[0]),len(ci_strs[1])))
+        h2e = fci.direct_spin1.absorb_h1e(h1e, g2e, norb, neleci, .5)
+        ci1ref = fci.direct_spin1.contract_2e(h2e, ci0, norb, neleci)
+        civec = selected_ci._as_SCIvector(ci0, ci_strs)
+        ci1 = selected_ci.contract_2e(h2e, civec, norb, neleci)
+        self.assertTrue(numpy.allclose(ci1, ci1ref))
+        # the intermediates are blocked over the rows and the columns
+        ci1 = selected_ci.contract_2e(h2e, civec, norb, neleci, max_memory=0)
+        self.assertTrue(numpy.allclose(ci1, ci1ref))
+
+        hdiag = selected_ci.make_hdiag(h1e, g2e, ci_strs, norb, neleci)
+        hdiagref = fci.direct_spin1.make_hdiag(h1e, g2e, norb, neleci)
+        self.assertTrue(numpy.allclose(hdiag, hdiagref))
+
+    def test_kernel(self):
+        myci = selected_ci.SelectedCI()
+        myci.select_cutoff = 1e-9
+        e, c = myci.kernel(h1e, g2e, norb, nelec)
+        eref, cref = fci.direct_spin1.kernel(h1e, g2e, norb, nelec)
+        self.assertAlmostEqual(e, eref, 9)
+        self.assertEqual(c.shape, cref.shape)
+
+        dm1, dm2 = myci.make_rdm12(c, norb, nelec)
+        cfci = selected_ci.to_fci(c, norb, nelec)
+        dm1ref, dm2ref = fci.direct_spin1.make_rdm12(cfci, norb, nelec)
+        self.assertTrue(numpy.allclose(dm1, dm1ref))
+        self.assertTrue(numpy.allclose(dm2, dm2ref))
+        self.assertAlmostEqual(myci.spin_square(c, norb, nelec)[0],
+                               fci.spin_op.spin_square0(cfci, norb, nelec)[0], 9)
+
+    def test_rdm12s(self):
+        neleci = (nelec[0], nelec[1]-1)
+        ci_strs = full_strs(norb, neleci)
+        numpy.random.seed(2)
+        ci0 = numpy.random.random((len(ci_strs[0]),len(ci_strs[1])))
+        ci0 /= numpy.linalg.norm(ci0)
+        civec = selected_ci._as_SCIvector(ci0, ci_strs)
+        dm1s, dm2s = selected_ci.make_rdm12s(civec, norb, neleci)
+        dm1ref, dm2ref = fci.direct_spin1.make_rdm12s(ci0, norb, neleci)
+        for i in range(2):
+            self.assertTrue(numpy.allclose(dm1s[i], dm1ref[i]))
+        for i in range(3):
+            self.assertTrue(numpy.allclose(dm2s[i], dm2ref[i]))
+        self.assertAlmostEqual(selected_ci.spin_square(civec, norb, neleci)[0],
+                               fci.spin_op.spin_square0(ci0, norb, neleci)[0], 9)
+
+    def test_select_pt2(self):
+        eref = fci.direct_spin1.kernel(h1e, g2e, norb, nelec)[0]
+        myci = selected_ci.SelectedCI()
+        myci.select_cutoff = 1e-2
+        myci.pt2 = True
+        myci.pt2_cutoff = 1e-9
+        e, c = myci.kernel(h1e, g2e, norb, nelec)
+        self.assertTrue(e > eref - 1e-9)
+        self.assertTrue(myci.e_pt2 < 1e-12)
+        self.assertTrue(abs(e+myci.e_pt2-eref) < abs(e-eref)+1e-9)
+
+        e1 = myci.approx_kernel(h1e, g2e, norb, nelec, ci0=c)[0]
+        self.assertAlmostEqual(e1, e, 9)
+
+        myci.max_cycle_grow = 0
+        e1, c1 = myci.kernel(h1e, g2e, norb, nelec, ci0=c)
+        self.assertAlmostEqual(e1, e, 9)
+        self.assertEqual(c1.shape, c.shape)
+
+    def test_casscf(self):
+        mc0 = mcscf.CASSCF(m, 4, 4)
+        mc0.conv_tol = 1e-10
+        e0 = mc0.kernel()[0]
+
+        mc1 = mcscf.CASSCF(m, 4, 4)
+        mc1.conv_tol = 1e-10
+        mc1.fcisolver = selected_ci.SCI(mol)
+        mc1.fcisolver.select_cutoff = 1e-10
+        e1 = mc1.kernel()[0]
+        self.assertAlmostEqual(e1, e0, 8)
+
+
+if __name__ == "__main__":
+    print("Full Tests for selected CI")
+    unittest.main()
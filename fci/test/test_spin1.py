@@ -57,6 +57,24 @@ class KnowValues(unittest.TestCase):
         ci3 = fci.direct_spin1.contract_2e(g2e, ci2, norb, neleci)
         self.assertAlmostEqual(numpy.linalg.norm(ci3), 127.49780293866368, 8)
 
+    def test_contract_multi(self):
+        ci1ref = [fci.direct_spin1.contract_2e(g2e, c, norb, neleci)
+                  for c in (ci2, ci3)]
+        ci1 = fci.direct_spin1.contract_2e_multi(g2e, [ci2, ci3], norb, neleci)
+        self.assertTrue(numpy.allclose(ci1[0], ci1ref[0]))
+        self.assertTrue(numpy.allclose(ci1[1], ci1ref[1]))
+        ci1 = fci.direct_spin1.contract_2e_multi(g2e, [ci2, ci3], norb, neleci,
+                                                 max_memory=0)
+        self.assertTrue(numpy.allclose(ci1[1], ci1ref[1]))
+
+    def test_kernel_nroots(self):
+        e1, c1 = fci.direct_spin1.kernel(h1e, g2e, norb, neleci, nroots=4)
+        myci = fci.direct_nosym.FCISolver()
+        myci.nroots = 4
+        e2, c2 = myci.kernel(h1e, g2e, norb, neleci)
+        self.assertTrue(numpy.allclose(e1, e2))
+        self.assertAlmostEqual(e1[0], -8.7498253981782, 8)
+
     def test_kernel(self):
         eref, cref = fci.direct_spin0.kernel(h1e, g2e, norb, mol.nelectron)
         e, c = fci.direct_spin1.kernel(h1e, g2e, norb, nelec)
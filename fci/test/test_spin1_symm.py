@@ -46,6 +46,67 @@ class KnowValues(unittest.TestCase):
         e = fci.direct_spin1_symm.energy(h1e, g2e, c, norb, nelec)
         self.assertAlmostEqual(e, -84.200905534209554, 8)
 
+    def test_contract_blocked(self):
+        blocks = fci.direct_spin1_symm.IrrepBlocks(norb, nelec, orbsym, 0)
+        ci1 = blocks.pack(ci0)
+        self.assertTrue(ci1.size*3 < ci0.size)
+        ci2 = fci.direct_spin1_symm.contract_2e(g2e, ci1, norb, nelec)
+        ci2ref = fci.direct_spin1.contract_2e(g2e, blocks.unpack(ci1), norb, nelec)
+        self.assertTrue(numpy.allclose(blocks.unpack(ci2), ci2ref))
+
+        dm1, dm2 = fci.direct_spin1_symm.make_rdm12(ci1, norb, nelec)
+        dm1ref, dm2ref = fci.direct_spin1.make_rdm12(blocks.unpack(ci1), norb, nelec)
+        self.assertTrue(numpy.allclose(dm1, dm1ref))
+        self.assertTrue(numpy.allclose(dm2, dm2ref))
+
+    def test_hdiag_blocked(self):
+        blocks = fci.direct_spin1_symm.IrrepBlocks(norb, nelec, orbsym, 0)
+        hdiag = fci.direct_spin1_symm.make_hdiag_blocked(h1e, g2e, norb, nelec,
+                                                         blocks)
+        hdiag0 = fci.direct_spin1.make_hdiag(h1e, g2e, norb, nelec)
+        self.assertTrue(hdiag._irrep_blocks is blocks)
+        self.assertTrue(numpy.allclose(hdiag, blocks.pack(hdiag0)))
+
+        addr, h0 = fci.direct_spin1_symm.pspace_blocked(h1e, g2e, norb, nelec,
+                                                        hdiag, blocks, 20)
+        addr0 = blocks.address()[addr]
+        h2e = fci.direct_spin1.absorb_h1e(h1e, g2e, norb, nelec, .5)
+        hc = []
+        for i in addr0:
+            x = numpy.zeros(hdiag0.size)
+            x[i] = 1
+            hc.append(fci.direct_spin1.contract_2e(h2e, x, norb, nelec).ravel())
+        h0ref = numpy.asarray(hc)[:,addr0]
+        self.assertTrue(numpy.allclose(h0, h0ref))
+
+    def test_kernel_blocked(self):
+        e, c = fci.direct_spin1_symm.kernel_blocked(cis, h1e, g2e, norb, nelec,
+                                                    nroots=2)
+        self.assertAlmostEqual(e[0], -84.200905534209554, 8)
+        self.assertTrue(c[0].size < ci0.size)
+        e1 = fci.direct_spin1_symm.energy(h1e, g2e, c[1], norb, nelec)
+        self.assertAlmostEqual(e1, e[1], 8)
+        dm1 = cis.make_rdm1(c[0], norb, nelec)
+        self.assertAlmostEqual(dm1.trace(), nelec, 9)
+
+        # the layout and link matrices are reused by the next call
+        irrep_blocks = c[0]._irrep_blocks
+        e1, c1 = fci.direct_spin1_symm.kernel_blocked(cis, h1e, g2e, norb, nelec,
+                                                      nroots=2, pspace_size=20,
+                                                      davidson_only=True)
+        self.assertTrue(c1[0]._irrep_blocks is irrep_blocks)
+        self.assertAlmostEqual(e1[0], e[0], 8)
+        self.assertAlmostEqual(e1[1], e[1], 8)
+
+        # the pspace covers all determinants of the irrep
+        e1, c1 = fci.direct_spin1_symm.kernel_blocked(cis, h1e, g2e, norb, nelec,
+                                                      nroots=2, pspace_size=400,
+                                                      davidson_only=False)
+        self.assertTrue(irrep_blocks.size < 400)
+        self.assertAlmostEqual(e1[0], e[0], 8)
+        self.assertAlmostEqual(e1[1], e[1], 8)
+        self.assertAlmostEqual(abs(numpy.dot(c1[0], c[0])), 1, 8)
+
 
 if __name__ == "__main__":
     print("Full Tests for spin1-symm")
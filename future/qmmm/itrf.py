@@ -10,9 +10,25 @@ from pyscf import df
 
 '''
 QM part interface
+
+The MM charges within rcut of the QM center (the center of the nuclear
+charges) are the near-field charges.  Their potential integrals are computed
+exactly, in blocks of charges which fit mol.max_memory.  The far-field charges
+(beyond rcut) are replaced by the pseudo charges on the sphere of radius rcut,
+which reproduce the potential, the field and the field gradient of the
+far-field charges at the QM center, i.e. the far-field potential is exact up
+to the quadrupole term of its expansion in the QM region.  In the gradients
+the pseudo charges are kept fixed (see :func:`mm_charge_grad`).
 '''
 
-def mm_charge(method, coords, charges):
+# The pseudo charges of the far field are put on the vertices of octahedron
+# and cube
+_SPHERE_POINTS = numpy.vstack((numpy.eye(3), -numpy.eye(3),
+                               numpy.array([(x,y,z) for x in (-1,1)
+                                            for y in (-1,1)
+                                            for z in (-1,1)])/numpy.sqrt(3)))
+
+def mm_charge(method, coords, charges, rcut=None):
     '''Modify the QM method using the potential generated by MM charges.
 
     Args:
@@ -23,6 +39,13 @@ def mm_charge(method, coords, charges):
         charges : 1D array
             MM particle charges
 
+    Kwargs:
+        rcut : float
+            The charges farther than rcut (in Bohr) from the QM center are
+            treated by the multipole expansion.  rcut needs to be larger than
+            the size of the QM region.  Default is None, all charges are
+            treated exactly.
+
     Returns:
         Same method object as the input method with modified 1e Hamiltonian
 
@@ -53,20 +76,29 @@ def mm_charge(method, coords, charges):
             else:  # post-HF objects
                 h1e = method._scf.get_hcore(mol)
 
+            if mol is None: mol = self.mol
             if 0: # For debug
                 v = 0
                 for i,q in enumerate(charges):
                     mol.set_rinv_origin_(coords[i])
                     v += mol.intor('cint1e_rinv_sph') * q
             else:
-                fakemol = _make_fakemol(coords)
-                j3c = df.incore.aux_e2(mol, fakemol, intor='cint3c2e_sph', aosym='s2ij')
-                v = lib.unpack_tril(numpy.einsum('xk,k->x', j3c, charges))
+                q_coords, q = effective_charges(mol, coords, charges, rcut)
+                nao = mol.nao_nr()
+                blksize = _blksize(nao*(nao+1)//2, mol.max_memory)
+                v = 0
+                for p0, p1 in lib.prange(0, len(q), blksize):
+                    fakemol = _make_fakemol(q_coords[p0:p1])
+                    j3c = df.incore.aux_e2(mol, fakemol, intor='cint3c2e_sph',
+                                           aosym='s2ij')
+                    v += numpy.dot(j3c, q[p0:p1])
+                    j3c = None
+                v = lib.unpack_tril(v)
             return h1e + v
 
     return QMMM()
 
-def mm_charge_grad(method, coords, charges):
+def mm_charge_grad(method, coords, charges, rcut=None):
     '''Apply the MM charges in the QM gradients' method.  It affects both the
     electronic and nuclear parts of the QM fragment.
 
@@ -79,6 +111,17 @@ def mm_charge_grad(method, coords, charges):
         charges : 1D array
             MM particle charges
 
+    Kwargs:
+        rcut : float
+            The cutoff of the near-field charges, see :func:`mm_charge`.
+            It needs to be the same to the rcut of the mm_charge energy.
+            The pseudo charges of the far field are taken as fixed charges.
+            Their dependence on the QM center, which moves with the QM
+            nuclei, is not differentiated.  The error of this approximation
+            is of the order of the error of the multipole expansion of the
+            far field.  The nuclear part (grad_nuc) uses all MM charges
+            exactly.
+
     Returns:
         Same gradeints method object as the input method
 
@@ -112,11 +155,17 @@ def mm_charge_grad(method, coords, charges):
                     mol.set_rinv_origin_(coords[i])
                     v += mol.intor('cint1e_iprinv_sph') * q
             else:
-                fakemol = _make_fakemol(coords)
-                j3c = df.incore.aux_e2(mol, fakemol, intor='cint3c2e_ip1_sph',
-                                       aosym='s1', comp=3)
-                v = numpy.einsum('ixk,k->ix', j3c, charges).reshape(3,nao,nao)
-            return method.get_hcore(mol) - v
+                q_coords, q = effective_charges(mol, coords, charges, rcut)
+                blksize = _blksize(3*nao*nao, mol.max_memory)
+                v = 0
+                for p0, p1 in lib.prange(0, len(q), blksize):
+                    fakemol = _make_fakemol(q_coords[p0:p1])
+                    j3c = df.incore.aux_e2(mol, fakemol, intor='cint3c2e_ip1_sph',
+                                           aosym='s1', comp=3)
+                    v += numpy.dot(j3c, q[p0:p1])
+                    j3c = None
+                v = v.reshape(3,nao,nao)
+            return g_qm - v
 
         def grad_nuc(self, mol=None, atmlst=None):
             if mol is None: mol = method.mol
@@ -132,6 +181,57 @@ def mm_charge_grad(method, coords, charges):
             return g_qm + g_mm
     return QMMM()
 
+def effective_charges(mol, coords, charges, rcut=None):
+    '''The near-field MM charges and the pseudo charges of the far field
+
+    Returns:
+        coords, charges
+    '''
+    coords = numpy.asarray(coords, order='C')
+    charges = numpy.asarray(charges)
+    if rcut is None:
+        return coords, charges
+
+    qm_charges = numpy.array([mol.atom_charge(i) for i in range(mol.natm)])
+    qm_coords = numpy.array([mol.atom_coord(i) for i in range(mol.natm)])
+    center = numpy.dot(qm_charges, qm_coords) / qm_charges.sum()
+    r = lib.norm(coords-center, axis=1)
+    near = r < rcut
+    if numpy.all(near):
+        return coords, charges
+
+    rfar = coords[~near] - center
+    qfar = charges[~near]
+    sph = _SPHERE_POINTS * rcut
+    a = multipoles(sph, numpy.eye(len(sph)))
+    b = multipoles(rfar, qfar)
+    qsph = numpy.linalg.lstsq(a, b, rcond=1e-10)[0]
+    return (numpy.vstack((coords[near], sph+center)),
+            numpy.hstack((charges[near], qsph)))
+
+def multipoles(r, q):
+    '''The potential, field and field gradient at the origin generated by
+    the charges q at r, to match the multipole expansion of the potential
+
+        sum_k q_k/|r_k-x| = phi + x.g + 1/2 x.h.x + ...
+
+    Returns:
+        (10,) array for a vector q or (10,K) array for the (N,K) matrix q
+    '''
+    r = numpy.asarray(r)
+    r2 = numpy.einsum('ix,ix->i', r, r)
+    rinv = 1 / numpy.sqrt(r2)
+    phi = rinv
+    g = r * rinv[:,None]**3
+    idx, idy = numpy.tril_indices(3)
+    h = 3 * r[:,idx] * r[:,idy]
+    h[:,idx==idy] -= r2[:,None]
+    h *= rinv[:,None]**5
+    return numpy.dot(numpy.hstack((phi[:,None], g, h)).T, q)
+
+def _blksize(unit, max_memory):
+    return max(1, int(max_memory*.5e6/8/unit))
+
 def _make_fakemol(coords):
     nbas = coords.shape[0]
     fakeatm = numpy.zeros((nbas,gto.ATM_SLOTS), dtype=numpy.int32)
@@ -0,0 +1,48 @@
+import unittest
+import numpy
+from pyscf import gto, scf, grad
+from pyscf import qmmm
+
+mol = gto.Mole()
+mol.atom = ''' O                  0.00000000    0.00000000   -0.11081188
+               H                 -0.00000000   -0.84695236    0.59109389
+               H                 -0.00000000    0.89830571    0.52404783 '''
+mol.basis = 'cc-pvdz'
+mol.output = '/dev/null'
+mol.build()
+
+# a cloud of charges 30 Bohr away from the QM region
+numpy.random.seed(1)
+coords = numpy.random.random((20,3))*6 + numpy.array((25.,12.,-18.))
+charges = numpy.random.random(20) - .5
+
+class KnowValues(unittest.TestCase):
+    def test_effective_charges(self):
+        qm_charges = numpy.array([mol.atom_charge(i) for i in range(mol.natm)])
+        qm_coords = numpy.array([mol.atom_coord(i) for i in range(mol.natm)])
+        center = numpy.dot(qm_charges, qm_coords) / qm_charges.sum()
+        q_coords, q = qmmm.itrf.effective_charges(mol, coords, charges, 15)
+        self.assertEqual(len(q), len(qmmm.itrf._SPHERE_POINTS))
+        self.assertTrue(numpy.allclose(qmmm.itrf.multipoles(q_coords-center, q),
+                                       qmmm.itrf.multipoles(coords-center, charges)))
+
+        q_coords, q = qmmm.itrf.effective_charges(mol, coords, charges, 60)
+        self.assertTrue(numpy.allclose(q, charges))
+
+    def test_rcut(self):
+        mf0 = qmmm.mm_charge(scf.RHF(mol), coords, charges)
+        mf0.conv_tol = 1e-11
+        e0 = mf0.kernel()
+        mf1 = qmmm.mm_charge(scf.RHF(mol), coords, charges, rcut=15)
+        mf1.conv_tol = 1e-11
+        e1 = mf1.kernel()
+        self.assertAlmostEqual(e1, e0, 4)
+
+        g0 = qmmm.mm_charge_grad(grad.RHF(mf0), coords, charges).kernel()
+        g1 = qmmm.mm_charge_grad(grad.RHF(mf1), coords, charges, rcut=15).kernel()
+        self.assertTrue(abs(g1-g0).max() < 1e-4)
+
+
+if __name__ == "__main__":
+    print("Full Tests for qmmm")
+    unittest.main()
@@ -7,6 +7,7 @@ import numpy
 import ctypes
 import _ctypes
 import pyscf.lib
+from pyscf.lib import intcache
 
 libcgto = pyscf.lib.load_library('libcgto')
 libcgto.CINTcgto_cart.restype = ctypes.c_int
@@ -157,12 +158,18 @@ def getints(intor_name, atm, bas, env, bras=None, kets=None, comp=1, hermi=0,
       [-0.48176097 -0.10289944]]]
     '''
     if intor_name.startswith('cint1e') or intor_name.startswith('ECP'):
-        return getints1e(intor_name, atm, bas, env, bras, kets, comp, hermi)
+        fn = lambda: getints1e(intor_name, atm, bas, env, bras, kets, comp,
+                               hermi)
     elif intor_name.startswith('cint2e'):
-        return getints2e(intor_name, atm, bas, env, bras, kets, comp,
-                         aosym, out)
+        fn = lambda: getints2e(intor_name, atm, bas, env, bras, kets, comp,
+                               aosym, out)
     else:
         raise RuntimeError('Unknown intor')
+    if out is None and intcache.enabled():
+        return intcache.load_or_compute(intor_name, atm, bas, env, fn,
+                                        bras, kets, comp, hermi, aosym)
+    else:
+        return fn()
 
 def getints1e(intor_name, atm, bas, env, bras=None, kets=None, comp=1, hermi=0):
     if bras is None:
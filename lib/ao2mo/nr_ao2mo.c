@@ -1116,7 +1116,7 @@ void AO2MOnr_e1_drv(int (*intor)(), int (*cgto_in_shell)(), void (*fill)(),
         assert(eri_ao);
         AO2MOnr_e1fill_drv(intor, cgto_in_shell, fill,
                            eri_ao, klsh_start, klsh_count,
-                           nkl, ncomp, cintopt, vhfopt,
+                           nkl, ncomp, NULL, cintopt, vhfopt,
                            atm, natm, bas, nbas, env);
         AO2MOnr_e2_drv(ftrans, fmmm, eri, eri_ao, mo_coeff,
                        nkl*ncomp, nao, i_start, i_count, j_start, j_count,
@@ -1161,11 +1161,12 @@ void AO2MOnr_e2_drv(void (*ftrans)(), int (*fmmm)(),
  */
 void AO2MOnr_e1fill_drv(int (*intor)(), int (*cgto_in_shell)(), void (*fill)(),
                         double *eri, int klsh_start, int klsh_count, int nkl,
-                        int ncomp, CINTOpt *cintopt, CVHFOpt *vhfopt,
+                        int ncomp, int *ish_order,
+                        CINTOpt *cintopt, CVHFOpt *vhfopt,
                         int *atm, int natm, int *bas, int nbas, double *env)
 {
         int *ao_loc = malloc(sizeof(int)*(nbas+1));
-        int ish, di;
+        int i, ish, di;
         int nao = 0;
         int dmax = 0;
         for (ish = 0; ish < nbas; ish++) {
@@ -1186,12 +1187,20 @@ void AO2MOnr_e1fill_drv(int (*intor)(), int (*cgto_in_shell)(), void (*fill)(),
         }
 
 #pragma omp parallel default(none) \
-        shared(fill, fprescreen, eri, envs, intor, nkl, nbas, dmax, ncomp) \
-        private(ish)
+        shared(fill, fprescreen, eri, envs, intor, nkl, nbas, dmax, ncomp, \
+               ish_order) \
+        private(i, ish)
 {
         double *buf = malloc(sizeof(double)*dmax*dmax*dmax*dmax*ncomp);
 #pragma omp for schedule(dynamic, 1)
-        for (ish = 0; ish < nbas; ish++) {
+        for (i = 0; i < nbas; i++) {
+                // ish_order puts the costly shells first so that the threads
+                // do not wait for the last expensive shell
+                if (ish_order != NULL) {
+                        ish = ish_order[i];
+                } else {
+                        ish = i;
+                }
                 (*fill)(intor, fprescreen, eri, buf, nkl, ish, &envs);
         }
         free(buf);
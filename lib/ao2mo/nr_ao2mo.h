@@ -26,7 +26,8 @@ struct _AO2MOEnvs {
 
 void AO2MOnr_e1fill_drv(int (*intor)(), int (*cgto_in_shell)(), void (*fill)(),
                         double *eri, int klsh_start, int klsh_count, int nkl,
-                        int ncomp, CINTOpt *cintopt, CVHFOpt *vhfopt,
+                        int ncomp, int *ish_order,
+                        CINTOpt *cintopt, CVHFOpt *vhfopt,
                         int *atm, int natm, int *bas, int nbas, double *env);
 
 void AO2MOnr_e1_drv(int (*intor)(), int (*cgto_in_shell)(), void (*fill)(),
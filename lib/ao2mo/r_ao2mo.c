@@ -790,7 +790,8 @@ void AO2MOr_e1_drv(int (*intor)(), void (*fill)(),
                    double complex *eri, double complex *mo_coeff,
                    int klsh_start, int klsh_count, int nkl,
                    int i_start, int i_count, int j_start, int j_count,
-                   int ncomp, CINTOpt *cintopt, CVHFOpt *vhfopt, int *tao,
+                   int ncomp, int *ish_order,
+                   CINTOpt *cintopt, CVHFOpt *vhfopt, int *tao,
                    int *atm, int natm, int *bas, int nbas, double *env)
 {
         int *ao_loc = malloc(sizeof(int)*(nbas+1));
@@ -823,10 +824,15 @@ void AO2MOr_e1_drv(int (*intor)(), void (*fill)(),
         }
 
 #pragma omp parallel default(none) \
-        shared(fill, fprescreen, eri_ao, envs, intor, nkl, nbas) \
-        private(ish)
+        shared(fill, fprescreen, eri_ao, envs, intor, nkl, nbas, ish_order) \
+        private(i, ish)
 #pragma omp for nowait schedule(dynamic)
-        for (ish = 0; ish < nbas; ish++) {
+        for (i = 0; i < nbas; i++) {
+                if (ish_order != NULL) {
+                        ish = ish_order[i];
+                } else {
+                        ish = i;
+                }
                 (*fill)(intor, fprescreen, eri_ao, nkl, ish, &envs, 0);
         }
 
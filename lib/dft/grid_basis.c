@@ -2,6 +2,7 @@
  * Author: Qiming Sun <osirpt.sun@gmail.com>
  */
 
+#include <stdlib.h>
 #include <string.h>
 #include <math.h>
 #include "cint.h"
@@ -13,6 +14,7 @@
 #define NPRIMAX         64
 #define BLKSIZE         96
 #define EXPCUTOFF       50  // 1e-22
+#define BECKE_BLKSIZE   128
 #define MIN(X,Y)        ((X)<(Y)?(X):(Y))
 #define MAX(X,Y)        ((X)>(Y)?(X):(Y))
 
@@ -83,3 +85,60 @@ void VXCoriginal_becke(double *out, double *g, int n)
         }
 }
 }
+
+/*
+ * Cell functions P_i(r) (natm,ngrids) of the original Becke scheme for the
+ * grids coords (ngrids,3).  atm_dist is the (natm,natm) inter-atomic
+ * distance, radii_table the (natm,natm) atomic size adjustment a_ij of the
+ * pairs i > j, or NULL if the atomic radii are not adjusted.
+ */
+void VXCgen_grid(double *out, double *coords, double *atm_coords,
+                 double *atm_dist, double *radii_table, int natm, int ngrids)
+{
+        int ip, n, nblk, i, j;
+        double dx, dy, dz, fac, a, g, s;
+        double *gdist, *pi, *pj;
+
+#pragma omp parallel default(none) \
+        shared(out, coords, atm_coords, atm_dist, radii_table, natm, ngrids) \
+        private(ip, n, nblk, i, j, dx, dy, dz, fac, a, g, s, gdist, pi, pj)
+{
+        gdist = malloc(sizeof(double) * natm * BECKE_BLKSIZE);
+#pragma omp for nowait schedule(static)
+        for (ip = 0; ip < ngrids; ip += BECKE_BLKSIZE) {
+                nblk = MIN(ngrids-ip, BECKE_BLKSIZE);
+                for (i = 0; i < natm; i++) {
+                        for (n = 0; n < nblk; n++) {
+                                dx = coords[(ip+n)*3+0] - atm_coords[i*3+0];
+                                dy = coords[(ip+n)*3+1] - atm_coords[i*3+1];
+                                dz = coords[(ip+n)*3+2] - atm_coords[i*3+2];
+                                gdist[i*BECKE_BLKSIZE+n] = sqrt(dx*dx+dy*dy+dz*dz);
+                                out[i*ngrids+ip+n] = 1;
+                        }
+                }
+
+                for (i = 1; i < natm; i++) {
+                for (j = 0; j < i; j++) {
+                        fac = 1 / atm_dist[i*natm+j];
+                        if (radii_table != NULL) {
+                                a = radii_table[i*natm+j];
+                        } else {
+                                a = 0;
+                        }
+                        pi = out + i * ngrids + ip;
+                        pj = out + j * ngrids + ip;
+                        for (n = 0; n < nblk; n++) {
+                                g = (gdist[i*BECKE_BLKSIZE+n] -
+                                     gdist[j*BECKE_BLKSIZE+n]) * fac;
+                                g += a * (1 - g*g);
+                                s = (3 - g*g) * g * .5;
+                                s = (3 - s*s) * s * .5;
+                                s = (3 - s*s) * s * .5;
+                                pi[n] *= .5 * (1 - s);
+                                pj[n] *= .5 * (1 + s);
+                        }
+                } }
+        }
+        free(gdist);
+}
+}
@@ -29,6 +29,21 @@ class DIIS(object):
             DIIS subspace size. The maximum number of the vectors to be stored.
         min_space
             The minimal size of subspace before DIIS extrapolation.
+        err_vec_dtype : numpy dtype
+            If given (e.g. numpy.float32), the error vectors are stored in
+            this precision.  The DIIS matrix is still accumulated in the
+            precision of the input vectors.  Default is None, the precision
+            of the input error vectors.
+        max_memory : float or int
+            Memory (in MB) to hold the vectors.  When the vectors exceed
+            this size, the oldest vectors are moved to the hdf5 file.
+            Default is None, which keeps the vectors smaller than
+            INCORE_SIZE in memory and saves the others in the file.
+        autoflush : bool
+            If filename is given, whether to write the vectors to the file
+            as soon as they are pushed.  If False, the vectors in memory are
+            written when :func:`flush` is called, e.g. at the checkpoints of
+            the caller.  Default is True.
 
     Functions:
         update(x, xerr=None) :
@@ -91,6 +106,9 @@ class DIIS(object):
             self.stdout = sys.stdout
         self.space = 6
         self.min_space = 1
+        self.err_vec_dtype = None
+        self.max_memory = None
+        self.autoflush = True
 
 ##################################################
 # don't modify the following private variables, they are not input options
@@ -101,6 +119,8 @@ class DIIS(object):
             self._tmpfile = tempfile.NamedTemporaryFile()
             self._diisfile = h5py.File(self._tmpfile.name, 'w')
         self._buffer = {}
+        self._buffer_keys = [] # the order the vectors were put in _buffer
+        self._unsaved = set()  # the keys in _buffer which are not in the file
         self._bookkeep = [] # keep the ordering of input vectors
         self._head = 0
         self._H = None
@@ -108,29 +128,85 @@ class DIIS(object):
         self._err_vec_touched = False
 
     def __del__(self):
+        if isinstance(self.filename, str) and self._unsaved:
+            self.flush()
         self._diisfile.close()
         self._tmpfile = None
 
-    def _store(self, key, value):
-        if value.size < INCORE_SIZE:
-            self._buffer[key] = value
+    def _incore(self, nbytes):
+        if self.max_memory is None:
+            return nbytes < INCORE_SIZE * 8
+        else:
+            return nbytes < self.max_memory * 1e6
 
-        # save the error vector if filename is given, this file can be used to
-        # restore the DIIS state
-        if value.size >= INCORE_SIZE or isinstance(self.filename, str):
-            if key in self._diisfile:
+    def _err_dtype(self, dtype):
+        if self.err_vec_dtype is None:
+            return dtype
+        elif numpy.dtype(dtype).kind == 'c':
+            return numpy.promote_types(self.err_vec_dtype, numpy.complex64)
+        else:
+            return numpy.dtype(self.err_vec_dtype)
+
+    def _write(self, key, value):
+        if key in self._diisfile:
+            if (self._diisfile[key].shape == value.shape and
+                self._diisfile[key].dtype == value.dtype):
                 self._diisfile[key][:] = value
-            else:
-                self._diisfile[key] = value
+                return
+            del(self._diisfile[key])
+        self._diisfile[key] = value
+
+    def _store(self, key, value):
+        if key in self._buffer:
+            self._buffer_keys.remove(key)
+            del(self._buffer[key])
+        self._unsaved.discard(key)
+
+        if self._incore(value.nbytes):
+            self._buffer[key] = value
+            self._buffer_keys.append(key)
+            # save the vectors if filename is given, this file can be used
+            # to restore the DIIS state
+            if isinstance(self.filename, str):
+                self._unsaved.add(key)
+                if self.autoflush:
+                    self.flush()
+            self._spill_()
+        else:
+            self._write(key, value)
+            if self.autoflush:
 # to avoid "Unable to find a valid file signature" error when reopen from crash
-            self._diisfile.flush()
+                self._diisfile.flush()
+
+    def _spill_(self):
+        '''Move the oldest vectors to the file until the vectors in memory
+        fit in max_memory'''
+        if self.max_memory is None:
+            return
+        nbytes = sum([self._buffer[k].nbytes for k in self._buffer_keys])
+        while self._buffer_keys and nbytes > self.max_memory * 1e6:
+            key = self._buffer_keys.pop(0)
+            value = self._buffer.pop(key)
+            if key in self._unsaved or not isinstance(self.filename, str):
+                self._write(key, value)
+            self._unsaved.discard(key)
+            nbytes -= value.nbytes
+
+    def flush(self):
+        '''Write the vectors which are held in memory only to the file'''
+        for key in self._buffer_keys:
+            if key in self._unsaved:
+                self._write(key, self._buffer[key])
+        self._unsaved.clear()
+        self._diisfile.flush()
 
     def push_err_vec(self, xerr):
         self._err_vec_touched = True
         if self._head >= self.space:
             self._head = 0
         key = 'e%d' % self._head
-        self._store(key, xerr.ravel())
+        xerr = xerr.ravel()
+        self._store(key, numpy.asarray(xerr, dtype=self._err_dtype(xerr.dtype)))
 
     def push_vec(self, x):
         x = x.ravel()
@@ -160,28 +236,38 @@ class DIIS(object):
             ekey = 'e%d'%self._head
             xkey = 'x%d'%self._head
             self._store(xkey, x)
-            if x.size < INCORE_SIZE:
-                self._buffer[ekey] = x - self._xprev
-                if isinstance(self.filename, str):
-                    self._store(ekey, self._buffer[ekey])
+            edtype = self._err_dtype(x.dtype)
+            if self._incore(x.size*edtype.itemsize):
+                xerr = numpy.asarray(x - self._xprev, dtype=edtype)
+                self._store(ekey, xerr)
             else:
+                if ekey in self._buffer:
+                    self._buffer_keys.remove(ekey)
+                    del(self._buffer[ekey])
+                self._unsaved.discard(ekey)
+                if ekey in self._diisfile and \
+                   (self._diisfile[ekey].shape != (x.size,) or
+                    self._diisfile[ekey].dtype != edtype):
+                    del(self._diisfile[ekey])
                 if ekey not in self._diisfile:
-                    self._diisfile.create_dataset(ekey, (x.size,), x.dtype)
+                    self._diisfile.create_dataset(ekey, (x.size,), edtype)
                 for p0,p1 in prange(0, x.size, BLOCK_SIZE):
                     self._diisfile[ekey][p0:p1] = x[p0:p1] - self._xprev[p0:p1]
             self._head += 1
 
     def get_err_vec(self, idx):
-        if self._buffer:
-            return self._buffer['e%d'%idx]
+        key = 'e%d'%idx
+        if key in self._buffer:
+            return self._buffer[key]
         else:
-            return self._diisfile['e%d'%idx]
+            return self._diisfile[key]
 
     def get_vec(self, idx):
-        if self._buffer:
-            return self._buffer['x%d'%idx]
+        key = 'x%d'%idx
+        if key in self._buffer:
+            return self._buffer[key]
         else:
-            return self._diisfile['x%d'%idx]
+            return self._diisfile[key]
 
     def get_num_vec(self):
         return len(self._bookkeep)
@@ -205,11 +291,14 @@ class DIIS(object):
             return x
 
         dt = numpy.array(self.get_err_vec(self._head-1), copy=False)
+        # the error vectors can be stored in lower precision
+        hdtype = self._H.dtype
         for i in range(nd):
             tmp = 0
             dti = self.get_err_vec(i)
             for p0,p1 in prange(0, dt.size, BLOCK_SIZE):
-                tmp += numpy.dot(dt[p0:p1].conj(), dti[p0:p1])
+                tmp += numpy.dot(numpy.asarray(dt[p0:p1], dtype=hdtype).conj(),
+                                 numpy.asarray(dti[p0:p1], dtype=hdtype))
             self._H[self._head,i+1] = tmp
             self._H[i+1,self._head] = tmp.conjugate()
         dt = None
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+#
+# Author: Qiming Sun <osirpt.sun@gmail.com>
+#
+
+'''
+Persistent cache of AO integrals
+
+The integral arrays are saved as .npy files in a cache directory, keyed by the
+SHA1 fingerprint of the integral name and the libcint arguments (atm, bas,
+env).  When the same molecule (same atoms, basis and _env) is met again, the
+integrals are memory-mapped from the cache rather than recomputed.  The least
+recently used files are removed when the cache exceeds the disk quota.
+
+The cache is off by default.  To turn it on
+
+>>> from pyscf.lib import intcache
+>>> intcache.enable('/scratch/pyscf_intcache', max_disk=20000)  # in MB
+
+or set the environment variable PYSCF_INTCACHE_DIR.
+'''
+
+import os
+import tempfile
+import hashlib
+import numpy
+
+MAX_DISK = 10000 # MB
+
+_cache = None
+
+class IntCache(object):
+    '''Memory-mapped integral store with LRU eviction under a disk quota.
+
+    Attributes:
+        dirname : str
+            Directory to hold the cached integrals
+        max_disk : float or int
+            Disk quota in MB.  Default is 10000
+    '''
+    def __init__(self, dirname, max_disk=MAX_DISK):
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self.dirname = dirname
+        self.max_disk = max_disk
+
+    def key(self, name, atm, bas, env, *args):
+        '''Fingerprint of the integrals'''
+        h = hashlib.sha1(name.encode())
+        h.update(numpy.asarray(atm, dtype=numpy.int32, order='C').tostring())
+        h.update(numpy.asarray(bas, dtype=numpy.int32, order='C').tostring())
+        h.update(numpy.asarray(env, dtype=numpy.double, order='C').tostring())
+        for x in args:
+            if isinstance(x, numpy.ndarray):
+                h.update(numpy.ascontiguousarray(x).tostring())
+            else:
+                h.update(repr(x).encode())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.dirname, key+'.npy')
+
+    def get(self, key):
+        '''Return the cached array (copy-on-write memory map), or None if the
+        key is not in the cache'''
+        path = self._path(key)
+        try:
+            arr = numpy.load(path, mmap_mode='c')
+        except (IOError, OSError, ValueError):
+            return None
+        # mtime records the last access for the LRU eviction
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return arr
+
+    def put(self, key, arr):
+        arr = numpy.asarray(arr)
+        if arr.nbytes/1e6 > self.max_disk:
+            return arr
+        self.evict_(self.max_disk - arr.nbytes/1e6)
+        fd, tmpname = tempfile.mkstemp(suffix='.npy.tmp', dir=self.dirname)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                numpy.save(f, arr)
+# rename is atomic, other processes never see an incomplete file
+            os.rename(tmpname, self._path(key))
+        except (IOError, OSError):
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+        return arr
+
+    def evict_(self, max_disk=None):
+        '''Remove the least recently used files until the total size is
+        below max_disk (in MB)'''
+        if max_disk is None:
+            max_disk = self.max_disk
+        files = []
+        for f in os.listdir(self.dirname):
+            if f.endswith('.npy'):
+                path = os.path.join(self.dirname, f)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        files.sort()
+        total = sum([f[1] for f in files]) / 1e6
+        for mtime, size, path in files:
+            if total <= max_disk:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size / 1e6
+        return self
+
+    def clear(self):
+        self.evict_(0)
+        return self
+
+    def load_or_compute(self, name, atm, bas, env, fn, *args):
+        '''Return the cached integrals, or call fn() and save its result'''
+        key = self.key(name, atm, bas, env, *args)
+        arr = self.get(key)
+        if arr is None:
+            arr = self.put(key, fn())
+        return arr
+
+
+def enable(dirname=None, max_disk=MAX_DISK):
+    '''Turn on the integral cache'''
+    global _cache
+    if dirname is None:
+        dirname = os.path.join(tempfile.gettempdir(), 'pyscf_intcache')
+    _cache = IntCache(dirname, max_disk)
+    return _cache
+
+def disable():
+    '''Turn off the integral cache.  The cached files are kept on disk.'''
+    global _cache
+    _cache = None
+
+def enabled():
+    return _cache is not None
+
+def load_or_compute(name, atm, bas, env, fn, *args):
+    '''Lookup the integrals in the cache.  If the cache is not enabled, fn()
+    is called.
+
+    Args:
+        name : str
+            Integral name, e.g. 'cint2e_sph'
+        atm, bas, env :
+            libcint arguments, which fingerprint the molecule and basis
+        fn : function() => ndarray
+            To generate the integrals when they are not found in the cache
+        args :
+            Other parameters which affect the integrals, e.g. comp, aosym
+
+    Examples:
+
+    >>> intcache.enable()
+    >>> eri = intcache.load_or_compute('cint2e_sph', mol._atm, mol._bas, mol._env,
+    ...                                lambda: _vhf.int2e_sph(mol._atm, mol._bas, mol._env))
+    '''
+    if _cache is None:
+        return fn()
+    else:
+        return _cache.load_or_compute(name, atm, bas, env, fn, *args)
+
+if os.environ.get('PYSCF_INTCACHE_DIR'):
+    enable(os.environ['PYSCF_INTCACHE_DIR'],
+           float(os.environ.get('PYSCF_INTCACHE_MAX_DISK', MAX_DISK)))
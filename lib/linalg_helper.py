@@ -117,6 +117,40 @@ def davidson(aop, x0, precond, tol=1e-14, max_cycle=50, max_space=12,
     >>> len(e)
     2
     '''
+    def aop1(xs):
+        return [aop(x) for x in xs]
+    return davidson1(aop1, x0, precond, tol, max_cycle, max_space, lindep,
+                     max_memory, dot, callback, nroots, lessio, verbose)
+
+def davidson1(aop, x0, precond, tol=1e-14, max_cycle=50, max_space=12,
+              lindep=1e-14, max_memory=2000, dot=numpy.dot, callback=None,
+              nroots=1, lessio=False, verbose=logger.WARN):
+    '''Davidson diagonalization.  The same to :func:`davidson` except that
+    aop takes a list of trial vectors and returns the list of a*x.  The new
+    trial vectors of one iteration (up to nroots vectors) are passed to aop in
+    one call.  The iterations and the convergence are the same as
+    :func:`davidson`; aop may only save the overhead which is shared by the
+    vectors (for FCI, see direct_spin1.contract_2e_multi).
+
+    Args:
+        aop : function([x]) => [array_like_x]
+            aop(xs) to mimic the matrix vector multiplication for each x in
+            the list xs.
+
+    See :func:`davidson` for the other arguments and the return values.
+
+    Examples:
+
+    >>> from pyscf import lib
+    >>> a = numpy.random.random((10,10))
+    >>> a = a + a.T
+    >>> aop = lambda xs: [numpy.dot(a,x) for x in xs]
+    >>> precond = lambda dx, e, x0: dx/(a.diagonal()-e)
+    >>> x0 = a[0]
+    >>> e, c = lib.davidson1(aop, x0, precond, nroots=2)
+    >>> len(e)
+    2
+    '''
     if isinstance(verbose, logger.Logger):
         log = verbose
     else:
@@ -138,11 +172,11 @@ def davidson(aop, x0, precond, tol=1e-14, max_cycle=50, max_space=12,
 
     if isinstance(x0, numpy.ndarray) and x0.ndim == 1:
         xt = [x0]
-        axt = [aop(x0)]
+        axt = aop(xt)
         max_cycle = min(max_cycle,x0.size)
     else:
         xt = qr(x0)
-        axt = [aop(xi) for xi in xt]
+        axt = aop(xt)
         max_cycle = min(max_cycle,x0[0].size)
 
     max_space = max_space + nroots * 2
@@ -193,7 +227,7 @@ def davidson(aop, x0, precond, tol=1e-14, max_cycle=50, max_space=12,
                 xsi = xs[i]
                 for k, ek in enumerate(e):
                     x0[k] += v[i,k] * xsi
-            ax0 = [aop(xi) for xi in x0]
+            ax0 = aop(x0)
         else:
             for k, ek in enumerate(e):
                 x0 .append(xs[space-1] * v[space-1,k])
@@ -263,15 +297,13 @@ def davidson(aop, x0, precond, tol=1e-14, max_cycle=50, max_space=12,
             e = 0
 
         head = space
-        axt = []
+        axt = aop(xt)
         for k, xi in enumerate(xt):
             if head + k >= space:
                 xs.append(xt[k])
-                axt.append(aop(xt[k]))
                 ax.append(axt[k])
             else:
                 xs[head+k] = xt[k]
-                axt.append(aop(xt[k]))
                 ax[head+k] = axt[k]
         space += len(xt)
 
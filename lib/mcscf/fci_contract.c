@@ -421,6 +421,231 @@ void FCIcontract_2e_spin1(double *eri, double *ci0, double *ci1,
         free(buf);
 }
 
+/*
+ * The kernels for nvec CI vectors.  The CI vectors are interleaved in
+ * ci[na,nb,nvec], so that the elements of all vectors of one determinant are
+ * loaded together when a link of the link tables is processed.  The
+ * intermediates are t1[nnorb,bcount,nvec].
+ */
+static double prog0_b_t1_multi(double *ci0, double *t1, int nvec,
+                               int bcount, int stra_id, int strb_id,
+                               int norb, int nstrb, int nlinkb,
+                               _LinkTrilT *clink_indexb)
+{
+        const int nnorb = norb * (norb+1)/2;
+        const size_t nrow = (size_t)bcount * nvec;
+        int j, iv, ia, str0, str1, sign;
+        const _LinkTrilT *tab = clink_indexb + strb_id * nlinkb;
+        double *pci = ci0 + stra_id*(size_t)nstrb*nvec;
+        double *pt1, *pci1;
+        double csum = 0;
+
+        memset(t1, 0, sizeof(double)*nnorb*nrow);
+        for (str0 = 0; str0 < bcount; str0++) {
+                for (j = 0; j < nlinkb; j++) {
+                        ia   = EXTRACT_IA  (tab[j]);
+                        str1 = EXTRACT_ADDR(tab[j]);
+                        sign = EXTRACT_SIGN(tab[j]);
+                        pt1 = t1 + ia*nrow + str0*nvec;
+                        pci1 = pci + str1*nvec;
+                        if (sign > 0) {
+                                for (iv = 0; iv < nvec; iv++) {
+                                        pt1[iv] += pci1[iv];
+                                        csum += pci1[iv] * pci1[iv];
+                                }
+                        } else {
+                                for (iv = 0; iv < nvec; iv++) {
+                                        pt1[iv] -= pci1[iv];
+                                        csum += pci1[iv] * pci1[iv];
+                                }
+                        }
+                }
+                tab += nlinkb;
+        }
+        return csum;
+}
+
+static double prog_a_t1_multi(double *ci0, double *t1, int nvec,
+                              int bcount, int stra_id, int strb_id,
+                              int norb, int nstrb, int nlinka,
+                              _LinkTrilT *clink_indexa)
+{
+        ci0 += strb_id * nvec;
+        const int nrow = bcount * nvec;
+        int j, k, ia, str1, sign;
+        const _LinkTrilT *tab = clink_indexa + stra_id * nlinka;
+        double *pt1, *pci;
+        double csum = 0;
+
+        for (j = 0; j < nlinka; j++) {
+                ia   = EXTRACT_IA  (tab[j]);
+                str1 = EXTRACT_ADDR(tab[j]);
+                sign = EXTRACT_SIGN(tab[j]);
+                pt1 = t1 + ia*(size_t)nrow;
+                pci = ci0 + str1*(size_t)nstrb*nvec;
+                if (sign > 0) {
+                        for (k = 0; k < nrow; k++) {
+                                pt1[k] += pci[k];
+                                csum += pci[k] * pci[k];
+                        }
+                } else {
+                        for (k = 0; k < nrow; k++) {
+                                pt1[k] -= pci[k];
+                                csum += pci[k] * pci[k];
+                        }
+                }
+        }
+        return csum;
+}
+
+static void spread_a_t1_multi(double *ci1, double *t1, int nvec,
+                              int bcount, int stra_id, int strb_id,
+                              int norb, int nstrb, int nlinka,
+                              _LinkTrilT *clink_indexa)
+{
+        ci1 += strb_id * nvec;
+        const int nrow = bcount * nvec;
+        int j, k, ia, str1, sign;
+        const _LinkTrilT *tab = clink_indexa + stra_id * nlinka;
+        double *cp0, *cp1;
+
+        for (j = 0; j < nlinka; j++) {
+                ia   = EXTRACT_IA  (tab[j]);
+                str1 = EXTRACT_ADDR(tab[j]);
+                sign = EXTRACT_SIGN(tab[j]);
+                cp0 = t1 + ia*(size_t)nrow;
+                cp1 = ci1 + str1*(size_t)nstrb*nvec;
+                if (sign > 0) {
+                        for (k = 0; k < nrow; k++) {
+                                cp1[k] += cp0[k];
+                        }
+                } else {
+                        for (k = 0; k < nrow; k++) {
+                                cp1[k] -= cp0[k];
+                        }
+                }
+        }
+}
+
+static void spread_b_t1_multi(double *ci1, double *t1, int nvec,
+                              int bcount, int stra_id, int strb_id,
+                              int norb, int nstrb, int nlinkb,
+                              _LinkTrilT *clink_indexb)
+{
+        const size_t nrow = (size_t)bcount * nvec;
+        int j, iv, ia, str0, str1, sign;
+        const _LinkTrilT *tab = clink_indexb + strb_id * nlinkb;
+        double *pci = ci1 + stra_id * (size_t)nstrb*nvec;
+        double *pt1, *pci1;
+
+        for (str0 = 0; str0 < bcount; str0++) {
+                for (j = 0; j < nlinkb; j++) {
+                        ia   = EXTRACT_IA  (tab[j]);
+                        str1 = EXTRACT_ADDR(tab[j]);
+                        sign = EXTRACT_SIGN(tab[j]);
+                        pt1 = t1 + ia*nrow + str0*nvec;
+                        pci1 = pci + str1*nvec;
+                        if (sign > 0) {
+                                for (iv = 0; iv < nvec; iv++) {
+                                        pci1[iv] += pt1[iv];
+                                }
+                        } else {
+                                for (iv = 0; iv < nvec; iv++) {
+                                        pci1[iv] -= pt1[iv];
+                                }
+                        }
+                }
+                tab += nlinkb;
+        }
+}
+
+static void ctr_rhf2e_kern_multi(double *eri, double *ci0, double *ci1,
+                                 double *tbuf, int nvec,
+                                 int bcount, int stra_id, int strb_id,
+                                 int norb, int na, int nb, int nlinka, int nlinkb,
+                                 _LinkTrilT *clink_indexa, _LinkTrilT *clink_indexb)
+{
+        const char TRANS_N = 'N';
+        const double D0 = 0;
+        const double D1 = 1;
+        const int nnorb = norb * (norb+1)/2;
+        const int nrow = bcount * nvec;
+        double *t1 = malloc(sizeof(double) * nnorb*nrow);
+        double csum;
+
+        csum = prog0_b_t1_multi(ci0, t1, nvec, bcount, stra_id, strb_id,
+                                norb, nb, nlinkb, clink_indexb)
+             + prog_a_t1_multi(ci0, t1, nvec, bcount, stra_id, strb_id,
+                               norb, nb, nlinka, clink_indexa);
+
+        if (csum > CSUMTHR) {
+// t1 and tbuf are the column-major (nrow,nnorb) matrices.  eri is symmetric
+                dgemm_(&TRANS_N, &TRANS_N, &nrow, &nnorb, &nnorb,
+                       &D1, t1, &nrow, eri, &nnorb,
+                       &D0, tbuf, &nrow);
+                spread_b_t1_multi(ci1, tbuf, nvec, bcount, stra_id, strb_id,
+                                  norb, nb, nlinkb, clink_indexb);
+        } else {
+                memset(tbuf, 0, sizeof(double)*nnorb*nrow);
+        }
+        free(t1);
+}
+
+/*
+ * FCIcontract_2e_spin1 for nvec CI vectors.  ci0 and ci1 are the interleaved
+ * CI vectors [na,nb,nvec].  The vectors share the decoding of the compressed
+ * link tables and the dgemm calls; the flops and the memory traffic per
+ * vector are unchanged.  The number of alpha strings of each block is
+ * reduced by nvec, to keep the size of the buffer.
+ */
+void FCIcontract_2e_spin1_multi(double *eri, double *ci0, double *ci1, int nvec,
+                                int norb, int na, int nb, int nlinka, int nlinkb,
+                                int *link_indexa, int *link_indexb)
+{
+        const int nnorb = norb * (norb+1)/2;
+        const int blklenb = strb_buflen(nb, nnorb);
+
+        int ic, strk1, strk0, strk, ib, blen;
+        int bufbas = MIN(MAX(BUFBASE/nvec, 1), na);
+        double *buf = (double *)malloc(sizeof(double) * bufbas*nnorb*blklenb*nvec);
+        double *pbuf;
+        _LinkTrilT *clinka = malloc(sizeof(_LinkTrilT) * nlinka * na);
+        _LinkTrilT *clinkb = malloc(sizeof(_LinkTrilT) * nlinkb * nb);
+        FCIcompress_link_tril(clinka, link_indexa, na, nlinka);
+        FCIcompress_link_tril(clinkb, link_indexb, nb, nlinkb);
+
+        memset(ci1, 0, sizeof(double)*na*nb*nvec);
+        for (strk0 = 0; strk0 < na; strk0 += bufbas) {
+                strk1 = MIN(na-strk0, bufbas);
+                for (ib = 0; ib < nb; ib += blklenb) {
+                        blen = MIN(blklenb, nb-ib);
+#pragma omp parallel default(none) \
+        shared(eri, ci0, ci1, nvec, norb, na, nb, nlinka, nlinkb, \
+               clinka, clinkb, buf, strk0, strk1, ib, blen), \
+        private(strk, ic, pbuf)
+#pragma omp for schedule(static)
+                        for (ic = 0; ic < strk1; ic++) {
+                                strk = strk0 + ic;
+                                pbuf = buf + ic * blen * nnorb * nvec;
+                                ctr_rhf2e_kern_multi(eri, ci0, ci1, pbuf, nvec,
+                                                     blen, strk, ib,
+                                                     norb, na, nb, nlinka, nlinkb,
+                                                     clinka, clinkb);
+                        }
+// spread alpha-strings in serial mode
+                        for (ic = 0; ic < strk1; ic++) {
+                                strk = strk0 + ic;
+                                pbuf = buf + ic * blen * nnorb * nvec;
+                                spread_a_t1_multi(ci1, pbuf, nvec, blen, strk, ib,
+                                                  norb, nb, nlinka, clinka);
+                        }
+                }
+        }
+        free(clinka);
+        free(clinkb);
+        free(buf);
+}
+
 /*
  * eri_ab is mixed integrals (alpha,alpha|beta,beta), |beta,beta) in small strides
  */
@@ -9,6 +9,7 @@ import shutil
 import functools
 import math
 import ctypes
+import threading
 import numpy
 
 '''
@@ -202,6 +203,55 @@ class quite_run(object):
         os.chdir(self.dirnow)
 
 
+class call_in_background(object):
+    '''Within this context manager, the function fn is executed in a
+    background thread.  Only one background call is alive at a time: the next
+    call waits for the previous one to finish.  The last call is finished when
+    the context is closed.  The exception raised in the background thread is
+    re-raised in the caller.
+
+    Examples
+    --------
+    with call_in_background(fread) as async_fread:
+        async_fread(buf1, 1)  # start to read block 1
+        compute(buf0)         # compute block 0 meanwhile
+    '''
+    def __init__(self, fn):
+        self.fn = fn
+        self.handler = None
+        self.error = None
+
+    def _run(self, *args, **kwargs):
+        try:
+            self.fn(*args, **kwargs)
+        except BaseException:
+            self.error = sys.exc_info()
+
+    def wait(self):
+        if self.handler is not None:
+            self.handler.join()
+            self.handler = None
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error[1]
+
+    def __call__(self, *args, **kwargs):
+        self.wait()
+        self.handler = threading.Thread(target=self._run, args=args,
+                                        kwargs=kwargs)
+        self.handler.daemon = True
+        self.handler.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if type is None:
+            self.wait()
+        elif self.handler is not None:
+            self.handler.join()
+
+
 # from pygeocoder
 # this decorator lets me use methods as both static and instance methods
 # In contrast to classmethod, when obj.function() is called, the first
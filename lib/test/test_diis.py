@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+#
+# Author: Qiming Sun <osirpt.sun@gmail.com>
+#
+
+import unittest
+import tempfile
+import numpy
+from pyscf import lib
+
+numpy.random.seed(1)
+a = numpy.random.random((60,60))
+a = a + a.T + numpy.eye(60) * 60
+b = numpy.random.random(60)
+
+def solve(adiis, with_err_vec=True):
+    x = numpy.zeros(60)
+    for i in range(15):
+        r = b - numpy.dot(a, x)
+        x = x + r / 60
+        if with_err_vec:
+            x = adiis.update(x, r)
+        else:
+            x = adiis.update(x)
+    return x
+
+class KnowValues(unittest.TestCase):
+    def test_float32_err_vec(self):
+        x0 = solve(lib.diis.DIIS())
+        adiis = lib.diis.DIIS()
+        adiis.err_vec_dtype = numpy.float32
+        x1 = solve(adiis)
+        self.assertEqual(adiis.get_err_vec(0).dtype, numpy.float32)
+        self.assertTrue(numpy.allclose(x0, x1, atol=1e-6))
+        self.assertTrue(numpy.allclose(numpy.dot(a, x1), b))
+
+    def test_spill(self):
+        x0 = solve(lib.diis.DIIS(), False)
+        adiis = lib.diis.DIIS()
+        adiis.max_memory = 60*8*3/1e6
+        x1 = solve(adiis, False)
+        self.assertEqual(len(adiis._buffer), 3)
+        self.assertTrue(numpy.allclose(x0, x1))
+
+    def test_flush(self):
+        x0 = solve(lib.diis.DIIS())
+        adiis = lib.diis.DIIS(filename=tempfile.mktemp())
+        adiis.autoflush = False
+        x1 = solve(adiis)
+        self.assertTrue(len(adiis._unsaved) > 0)
+        adiis.flush()
+        self.assertEqual(len(adiis._unsaved), 0)
+        self.assertTrue(numpy.allclose(adiis._diisfile['x0'], adiis.get_vec(0)))
+        self.assertTrue(numpy.allclose(x0, x1))
+
+if __name__ == "__main__":
+    print("Full Tests for DIIS")
+    unittest.main()
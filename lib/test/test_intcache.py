@@ -0,0 +1,70 @@
+#
+# Author: Qiming Sun <osirpt.sun@gmail.com>
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+from pyscf import gto
+from pyscf import scf
+from pyscf import ao2mo
+from pyscf.lib import intcache
+
+mol = gto.M(
+    verbose = 0,
+    atom = '''
+O     0    0        0
+H     0    -0.757   0.587
+H     0    0.757    0.587''',
+    basis = '631g',
+)
+
+class KnowValues(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        intcache.disable()
+        shutil.rmtree(self.tmpdir)
+
+    def test_store(self):
+        cache = intcache.IntCache(self.tmpdir, max_disk=1)
+        key0 = cache.key('a', mol._atm, mol._bas, mol._env)
+        key1 = cache.key('a', mol._atm, mol._bas, mol._env+1e-12)
+        self.assertTrue(key0 != key1)
+        self.assertTrue(cache.get(key0) is None)
+        a = numpy.random.random((100,100))
+        cache.put(key0, a)
+        self.assertTrue(numpy.allclose(cache.get(key0), a))
+        # the least recently used entry is evicted
+        os.utime(cache._path(key0), (0, 0))
+        cache.put(key1, numpy.random.random((1200,100)))
+        self.assertTrue(cache.get(key0) is None)
+        self.assertTrue(cache.get(key1) is not None)
+
+    def test_scf(self):
+        eri0 = scf._vhf.int2e_sph(mol._atm, mol._bas, mol._env)
+        e0 = scf.RHF(mol).scf()
+        intcache.enable(self.tmpdir)
+        eri1 = scf._vhf.int2e_sph(mol._atm, mol._bas, mol._env)
+        eri2 = scf._vhf.int2e_sph(mol._atm, mol._bas, mol._env)
+        # the first call computes the integrals, the second reads the cache
+        self.assertFalse(isinstance(eri1, numpy.memmap))
+        self.assertTrue(isinstance(eri2, numpy.memmap))
+        self.assertTrue(numpy.allclose(eri0, eri2))
+        s = mol.intor_symmetric('cint1e_ovlp_sph')
+        self.assertTrue(numpy.allclose(s, mol.intor_symmetric('cint1e_ovlp_sph')))
+
+        mf = scf.RHF(mol)
+        self.assertAlmostEqual(mf.scf(), e0, 9)
+        self.assertAlmostEqual(scf.RHF(mol).scf(), e0, 9)
+        mo = mf.mo_coeff
+        self.assertTrue(numpy.allclose(ao2mo.incore.full(mol, mo),
+                                       ao2mo.incore.full(eri0, mo)))
+
+
+if __name__ == "__main__":
+    print("Full Tests for intcache")
+    unittest.main()
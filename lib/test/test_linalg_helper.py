@@ -6,6 +6,7 @@ import unittest
 import numpy
 import scipy.linalg
 import tempfile
+from pyscf import lib
 from pyscf import gto
 from pyscf import scf
 from pyscf import fci
@@ -25,6 +26,20 @@ class KnowValues(unittest.TestCase):
         e = myfci.kernel()[0]
         self.assertAlmostEqual(e, -11.579978414933732, 9)
 
+    def test_davidson1(self):
+        numpy.random.seed(12)
+        n = 100
+        a = numpy.random.random((n,n)) * .1
+        a = a + a.T + numpy.diag(numpy.arange(n))
+        aop = lambda xs: [numpy.dot(a,x) for x in xs]
+        precond = lambda dx, e, x0: dx/(a.diagonal()-e)
+        x0 = numpy.eye(n)[:4]
+        e, c = lib.davidson1(aop, x0, precond, nroots=4, tol=1e-12)
+        self.assertTrue(numpy.allclose(e, numpy.linalg.eigh(a)[0][:4]))
+        e1 = lib.davidson(lambda x: numpy.dot(a,x), x0, precond, nroots=4,
+                          tol=1e-12)[0]
+        self.assertTrue(numpy.allclose(e, e1))
+
 if __name__ == "__main__":
     print("Full Tests for linalg_helper")
     unittest.main()
@@ -290,3 +290,49 @@ void CVHFnr_direct_drv(int (*intor)(), void (*fdot)(), void (**fjk)(),
         free(ao_loc);
 }
 
+
+/*
+ * Same to CVHFnr_direct_drv, but only loop over the shell pairs listed in
+ * shls_pairs = [ish0,jsh0,ish1,jsh1,...].  It is used by the multi-process
+ * driver, in which every process handles a subset of the (ij| pairs.
+ */
+void CVHFnr_direct_sub(int (*intor)(), void (*fdot)(), void (**fjk)(),
+                       double **dms, double *vjk,
+                       int n_dm, int ncomp, CINTOpt *cintopt, CVHFOpt *vhfopt,
+                       int *shls_pairs, int npairs,
+                       int *atm, int natm, int *bas, int nbas, double *env)
+{
+        const int nao = CINTtot_cgto_spheric(bas, nbas);
+        double *v_priv;
+        int i, ij;
+        int *ao_loc = malloc(sizeof(int)*(nbas+1));
+        struct _VHFEnvs envs = {natm, nbas, atm, bas, env, nao, ao_loc};
+
+        memset(vjk, 0, sizeof(double)*nao*nao*n_dm*ncomp);
+        CINTshells_spheric_offset(ao_loc, bas, nbas);
+        ao_loc[nbas] = nao;
+
+#pragma omp parallel default(none) \
+        shared(intor, fdot, fjk, shls_pairs, npairs, \
+               dms, vjk, n_dm, ncomp, nbas, cintopt, vhfopt, envs) \
+        private(ij, i, v_priv)
+        {
+                v_priv = malloc(sizeof(double)*nao*nao*n_dm*ncomp);
+                memset(v_priv, 0, sizeof(double)*nao*nao*n_dm*ncomp);
+#pragma omp for nowait schedule(dynamic, 2)
+                for (ij = 0; ij < npairs; ij++) {
+                        (*fdot)(intor, fjk, dms, v_priv, n_dm, ncomp,
+                                shls_pairs[ij*2], shls_pairs[ij*2+1],
+                                cintopt, vhfopt, &envs);
+                }
+#pragma omp critical
+                {
+                        for (i = 0; i < nao*nao*n_dm*ncomp; i++) {
+                                vjk[i] += v_priv[i];
+                        }
+                }
+                free(v_priv);
+        }
+
+        free(ao_loc);
+}
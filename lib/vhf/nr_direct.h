@@ -42,3 +42,9 @@ void CVHFnr_direct_drv(int (*intor)(), void (*fdot)(), void (**fjk)(),
                        double **dms, double *vjk,
                        int n_dm, int ncomp, CINTOpt *cintopt, CVHFOpt *vhfopt,
                        int *atm, int natm, int *bas, int nbas, double *env);
+
+void CVHFnr_direct_sub(int (*intor)(), void (*fdot)(), void (**fjk)(),
+                       double **dms, double *vjk,
+                       int n_dm, int ncomp, CINTOpt *cintopt, CVHFOpt *vhfopt,
+                       int *shls_pairs, int npairs,
+                       int *atm, int natm, int *bas, int nbas, double *env);
@@ -798,3 +798,75 @@ void CVHFnrs1_incore_drv(double *eri, double *dmj, double *vj,
         }
 }
 
+
+
+/*
+ * Multiple density matrices.  For each (ij| block, the J and K of all nset
+ * density matrices are updated before moving to the next block, so that the
+ * integrals are read from memory only once.
+ * dmj_stride is the size of one density matrix in dmj, n*(n+1)/2 for the
+ * packed triangular DM of s8 or n*n for s4.
+ */
+static void incore_mdrv(double *eri, double *dmj, double *vj,
+                        double *dmk, double *vk, int nset, int n,
+                        size_t dmj_stride, int s8,
+                        void (*const fvj)(), void (*const fvk)())
+{
+        const int npair = n*(n+1)/2;
+        const size_t nn = (size_t)n * n;
+        double *vj_priv, *vk_priv;
+        int i, j, k;
+        size_t ij, off, p;
+
+        memset(vj, 0, sizeof(double)*nn*nset);
+        memset(vk, 0, sizeof(double)*nn*nset);
+
+#pragma omp parallel default(none) \
+        shared(eri, dmj, dmk, vj, vk, n, nset, dmj_stride, s8) \
+        private(ij, i, j, k, p, off, vj_priv, vk_priv)
+        {
+                vj_priv = malloc(sizeof(double)*nn*nset);
+                vk_priv = malloc(sizeof(double)*nn*nset);
+                memset(vj_priv, 0, sizeof(double)*nn*nset);
+                memset(vk_priv, 0, sizeof(double)*nn*nset);
+#pragma omp for nowait schedule(dynamic, 4)
+                for (ij = 0; ij < npair; ij++) {
+                        i = (int)(sqrt(2*ij+.25) - .5 + 1e-7);
+                        j = ij - i*(i+1)/2;
+                        if (s8) {
+                                off = ij*(ij+1)/2;
+                        } else {
+                                off = ij * npair;
+                        }
+                        for (k = 0; k < nset; k++) {
+                                (*fvj)(eri+off, dmj+dmj_stride*k,
+                                       vj_priv+nn*k, n, i, j);
+                                (*fvk)(eri+off, dmk+nn*k,
+                                       vk_priv+nn*k, n, i, j);
+                        }
+                }
+#pragma omp critical
+                {
+                        for (p = 0; p < nn*nset; p++) {
+                                vj[p] += vj_priv[p];
+                                vk[p] += vk_priv[p];
+                        }
+                }
+                free(vj_priv);
+                free(vk_priv);
+        }
+}
+
+void CVHFnrs8_incore_mdrv(double *eri, double *dmj, double *vj,
+                          double *dmk, double *vk, int nset,
+                          int n, void (*const fvj)(), void (*const fvk)())
+{
+        incore_mdrv(eri, dmj, vj, dmk, vk, nset, n, n*(n+1)/2, 1, fvj, fvk);
+}
+
+void CVHFnrs4_incore_mdrv(double *eri, double *dmj, double *vj,
+                          double *dmk, double *vk, int nset,
+                          int n, void (*const fvj)(), void (*const fvk)())
+{
+        incore_mdrv(eri, dmj, vj, dmk, vk, nset, n, (size_t)n*n, 0, fvj, fvk);
+}
@@ -206,7 +206,12 @@ def cas_natorb(mc, mo_coeff=None, ci=None, eris=None, sort=False,
     #old_det_idxa = numpy.argsort(guide_stringsa)
     #old_det_idxb = numpy.argsort(guide_stringsb)
     #ci0 = ci[old_det_idxa[:,None],old_det_idxb]
-    if isinstance(ci, numpy.ndarray):
+    if hasattr(ci, '_strs'):
+        # selected CI vector (fci.selected_ci) is defined on the strings of
+        # the old orbitals
+        log.info('Selected CI vector cannot be reordered, so not using old wavefunction as initial guess')
+        ci0 = None
+    elif isinstance(ci, numpy.ndarray):
         ci0 = fci.addons.reorder(ci, nelecas, where_natorb)
     elif isinstance(ci, (tuple, list)) and isinstance(ci[0], numpy.ndarray):
         # for state-average eigenfunctions
@@ -541,7 +546,8 @@ class CASCI(object):
         return self.e_tot, self.e_cas, self.ci, self.mo_coeff, self.mo_energy
 
     def _finalize_(self):
-        pass
+# Release the link tables of the CI strings cached by the FCI solver
+        fci.cistring.string_space.cache_clear()
 
     def cas_natorb(self, mo_coeff=None, ci=None, eris=None, sort=False,
                    casdm1=None, verbose=None):
@@ -223,7 +223,8 @@ class CASCI(object):
         return self.e_tot, e_cas, self.ci
 
     def _finalize_(self):
-        pass
+# Release the link tables of the CI strings cached by the FCI solver
+        fci.cistring.string_space.cache_clear()
 
     def cas_natorb(self, mo_coeff=None, ci0=None):
         return addons.cas_natorb(self, mo_coeff, ci0)
@@ -457,9 +457,9 @@ def kernel(casscf, mo_coeff, tol=1e-7, conv_tol_grad=None, macro=50, micro=3,
     mo = mo_coeff
     nmo = mo.shape[1]
     ncas = casscf.ncas
-    #TODO: lazy evaluate eris, to leave enough memory for FCI solver
-    eris = casscf.ao2mo(mo)
-    e_tot, e_ci, fcivec = casscf.casci(mo, ci0, eris)
+# The first CASCI only needs the active space integrals.  eris are generated
+# after the FCI solver, to leave enough memory for it.
+    e_tot, e_ci, fcivec = casscf.casci(mo, ci0)
     if hasattr(casscf.fcisolver, 'spin_square'):
         ss = casscf.fcisolver.spin_square(fcivec, ncas, casscf.nelecas)
         log.info('CASCI E = %.15g  S^2 = %.7f', e_tot, ss[0])
@@ -467,7 +467,7 @@ def kernel(casscf, mo_coeff, tol=1e-7, conv_tol_grad=None, macro=50, micro=3,
         log.info('CASCI E = %.15g', e_tot)
     if ncas == nmo:
         log.debug('CASSCF canonicalization')
-        mo, fcivec, mo_energy = casscf.canonicalize(mo, fcivec, eris, False,
+        mo, fcivec, mo_energy = casscf.canonicalize(mo, fcivec, None, False,
                                                     casscf.natorb, verbose=log)
         return True, e_tot, e_ci, fcivec, mo, mo_energy
 
@@ -481,6 +481,10 @@ def kernel(casscf, mo_coeff, tol=1e-7, conv_tol_grad=None, macro=50, micro=3,
     norm_gorb = norm_gci = -1
     elast = e_tot
     r0 = None
+    eris = casscf.ao2mo(mo)
+# The accumulated |u-1| since the last full AO->MO transformation
+    u_drift = 0
+    eris_rotated = False
 
     t1m = log.timer('Initializing 1-step CASSCF', *cput0)
     casdm1, casdm2 = casscf.fcisolver.make_rdm12(fcivec, ncas, casscf.nelecas)
@@ -545,8 +549,17 @@ def kernel(casscf, mo_coeff, tol=1e-7, conv_tol_grad=None, macro=50, micro=3,
             log.debug('Active space overlap to last step, SVD = %s',
                       numpy.linalg.svd(u[ncore:nocc,ncore:nocc])[1])
 
-        u = g_orb = eris = None
-        eris = casscf.ao2mo(mo)
+        u_drift += norm_t
+        if u_drift < casscf.eris_update_thresh:
+            eris = casscf.update_eris(mo, u, eris)
+            u = g_orb = None
+            eris_rotated = True
+            log.debug('Update eri by rotation, accumulated |u-1|= %4.3g', u_drift)
+        else:
+            u = g_orb = eris = None
+            eris = casscf.ao2mo(mo)
+            u_drift = 0
+            eris_rotated = False
         t2m = log.timer('update eri', *t3m)
 
         elast = e_tot
@@ -569,7 +582,20 @@ def kernel(casscf, mo_coeff, tol=1e-7, conv_tol_grad=None, macro=50, micro=3,
 
         if (abs(e_tot - elast) < tol
             and (norm_gorb0 < conv_tol_grad and norm_ddm < conv_tol_ddm)):
-            conv = True
+            if eris_rotated:
+# The rotated eris are not exact for the orbital gradients.  Check the
+# convergence with the gradients of the fully transformed integrals.
+                eris = None
+                eris = casscf.ao2mo(mo)
+                u_drift = 0
+                eris_rotated = False
+                g_orb = casscf.gen_g_hop(mo, 1, casdm1, casdm2, eris)[0]
+                norm_gorb0 = numpy.linalg.norm(g_orb)
+                g_orb = None
+                log.debug('|grad[o]| of the transformed eris = %4.3g', norm_gorb0)
+                conv = norm_gorb0 < conv_tol_grad
+            else:
+                conv = True
 
         if dump_chk:
             casscf.dump_chk(locals())
@@ -583,6 +609,9 @@ def kernel(casscf, mo_coeff, tol=1e-7, conv_tol_grad=None, macro=50, micro=3,
         log.info('1-step CASSCF not converged, %d macro (%d JK %d micro) steps',
                  imacro+1, totinner, totmicro)
 
+    if eris_rotated:
+        eris = None
+        eris = casscf.ao2mo(mo)
     log.debug('CASSCF canonicalization')
     mo, fcivec, mo_energy = casscf.canonicalize(mo, fcivec, eris, False,
                                                 casscf.natorb, casdm1, log)
@@ -749,6 +778,18 @@ class CASSCF(casci.CASCI):
         self.ci_response_space = 4
         self.callback = None
         self.chk_ci = False
+# * eris_update_thresh controls the integral update between macro iterations.
+#   If the accumulated orbital rotation |u-1| since the last full AO->MO
+#   transformation is smaller than eris_update_thresh, the integrals are
+#   updated by rotating the previous ones (see mc_ao2mo.update_eris), which is
+#   much cheaper than the transformation.  The rotated integrals neglect the
+#   inactive-active mixing of the active indices, which is a first order
+#   error in the orbital gradients and hessian.  They only drive the orbital
+#   optimization: the CASCI energy is computed with the exact active space
+#   Hamiltonian, and the integrals are fully transformed before the
+#   convergence check and the canonicalization.  0 means the full
+#   transformation for every macro iteration.
+        self.eris_update_thresh = 0
 
         self.fcisolver.max_cycle = 50
 
@@ -798,6 +839,7 @@ class CASSCF(casci.CASCI):
         log.info('keyframe_interval = %d', self.keyframe_interval)
         log.info('keyframe_interval_rate = %g', self.keyframe_interval_rate)
         log.info('keyframe_trust_region = %g', self.keyframe_trust_region)
+        log.info('eris_update_thresh = %g', self.eris_update_thresh)
         try:
             self.fcisolver.dump_flags(self.verbose)
         except AttributeError:
@@ -894,6 +936,9 @@ class CASSCF(casci.CASCI):
     def update_ao2mo(self, mo):
         raise RuntimeError('update_ao2mo was obseleted since pyscf v1.0.  Use .ao2mo method instead')
 
+    def update_eris(self, mo, u, eris):
+        return mc_ao2mo.update_eris(self, eris, mo, u)
+
     def ao2mo(self, mo):
 #        nmo = mo.shape[1]
 #        ncore = self.ncore
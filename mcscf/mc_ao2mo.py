@@ -300,6 +300,59 @@ class _ERIS(object):
             self.feri = None
             self._tmpfile = None
 
+def update_eris(casscf, eris, mo, u):
+    '''The integrals of the rotated orbitals mo (= mo_old * u) from the
+    integrals eris of mo_old, without the AO->MO transformation.
+
+    The general indices of ppaa and papa are rotated exactly.  For the
+    active indices, the mixing between the active and the inactive orbitals
+    is neglected, which is a first order error in the rotation and in the
+    orbital gradients and hessian of gen_g_hop.  vhf_c and the (aa|aa) block,
+    which define the CASCI Hamiltonian, are computed exactly.  j_pc and k_pc,
+    which are only used by the diagonal hessian, are kept.  If the rotated
+    integrals do not fit in memory, the full transformation casscf.ao2mo is
+    called.
+    '''
+    ncore = casscf.ncore
+    ncas = casscf.ncas
+    nocc = ncore + ncas
+    nmo = mo.shape[1]
+    mem_basic = _mem_usage(ncore, ncas, nmo)[2]
+    if hasattr(eris, 'feri'):  # ppaa and papa need to be loaded
+        mem_basic *= 2
+    if mem_basic + pyscf.lib.current_memory()[0] > casscf.max_memory*.9:
+        return casscf.ao2mo(mo)
+
+    ua = u[ncore:nocc,ncore:nocc]
+    neweris = _ERIS.__new__(_ERIS)
+    neweris.j_pc = eris.j_pc
+    neweris.k_pc = eris.k_pc
+    neweris.ppaa = _rotate_pqaa(numpy.asarray(eris.ppaa), u, ua)
+    papa = numpy.asarray(eris.papa).transpose(0,2,1,3)
+    neweris.papa = _rotate_pqaa(papa, u, ua).transpose(0,2,1,3)
+    neweris.papa = numpy.asarray(neweris.papa, order='C')
+    papa = None
+
+    aaaa = casscf.get_h2eff(mo[:,ncore:nocc])
+    aaaa = pyscf.ao2mo.restore(1, numpy.asarray(aaaa), ncas)
+    neweris.ppaa[ncore:nocc,ncore:nocc] = aaaa
+    neweris.papa[ncore:nocc,:,ncore:nocc] = aaaa.transpose(0,2,1,3)
+
+    dm_core = numpy.dot(mo[:,:ncore], mo[:,:ncore].T)
+    vj, vk = casscf._scf.get_jk(casscf.mol, dm_core)
+    neweris.vhf_c = reduce(numpy.dot, (mo.T, vj*2-vk, mo))
+    return neweris
+
+def _rotate_pqaa(pqaa, u, ua):
+    '''pqaa'[p,q,a,b] = sum u[r,p] u[s,q] ua[x,a] ua[y,b] pqaa[r,s,x,y]'''
+    nmo = u.shape[0]
+    ncas = ua.shape[0]
+    pqaa = pyscf.lib.dot(pqaa.reshape(-1,ncas**2), numpy.kron(ua, ua))
+    pqaa = pyscf.lib.dot(u.T, pqaa.reshape(nmo,-1)).reshape(nmo,nmo,-1)
+    pqaa = pyscf.lib.dot(u.T, pqaa.transpose(1,0,2).reshape(nmo,-1))
+    pqaa = pqaa.reshape(nmo,nmo,ncas,ncas).transpose(1,0,2,3)
+    return numpy.asarray(pqaa, order='C')
+
 def _mem_usage(ncore, ncas, nmo):
     nvir = nmo - ncore
     outcore = basic = ncas**2*nmo**2*2 * 8/1e6
@@ -49,6 +49,18 @@ class KnowValues(unittest.TestCase):
         self.assertAlmostEqual(numpy.linalg.norm(mc.analyze()),
                                2.7015375913946591, 4)
 
+    def test_mc1step_eris_update(self):
+        mc0 = mcscf.CASSCF(m, 4, 4)
+        mc0.conv_tol = 1e-10
+        emc0 = mc0.mc1step()[0]
+        mc = mcscf.CASSCF(m, 4, 4)
+        mc.conv_tol = 1e-10
+        mc.eris_update_thresh = .2
+        emc = mc.mc1step()[0]
+        self.assertAlmostEqual(emc, emc0, 9)
+        self.assertTrue(numpy.allclose(mc.make_rdm1(), mc0.make_rdm1(), atol=1e-5))
+        self.assertTrue(numpy.allclose(mc.mo_energy, mc0.mo_energy, atol=1e-5))
+
     def test_mc2step_4o4e(self):
         mc = mcscf.CASSCF(m, 4, 4)
         emc = mc.mc2step()[0]
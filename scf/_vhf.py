@@ -5,6 +5,7 @@ import ctypes
 import _ctypes
 import numpy
 import pyscf.lib
+from pyscf.lib import intcache
 
 libcvhf = pyscf.lib.load_library('libcvhf')
 def _fpointer(name):
@@ -105,8 +106,15 @@ def make_cintopt(atm, bas, env, intor):
 # hermi = 2 : anti-hermitian
 ################################################
 def incore(eri, dm, hermi=0):
+    '''J, K matrices from the 8-fold or 4-fold incore ERIs.  dm can be one
+    density matrix or an (nset,nao,nao) array of density matrices.  For the
+    multiple density matrices, every block of the ERIs is read only once for
+    all of them.
+    '''
     eri = numpy.ascontiguousarray(eri)
     dm = numpy.ascontiguousarray(dm)
+    if dm.ndim == 3:
+        return _incore_mdm(eri, dm, hermi)
     nao = dm.shape[0]
     vj = numpy.empty((nao,nao))
     vk = numpy.empty((nao,nao))
@@ -150,6 +158,44 @@ def incore(eri, dm, hermi=0):
         vj = pyscf.lib.hermi_triu_(vj, 1)
     return vj, vk
 
+def _incore_mdm(eri, dms, hermi=0):
+    nset, nao = dms.shape[:2]
+    vj = numpy.empty((nset,nao,nao))
+    vk = numpy.empty((nset,nao,nao))
+    npair = nao*(nao+1)//2
+    if eri.ndim == 2 and npair*npair == eri.size: # 4-fold symmetry eri
+        fdrv = getattr(libcvhf, 'CVHFnrs4_incore_mdrv')
+        fvj = _fpointer('CVHFics4_kl_s2ij')
+        fvk = _fpointer('CVHFics4_il_s1jk')
+        tridm = dms
+    elif eri.ndim == 1 and npair*(npair+1)//2 == eri.size: # 8-fold symmetry eri
+        fdrv = getattr(libcvhf, 'CVHFnrs8_incore_mdrv')
+        fvj = _fpointer('CVHFics8_tridm_vj')
+        if hermi == 1:
+            fvk = _fpointer('CVHFics8_jk_s2il')
+        else:
+            fvk = _fpointer('CVHFics8_jk_s1il')
+        idx, idy = numpy.tril_indices(nao)
+        tridm = numpy.ascontiguousarray((dms+dms.transpose(0,2,1))[:,idx,idy])
+        diagidx = numpy.arange(nao)
+        tridm[:,diagidx*(diagidx+1)//2+diagidx] *= .5
+    else:
+        raise RuntimeError('Array shape not consistent: DM %s, eri %s'
+                           % (dms.shape, eri.shape))
+    fdrv(eri.ctypes.data_as(ctypes.c_void_p),
+         tridm.ctypes.data_as(ctypes.c_void_p),
+         vj.ctypes.data_as(ctypes.c_void_p),
+         dms.ctypes.data_as(ctypes.c_void_p),
+         vk.ctypes.data_as(ctypes.c_void_p),
+         ctypes.c_int(nset), ctypes.c_int(nao), fvj, fvk)
+    for i in range(nset):
+        if hermi != 0:
+            vj[i] = pyscf.lib.hermi_triu_(vj[i], hermi)
+            vk[i] = pyscf.lib.hermi_triu_(vk[i], hermi)
+        else:
+            vj[i] = pyscf.lib.hermi_triu_(vj[i], 1)
+    return vj, vk
+
 # use cint2e_sph as cintor, CVHFnrs8_ij_s2kl, CVHFnrs8_jk_s2il as fjk to call
 # direct_mapdm
 def direct(dms, atm, bas, env, vhfopt=None, hermi=0):
@@ -217,6 +263,235 @@ def direct(dms, atm, bas, env, vhfopt=None, hermi=0):
         vjk = vjk.reshape(2,nao,nao)
     return vjk
 
+# Estimate the cost of the s8 (ij|kl) loops of each shell pair (ish>=jsh).
+# The cost of a pair is the product of the (ij| size and the total size of the
+# |kl) pairs which survive the Schwarz screening.  Only the pairs kl <= ij are
+# computed for the given ij, which is accounted by the triangular fraction.
+def shell_pair_cost(atm, bas, env, vhfopt=None):
+    '''Approximate cost of the 8-fold direct J/K loops for every shell pair
+
+    Returns:
+        shls_pairs : (npair,2) int32 array of (ish,jsh) with ish >= jsh
+        cost : (npair,) float array
+    '''
+    from pyscf.gto.mole import ANG_OF, NPRIM_OF, NCTR_OF
+    bas = numpy.asarray(bas)
+    nbas = bas.shape[0]
+    dims = (bas[:,ANG_OF]*2+1) * bas[:,NCTR_OF]
+    weights = dims * bas[:,NPRIM_OF]
+    ish, jsh = numpy.tril_indices(nbas)
+    w_pair = (weights[ish] * weights[jsh]).astype(numpy.double)
+
+    q = _get_qcond(vhfopt, nbas)
+    if q is None:
+        w_kl = w_pair.sum()
+    else:
+        q_pair = q[ish,jsh]
+        idx = numpy.argsort(q_pair)
+        q_sorted = q_pair[idx]
+        # w_above[n] = the total weight of the pairs whose q >= q_sorted[n]
+        w_above = numpy.append(numpy.cumsum(w_pair[idx][::-1])[::-1], 0)
+        qmin = vhfopt.direct_scf_tol / numpy.maximum(q_pair, 1e-300)
+        w_kl = w_above[numpy.searchsorted(q_sorted, qmin, side='right')]
+    frac = numpy.cumsum(w_pair) / w_pair.sum()
+    cost = w_pair * w_kl * frac
+    shls_pairs = numpy.asarray(numpy.vstack((ish,jsh)).T, dtype=numpy.int32,
+                               order='C')
+    return shls_pairs, cost
+
+def _get_qcond(vhfopt, nbas):
+    if (vhfopt is None or not vhfopt._this or
+        not vhfopt._this.contents.q_cond):
+        return None
+    ptr = ctypes.cast(vhfopt._this.contents.q_cond,
+                      ctypes.POINTER(ctypes.c_double))
+    return numpy.ctypeslib.as_array(ptr, shape=(nbas,nbas)).copy()
+
+def partition_shell_pairs(cost, nproc):
+    '''Split the shell pairs into nproc contiguous segments of similar cost.
+    Returns the boundaries of the segments.'''
+    cumcost = numpy.cumsum(cost)
+    if cumcost.size == 0 or cumcost[-1] == 0:
+        bounds = numpy.linspace(0, len(cost), nproc+1).astype(int)
+    else:
+        bounds = numpy.searchsorted(cumcost, cumcost[-1]*numpy.arange(1,nproc)/nproc)
+        bounds = numpy.hstack((0, bounds, len(cost)))
+    return bounds
+
+# Multi-process version of direct.  The shell pairs are distributed to a
+# persistent pool of nproc worker processes by the cost estimated from the
+# Schwarz bounds.  The partial J/K of every worker is reduced in the parent
+# process.
+def direct_mp(dms, atm, bas, env, vhfopt=None, hermi=0, nproc=None,
+              max_memory=pyscf.lib.parameters.MEMORY_MAX):
+    '''J, K matrices of direct, computed by nproc processes.
+
+    Every worker holds one partial J/K of size 2*len(dms)*nao**2, nproc is
+    reduced to fit these buffers in max_memory (MB).  The workers are forked
+    once and reused by the following calls.  vhfopt is taken as the direct
+    SCF optimizer (CVHFnrs8_prescreen), which the workers rebuild with the
+    same direct_scf_tol.  When only one process is allowed or the processes
+    cannot be forked, the J/K matrices are computed by :func:`direct`.
+    '''
+    import multiprocessing
+    if nproc is None:
+        nproc = multiprocessing.cpu_count()
+    c_atm = numpy.asarray(atm, dtype=numpy.int32, order='C')
+    c_bas = numpy.asarray(bas, dtype=numpy.int32, order='C')
+    c_env = numpy.asarray(env, dtype=numpy.double, order='C')
+
+    if isinstance(dms, numpy.ndarray) and dms.ndim == 2:
+        n_dm = 1
+        nao = dms.shape[0]
+    else:
+        n_dm = len(dms)
+        nao = dms[0].shape[0]
+    dms = numpy.asarray(dms, order='C').reshape(n_dm,nao,nao)
+
+    blksize = 2*n_dm*nao*nao
+    mem_avail = max_memory - pyscf.lib.current_memory()[0]
+    nproc = min(nproc, int(mem_avail*1e6/8/blksize))
+    pool = None
+    if nproc > 1:
+        pool = _get_mp_pool(nproc)
+    if pool is None:
+        if n_dm == 1:
+            dms = dms[0]
+        return direct(dms, atm, bas, env, vhfopt, hermi)
+
+    if vhfopt is None:
+        direct_scf_tol = None
+    else:
+        direct_scf_tol = vhfopt.direct_scf_tol
+    shls_pairs, cost = shell_pair_cost(c_atm, c_bas, c_env, vhfopt)
+    bounds = partition_shell_pairs(cost, nproc)
+    tasks = [(numpy.asarray(shls_pairs[bounds[i]:bounds[i+1]], order='C'),
+              dms, c_atm, c_bas, c_env, direct_scf_tol, hermi)
+             for i in range(nproc)]
+    vjk = numpy.zeros(blksize)
+    for v in pool.imap_unordered(_direct_mp_worker, tasks):
+        vjk += v
+
+    vjk = vjk.reshape(2,n_dm,nao,nao)
+    # vj must be symmetric
+    for idm in range(n_dm):
+        vjk[0,idm] = pyscf.lib.hermi_triu_(vjk[0,idm], 1)
+    if hermi != 0: # vk depends
+        for idm in range(n_dm):
+            vjk[1,idm] = pyscf.lib.hermi_triu_(vjk[1,idm], hermi)
+    if n_dm == 1:
+        vjk = vjk.reshape(2,nao,nao)
+    return vjk
+
+# The pool of direct_mp is kept for the following calls (the J/K builds of
+# the next SCF iterations) and is replaced only when nproc changes.
+_mp_pool = {}
+def _get_mp_pool(nproc):
+    import multiprocessing
+    if _mp_pool.get('nproc') == nproc:
+        return _mp_pool['pool']
+    _close_mp_pool()
+    if hasattr(multiprocessing, 'get_context'):
+        try:
+            ctx = multiprocessing.get_context('fork')
+        except ValueError:
+            return None
+    elif sys.platform == 'win32':
+        return None
+    else:  # python 2 forks on POSIX
+        ctx = multiprocessing
+    if not _mp_pool:
+        import atexit
+        atexit.register(_close_mp_pool)
+    _mp_pool['nproc'] = nproc
+    _mp_pool['pool'] = ctx.Pool(nproc, initializer=_direct_mp_init)
+    return _mp_pool['pool']
+
+def _close_mp_pool():
+    pool = _mp_pool.pop('pool', None)
+    _mp_pool.pop('nproc', None)
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+
+def _direct_mp_init():
+    try:
+        # avoid oversubscription of the OpenMP threads in workers
+        libcvhf.omp_set_num_threads(1)
+    except AttributeError:
+        pass
+
+class _AtmBasEnv(object):
+    '''The attributes of Mole which VHFOpt reads'''
+    def __init__(self, atm, bas, env):
+        self._atm = atm
+        self._bas = bas
+        self._env = env
+
+# The integral optimizers of the last molecule, rebuilt in the worker
+# process only when the molecule is changed.
+_mp_worker_opt = {}
+def _direct_mp_worker(args):
+    shls_pairs, dms, c_atm, c_bas, c_env, direct_scf_tol, hermi = args
+    n_dm, nao = dms.shape[:2]
+    natm = ctypes.c_int(c_atm.shape[0])
+    nbas = ctypes.c_int(c_bas.shape[0])
+
+    key = (c_atm, c_bas, c_env, direct_scf_tol is not None)
+    last = _mp_worker_opt.get('key')
+    if (last is None or last[3] != key[3] or
+        not all(numpy.array_equal(a, b) for a, b in zip(last[:3], key[:3]))):
+        _mp_worker_opt.clear()
+        if direct_scf_tol is None:
+            _mp_worker_opt['cintopt'] = make_cintopt(c_atm, c_bas, c_env,
+                                                     'cint2e_sph')
+        else:
+            mol = _AtmBasEnv(c_atm, c_bas, c_env)
+            _mp_worker_opt['vhfopt'] = VHFOpt(mol, 'cint2e_sph',
+                                              'CVHFnrs8_prescreen',
+                                              'CVHFsetnr_direct_scf',
+                                              'CVHFsetnr_direct_scf_dm')
+        _mp_worker_opt['key'] = key
+
+    if direct_scf_tol is None:
+        cintor = _fpointer('cint2e_sph')
+        cintopt = _mp_worker_opt['cintopt']
+        cvhfopt = pyscf.lib.c_null_ptr()
+    else:
+        vhfopt = _mp_worker_opt['vhfopt']
+        vhfopt.direct_scf_tol = direct_scf_tol
+        vhfopt.set_dm_(dms, c_atm, c_bas, c_env)
+        cvhfopt = vhfopt._this
+        cintopt = vhfopt._cintopt
+        cintor = vhfopt._intor
+
+    fdrv = getattr(libcvhf, 'CVHFnr_direct_sub')
+    fdot = _fpointer('CVHFdot_nrs8')
+    fvj = _fpointer('CVHFnrs8_ji_s2kl')
+    if hermi == 1:
+        fvk = _fpointer('CVHFnrs8_li_s2kj')
+    else:
+        fvk = _fpointer('CVHFnrs8_li_s1kj')
+    fjk = (ctypes.c_void_p*(2*n_dm))()
+    dm1 = (ctypes.c_void_p*(2*n_dm))()
+    for i in range(n_dm):
+        dm1[i] = dms[i].ctypes.data_as(ctypes.c_void_p)
+        fjk[i] = fvj
+        dm1[n_dm+i] = dms[i].ctypes.data_as(ctypes.c_void_p)
+        fjk[n_dm+i] = fvk
+
+    vjk = numpy.empty(2*n_dm*nao*nao)
+    fdrv(cintor, fdot, fjk, dm1,
+         vjk.ctypes.data_as(ctypes.c_void_p),
+         ctypes.c_int(n_dm*2), ctypes.c_int(1),
+         cintopt, cvhfopt,
+         shls_pairs.ctypes.data_as(ctypes.c_void_p),
+         ctypes.c_int(len(shls_pairs)),
+         c_atm.ctypes.data_as(ctypes.c_void_p), natm,
+         c_bas.ctypes.data_as(ctypes.c_void_p), nbas,
+         c_env.ctypes.data_as(ctypes.c_void_p))
+    return vjk
+
 # call all fjk for each dm, the return array has len(dms)*len(jkdescript)*ncomp components
 # jkdescript: 'ij->s1kl', 'kl->s2ij', ...
 def direct_mapdm(intor, intsymm, jkdescript,
@@ -363,6 +638,11 @@ def direct_bindm(intor, intsymm, jkdescript,
 
 # 8-fold permutation symmetry
 def int2e_sph(atm, bas, env):
+    '''8-fold symmetric (ij|kl).  The integrals are read from
+    :mod:`pyscf.lib.intcache` if the integral cache is enabled.'''
+    return intcache.load_or_compute('int2e_sph', atm, bas, env,
+                                    lambda: _int2e_sph(atm, bas, env))
+def _int2e_sph(atm, bas, env):
     c_atm = numpy.asarray(atm, dtype=numpy.int32, order='C')
     c_bas = numpy.asarray(bas, dtype=numpy.int32, order='C')
     c_env = numpy.asarray(env, dtype=numpy.double, order='C')
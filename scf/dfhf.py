@@ -6,7 +6,6 @@
 import time
 import ctypes
 import tempfile
-from functools import reduce
 import numpy
 import scipy.linalg
 import pyscf.lib
@@ -55,7 +54,23 @@ def density_fit(mf, auxbasis='weigend'):
             self._cderi = None
             self._naoaux = None
             self._tag_df = True
-            self._keys = self._keys.union(['auxbasis'])
+            self._dm_occ = None
+# Keep the blocks of the DF integrals in memory if _cderi is on disk
+            self.pin_cderi_blocks = False
+            self._cderi_pinned = None
+            self._keys = self._keys.union(['auxbasis', 'pin_cderi_blocks'])
+
+        def make_rdm1(self, mo_coeff=None, mo_occ=None):
+            if mo_coeff is None: mo_coeff = self.mo_coeff
+            if mo_occ is None: mo_occ = self.mo_occ
+            dm = mf.__class__.make_rdm1(self, mo_coeff, mo_occ)
+# Keep the occupied orbitals of dm, to factorize dm in the DF exchange.  A
+# copy of dm is saved since dm may be modified in place (e.g. damping).
+            if numpy.iscomplexobj(dm):
+                self._dm_occ = None
+            else:
+                self._dm_occ = (dm.copy(), _occ_factors(mo_coeff, mo_occ, dm))
+            return dm
 
         def get_jk(self, mol=None, dm=None, hermi=1):
             if mol is None: mol = self.mol
@@ -119,6 +134,9 @@ def get_jk_(mf, mol, dms, hermi=1, with_j=True, with_k=True):
     fdrv = _ao2mo.libao2mo.AO2MOnr_e2_drv
     ftrans = _ao2mo._fpointer('AO2MOtranse2_nr_s2')
 
+    dm_occ = getattr(mf, '_dm_occ', None)
+    if dm_occ is not None and not _same_dm(dm_occ[0], dms):
+        dm_occ = None
     if isinstance(dms, numpy.ndarray) and dms.ndim == 2:
         dms = [dms]
         nset = 1
@@ -127,63 +145,89 @@ def get_jk_(mf, mol, dms, hermi=1, with_j=True, with_k=True):
     vj = numpy.zeros((nset,nao,nao))
     vk = numpy.zeros((nset,nao,nao))
 
+# J and K of all density matrices are computed in one pass over the DF
+# integrals.  For J, the density matrices are packed in one matrix so that the
+# contraction with each block of the integrals is one matrix-matrix product.
     #:vj = reduce(numpy.dot, (cderi.reshape(-1,nao*nao), dm.reshape(-1),
     #:                        cderi.reshape(-1,nao*nao))).reshape(nao,nao)
-    if hermi == 1:
-# I cannot assume dm is positive definite because it might be the density
-# matrix difference when the mf.direct_scf flag is set.
-        dmtril = []
-        cpos = []
-        cneg = []
-        for k, dm in enumerate(dms):
-            if with_j:
-                dmtril.append(pyscf.lib.pack_tril(dm+dm.T))
-                for i in range(nao):
-                    dmtril[k][i*(i+1)//2+i] *= .5
+    if with_j:
+        idx, idy = numpy.tril_indices(nao)
+        dmtril = numpy.asarray([(dm+dm.T)[idx,idy] for dm in dms])
+        diagidx = numpy.arange(nao)
+        dmtril[:,diagidx*(diagidx+1)//2+diagidx] *= .5
+        vjtril = numpy.zeros((nset,nao*(nao+1)//2))
+
+    if hermi == 1 and with_k:
+# K is computed from the factors of dm = cpos*cpos.T - cneg*cneg.T, so that
+# (P|ij) is only transformed to (P|i*) with the columns of the factors.  If dm
+# was generated by make_rdm1, the factors are the occupied orbitals.
+        if dm_occ is not None:
+            cpos = dm_occ[1]
+            cneg = [numpy.zeros((nao,0))] * nset
+            log.debug1('DF-K with occupied orbitals %s',
+                       [c.shape[1] for c in cpos])
+        else:
+            cpos = []
+            cneg = []
+            for dm in dms:
+                cp, cn = factorize_dm(dm)
+                cpos.append(cp)
+                cneg.append(cn)
+# The factors of all density matrices are half-transformed together
+        csets = []
+        for clst, sign in ((cpos, 1), (cneg, -1)):
+            locs = numpy.append(0, numpy.cumsum([x.shape[1] for x in clst]))
+            if locs[-1] > 0:
+                csets.append((numpy.asarray(numpy.hstack(clst), order='F'),
+                              locs, sign))
+        ncol = max([0] + [c[0].shape[1] for c in csets])
+        blkmem = ncol * nao
+    elif with_k:
+        blkmem = nao * nao * 2
+    else:
+        blkmem = 0
+# The integrals on disk are read by blocks in the background while the
+# previous block is being contracted.  The memory of one auxiliary function
+# includes the two buffers of the prefetch.
+    if not isinstance(cderi, numpy.ndarray):
+        blkmem += nao*(nao+1)//2 * 2
+    mem_now = pyscf.lib.current_memory()[0]
+    max_memory = max(2000, mf.max_memory*.9-mem_now)
+    blksize = max(4, min(BLOCKDIM, int(max_memory*1e6/8/max(1,blkmem))))
+    pinned, max_pinned = _pinned_blocks(mf, blksize*blkmem*8/1e6)
+    if mf.verbose >= logger.DEBUG1:
+        t1 = log.timer('Initialization', *t0)
 
-            if with_k:
-                e, c = scipy.linalg.eigh(dm)
-                pos = e > OCCDROP
-                neg = e < -OCCDROP
-
-                #:vk = numpy.einsum('pij,jk->kpi', cderi, c[:,abs(e)>OCCDROP])
-                #:vk = numpy.einsum('kpi,kpj->ij', vk, vk)
-                tmp = numpy.einsum('ij,j->ij', c[:,pos], numpy.sqrt(e[pos]))
-                cpos.append(numpy.asarray(tmp, order='F'))
-                tmp = numpy.einsum('ij,j->ij', c[:,neg], numpy.sqrt(-e[neg]))
-                cneg.append(numpy.asarray(tmp, order='F'))
-        if mf.verbose >= logger.DEBUG1:
-            t1 = log.timer('Initialization', *t0)
+    if hermi == 1:
         with df.load(cderi) as feri:
-            buf = numpy.empty((BLOCKDIM*nao,nao))
-            for b0, b1 in prange(0, mf._naoaux, BLOCKDIM):
-                eri1 = numpy.array(feri[b0:b1], copy=False)
+            if with_k:
+                buf = numpy.empty((blksize*ncol,nao))
+            for b0, b1, eri1 in df.addons.prefetch_blocks(feri, blksize,
+                                                          pinned, max_pinned):
                 if mf.verbose >= logger.DEBUG1:
                     t1 = log.timer('load buf %d:%d'%(b0,b1), *t1)
-                for k in range(nset):
-                    if with_j:
-                        buf1 = reduce(numpy.dot, (eri1, dmtril[k], eri1))
-                        vj[k] += pyscf.lib.unpack_tril(buf1, hermi)
-                    if with_k and cpos[k].shape[1] > 0:
-                        buf1 = buf[:(b1-b0)*cpos[k].shape[1]]
+                if with_j:
+                    rho = numpy.dot(dmtril, eri1.T)
+                    vjtril += numpy.dot(rho, eri1)
+                if with_k:
+                    for c, locs, sign in csets:
+                        nc = c.shape[1]
+                        buf1 = buf[:(b1-b0)*nc]
                         fdrv(ftrans, fmmm,
                              buf1.ctypes.data_as(ctypes.c_void_p),
                              eri1.ctypes.data_as(ctypes.c_void_p),
-                             cpos[k].ctypes.data_as(ctypes.c_void_p),
+                             c.ctypes.data_as(ctypes.c_void_p),
                              ctypes.c_int(b1-b0), ctypes.c_int(nao),
-                             ctypes.c_int(0), ctypes.c_int(cpos[k].shape[1]),
+                             ctypes.c_int(0), ctypes.c_int(nc),
                              ctypes.c_int(0), ctypes.c_int(0))
-                        vk[k] += pyscf.lib.dot(buf1.T, buf1)
-                    if with_k and cneg[k].shape[1] > 0:
-                        buf1 = buf[:(b1-b0)*cneg[k].shape[1]]
-                        fdrv(ftrans, fmmm,
-                             buf1.ctypes.data_as(ctypes.c_void_p),
-                             eri1.ctypes.data_as(ctypes.c_void_p),
-                             cneg[k].ctypes.data_as(ctypes.c_void_p),
-                             ctypes.c_int(b1-b0), ctypes.c_int(nao),
-                             ctypes.c_int(0), ctypes.c_int(cneg[k].shape[1]),
-                             ctypes.c_int(0), ctypes.c_int(0))
-                        vk[k] -= pyscf.lib.dot(buf1.T, buf1)
+                        buf1 = buf1.reshape(b1-b0,nc,nao)
+                        for k in range(nset):
+                            if locs[k+1] > locs[k]:
+                                buf2 = buf1[:,locs[k]:locs[k+1]].reshape(-1,nao)
+                                if sign > 0:
+                                    vk[k] += pyscf.lib.dot(buf2.T, buf2)
+                                else:
+                                    vk[k] -= pyscf.lib.dot(buf2.T, buf2)
                 if mf.verbose >= logger.DEBUG1:
                     t1 = log.timer('jk', *t1)
     else:
@@ -194,25 +238,24 @@ def get_jk_(mf, mol, dms, hermi=1, with_j=True, with_k=True):
                  ctypes.c_int(0), ctypes.c_int(nao),
                  ctypes.c_int(0), ctypes.c_int(0))
         dms = [numpy.asarray(dm, order='F') for dm in dms]
-        if mf.verbose >= logger.DEBUG1:
-            t1 = log.timer('Initialization', *t0)
         with df.load(cderi) as feri:
-            buf = numpy.empty((2,BLOCKDIM,nao,nao))
-            for b0, b1 in prange(0, mf._naoaux, BLOCKDIM):
-                eri1 = numpy.array(feri[b0:b1], copy=False)
+            if with_k:
+                buf = numpy.empty((2,blksize,nao,nao))
+            for b0, b1, eri1 in df.addons.prefetch_blocks(feri, blksize,
+                                                          pinned, max_pinned):
                 if mf.verbose >= logger.DEBUG1:
                     t1 = log.timer('load buf %d:%d'%(b0,b1), *t1)
-                for k in range(nset):
-                    buf1 = buf[0,:b1-b0]
-                    fdrv(ftrans, fmmm,
-                         buf1.ctypes.data_as(ctypes.c_void_p),
-                         eri1.ctypes.data_as(ctypes.c_void_p),
-                         dms[k].ctypes.data_as(ctypes.c_void_p),
-                         ctypes.c_int(b1-b0), *rargs)
-                    rho = numpy.einsum('kii->k', buf1)
-                    vj[k] += pyscf.lib.unpack_tril(numpy.dot(rho, eri1), 1)
-
-                    if with_k:
+                if with_j:
+                    rho = numpy.dot(dmtril, eri1.T)
+                    vjtril += numpy.dot(rho, eri1)
+                if with_k:
+                    for k in range(nset):
+                        buf1 = buf[0,:b1-b0]
+                        fdrv(ftrans, fmmm,
+                             buf1.ctypes.data_as(ctypes.c_void_p),
+                             eri1.ctypes.data_as(ctypes.c_void_p),
+                             dms[k].ctypes.data_as(ctypes.c_void_p),
+                             ctypes.c_int(b1-b0), *rargs)
                         buf2 = buf[1,:b1-b0]
                         fdrv(ftrans, fcopy,
                              buf2.ctypes.data_as(ctypes.c_void_p),
@@ -224,6 +267,10 @@ def get_jk_(mf, mol, dms, hermi=1, with_j=True, with_k=True):
                 if mf.verbose >= logger.DEBUG1:
                     t1 = log.timer('jk', *t1)
 
+    if with_j:
+        for k in range(nset):
+            vj[k] = pyscf.lib.unpack_tril(vjtril[k], 1)
+
     if len(dms) == 1:
         vj = vj[0]
         vk = vk[0]
@@ -231,6 +278,88 @@ def get_jk_(mf, mol, dms, hermi=1, with_j=True, with_k=True):
     return vj, vk
 
 
+def _pinned_blocks(mf, mem_blocks):
+    '''The cache of the DF integral blocks kept in memory between the SCF
+    iterations, and the memory (in MB) the cache can take.'''
+    if (not getattr(mf, 'pin_cderi_blocks', False) or
+        isinstance(mf._cderi, numpy.ndarray)):
+        return None, 0
+    if (getattr(mf, '_cderi_pinned', None) is None or
+        mf._cderi_pinned[0] is not mf._cderi):
+        mf._cderi_pinned = (mf._cderi, {})
+    pinned = mf._cderi_pinned[1]
+    mem_pinned = sum([x.nbytes for blks in pinned.values() for x in blks]) / 1e6
+    max_pinned = mf.max_memory*.9 - pyscf.lib.current_memory()[0] - mem_blocks
+    return pinned, max(0, max_pinned + mem_pinned)
+
+def factorize_dm(dm, tol=OCCDROP):
+    '''Factorize the symmetric density matrix dm = cpos*cpos.T - cneg*cneg.T.
+    Pivoted Cholesky decomposition is used for the positive semi-definite dm
+    and its cost scales with the rank of dm.  The eigenvalue decomposition is
+    used if dm is not positive semi-definite, e.g. the density matrix
+    difference in direct SCF.
+
+    Returns:
+        cpos, cneg : 2D arrays with the factors in columns
+    '''
+    cpos = _pivoted_cholesky(dm, tol)
+    if cpos is not None:
+        return cpos, numpy.zeros((dm.shape[0],0))
+
+    e, c = scipy.linalg.eigh(dm)
+    pos = e > tol
+    neg = e < -tol
+    #:vk = numpy.einsum('pij,jk->kpi', cderi, c[:,abs(e)>OCCDROP])
+    #:vk = numpy.einsum('kpi,kpj->ij', vk, vk)
+    cpos = numpy.einsum('ij,j->ij', c[:,pos], numpy.sqrt(e[pos]))
+    cneg = numpy.einsum('ij,j->ij', c[:,neg], numpy.sqrt(-e[neg]))
+    return cpos, cneg
+
+def _pivoted_cholesky(a, tol=OCCDROP):
+    '''a = L*L.T.  Return None if a is not positive semi-definite'''
+    n = a.shape[0]
+    d = a.diagonal().copy()
+    if d.min() < -tol:
+        return None
+    L = numpy.zeros((n,n))
+    rank = 0
+    while rank < n:
+        p = numpy.argmax(d)
+        if d[p] < tol:
+            break
+        col = a[:,p] - numpy.dot(L[:,:rank], L[p,:rank])
+        L[:,rank] = col * (1/numpy.sqrt(d[p]))
+        d -= L[:,rank]**2
+        d[p] = 0
+        rank += 1
+    L = L[:,:rank]
+# The residue is large when the pivot search breaks down for indefinite a
+    if abs(a - numpy.dot(L, L.T)).max() > tol*1e3:
+        return None
+    return L
+
+def _same_dm(dm0, dms):
+    if numpy.shape(dms) != dm0.shape:
+        return False
+    return numpy.array_equal(dm0, numpy.asarray(dms))
+
+def _occ_factors(mo_coeff, mo_occ, dm):
+    '''The orbitals which give dm = c*c.T for each density matrix of the
+    RHF, UHF or ROHF make_rdm1'''
+    mo_occ = numpy.asarray(mo_occ)
+    if dm.ndim == 2:
+        mo_coeff = [mo_coeff]
+        mo_occ = [mo_occ]
+    elif mo_occ.ndim == 1:  # ROHF
+        mo_coeff = [mo_coeff, mo_coeff]
+        mo_occ = [(mo_occ>0).astype(float), (mo_occ==2).astype(float)]
+    cs = []
+    for c, occ in zip(mo_coeff, mo_occ):
+        mask = occ > OCCDROP
+        cs.append(numpy.einsum('ij,j->ij', c[:,mask], numpy.sqrt(occ[mask])))
+    return cs
+
+
 def r_get_jk_(mf, mol, dms, hermi=1):
     '''Relativistic density fitting JK'''
     t0 = (time.clock(), time.time())
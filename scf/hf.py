@@ -124,6 +124,12 @@ Keyword argument "init_dm" is replaced by "dm0"''')
 
     scf_conv = False
     cycle = 0
+# In direct SCF, the HF potential is updated incrementally from the density
+# change.  incr_cycle counts the incremental updates since the last full
+# build, incr_loose marks whether any of them used a loose screening threshold.
+    incr_cycle = 0
+    incr_loose = False
+    norm_ddm_last = None
     cput1 = logger.timer(mf, 'initialize scf', *cput0)
     while not scf_conv and cycle < max(1, mf.max_cycle):
         dm_last = dm
@@ -133,16 +139,46 @@ Keyword argument "init_dm" is replaced by "dm0"''')
         mo_energy, mo_coeff = mf.eig(fock, s1e)
         mo_occ = mf.get_occ(mo_energy, mo_coeff)
         dm = mf.make_rdm1(mo_coeff, mo_occ)
-        vhf = mf.get_veff(mol, dm, dm_last, vhf)
+        norm_ddm = numpy.linalg.norm(dm-dm_last)
+
+        if (mf.direct_scf and mf.rebuild_nsteps > 0 and
+            (incr_cycle+1 >= mf.rebuild_nsteps or
+             (norm_ddm_last is not None and norm_ddm > norm_ddm_last))):
+            logger.debug(mf, 'Rebuild HF potential from full density matrix')
+            set_direct_scf_tol_(mf, mf.direct_scf_tol)
+            vhf = mf.get_veff(mol, dm)
+            incr_cycle = 0
+            incr_loose = False
+        else:
+            if mf.direct_scf:
+                tol = adapt_direct_scf_tol(mf.direct_scf_tol, norm_ddm,
+                                           conv_tol_grad)
+                incr_loose = incr_loose or tol > mf.direct_scf_tol
+                set_direct_scf_tol_(mf, tol)
+            vhf = mf.get_veff(mol, dm, dm_last, vhf)
+            incr_cycle += 1
+        norm_ddm_last = norm_ddm
         e_tot = mf.energy_tot(dm, h1e, vhf)
 
         norm_gorb = numpy.linalg.norm(mf.get_grad(mo_coeff, mo_occ, h1e+vhf))
-        norm_ddm = numpy.linalg.norm(dm-dm_last)
         logger.info(mf, 'cycle= %d E= %.15g  delta_E= %4.3g  |g|= %4.3g  |ddm|= %4.3g',
                     cycle+1, e_tot, e_tot-last_hf_e, norm_gorb, norm_ddm)
 
         if (abs(e_tot-last_hf_e) < conv_tol and norm_gorb < conv_tol_grad):
             scf_conv = True
+            if incr_loose:
+# The screening errors of the loose incremental builds are accumulated in vhf.
+# Remove them before accepting the convergence.
+                set_direct_scf_tol_(mf, mf.direct_scf_tol)
+                vhf = mf.get_veff(mol, dm)
+                incr_cycle = 0
+                incr_loose = False
+                e_last, e_tot = e_tot, mf.energy_tot(dm, h1e, vhf)
+                norm_gorb = numpy.linalg.norm(mf.get_grad(mo_coeff, mo_occ, h1e+vhf))
+                logger.info(mf, 'rebuild  E= %.15g  delta_E= %4.3g  |g|= %4.3g',
+                            e_tot, e_tot-e_last, norm_gorb)
+                scf_conv = (abs(e_tot-last_hf_e) < conv_tol and
+                            norm_gorb < conv_tol_grad)
 
         if dump_chk:
             mf.dump_chk(locals())
@@ -153,6 +189,9 @@ Keyword argument "init_dm" is replaced by "dm0"''')
         cput1 = logger.timer(mf, 'cycle= %d'%(cycle+1), *cput1)
         cycle += 1
 
+    if mf.direct_scf:
+        set_direct_scf_tol_(mf, mf.direct_scf_tol)
+
     # An extra diagonalization, to remove level shift
     fock = mf.get_fock(h1e, s1e, vhf, dm, cycle, None, 0, 0, 0)
     mo_energy, mo_coeff = mf.eig(fock, s1e)
@@ -161,6 +200,37 @@ Keyword argument "init_dm" is replaced by "dm0"''')
     return scf_conv, e_tot, mo_energy, mo_coeff, mo_occ
 
 
+def adapt_direct_scf_tol(direct_scf_tol, norm_ddm, conv_tol_grad,
+                         max_factor=1e4):
+    '''Integral screening threshold for the incremental Fock build.
+
+    The error of the screened J/K increment only needs to be small compared
+    to the change of the density matrix.  The threshold is loosened by the
+    ratio |ddm|/conv_tol_grad (at most by max_factor) and approaches
+    direct_scf_tol as the density change shrinks.
+
+    Examples:
+
+    >>> scf.hf.adapt_direct_scf_tol(1e-13, 1e-1, 1e-5)
+    1e-09
+    >>> scf.hf.adapt_direct_scf_tol(1e-13, 1e-7, 1e-5)
+    1e-13
+    '''
+    factor = min(max(norm_ddm/conv_tol_grad, 1), max_factor)
+    return direct_scf_tol * factor
+
+def set_direct_scf_tol_(mf, tol):
+    '''Update the screening threshold of the direct SCF optimizer(s) of mf'''
+    if isinstance(mf.opt, (tuple, list)):
+        opts = mf.opt
+    else:
+        opts = (mf.opt,)
+    for opt in opts:
+        if isinstance(opt, _vhf.VHFOpt):
+            opt.direct_scf_tol = tol
+    return mf
+
+
 def energy_elec(mf, dm, h1e=None, vhf=None):
     r'''Electronic part of Hartree-Fock energy, for given core hamiltonian and
     HF potential
@@ -492,13 +562,12 @@ def dot_eri_dm(eri, dm, hermi=0):
     if isinstance(dm, numpy.ndarray) and dm.ndim == 2:
         vj, vk = _vhf.incore(eri, dm, hermi=hermi)
     else:
-        vjk = [_vhf.incore(eri, dmi, hermi=hermi) for dmi in dm]
-        vj = numpy.array([v[0] for v in vjk])
-        vk = numpy.array([v[1] for v in vjk])
+# all density matrices are contracted in one pass over the integrals
+        vj, vk = _vhf.incore(eri, numpy.asarray(dm), hermi=hermi)
     return vj, vk
 
 
-def get_jk(mol, dm, hermi=1, vhfopt=None):
+def get_jk(mol, dm, hermi=1, vhfopt=None, nproc=1):
     '''Compute J, K matrices for the given density matrix
 
     Args:
@@ -518,6 +587,9 @@ def get_jk(mol, dm, hermi=1, vhfopt=None):
         vhfopt :
             A class which holds precomputed quantities to optimize the
             computation of J, K matrices
+        nproc : int
+            If nproc > 1, the shell quartets are distributed over nproc
+            processes, see :func:`_vhf.direct_mp`
 
     Returns:
         Depending on the given dm, the function returns one J and one K matrix,
@@ -534,9 +606,15 @@ def get_jk(mol, dm, hermi=1, vhfopt=None):
     >>> print(j.shape)
     (3, 2, 2)
     '''
-    vj, vk = _vhf.direct(numpy.array(dm, copy=False),
-                         mol._atm, mol._bas, mol._env,
-                         vhfopt=vhfopt, hermi=hermi)
+    if nproc > 1:
+        vj, vk = _vhf.direct_mp(numpy.array(dm, copy=False),
+                                mol._atm, mol._bas, mol._env,
+                                vhfopt=vhfopt, hermi=hermi, nproc=nproc,
+                                max_memory=mol.max_memory)
+    else:
+        vj, vk = _vhf.direct(numpy.array(dm, copy=False),
+                             mol._atm, mol._bas, mol._env,
+                             vhfopt=vhfopt, hermi=hermi)
     return vj, vk
 
 
@@ -832,6 +910,18 @@ class SCF(object):
             Direct SCF is used by default.
         direct_scf_tol : float
             Direct SCF cutoff threshold.  Default is 1e-13.
+        direct_scf_nproc : int
+            Number of processes to compute J, K matrices in direct SCF.  The
+            shell quartets are distributed by the cost estimated from the
+            Schwarz bounds.  Set OMP_NUM_THREADS=1 when it is used with the
+            OpenMP build.  Default is 1.
+        rebuild_nsteps : int
+            In direct SCF, the HF potential is built incrementally from the
+            change of density matrix, using a screening threshold adapted to
+            the size of the change.  The full HF potential is rebuilt every
+            rebuild_nsteps cycles or when the change of density matrix stops
+            decreasing.  Set it to 0 to always build incrementally.
+            Default is 8.
         callback : function(envs_dict) => None
             callback function takes one dict as the argument which is
             generated by the builtin function :func:`locals`, so that the
@@ -888,6 +978,8 @@ class SCF(object):
         self.level_shift = 0
         self.direct_scf = True
         self.direct_scf_tol = 1e-13
+        self.direct_scf_nproc = 1
+        self.rebuild_nsteps = 8
 ##################################################
 # don't modify the following attributes, they are not input options
         self.mo_energy = None
@@ -929,6 +1021,9 @@ class SCF(object):
         logger.info(self, 'direct_scf = %s', self.direct_scf)
         if self.direct_scf:
             logger.info(self, 'direct_scf_tol = %g', self.direct_scf_tol)
+            logger.info(self, 'rebuild_nsteps = %d', self.rebuild_nsteps)
+            if self.direct_scf_nproc > 1:
+                logger.info(self, 'direct_scf_nproc = %d', self.direct_scf_nproc)
         if self.chkfile:
             logger.info(self, 'chkfile to save SCF result = %s', self.chkfile)
         logger.info(self, 'max_memory %d MB (current use %d MB)',
@@ -1137,7 +1232,7 @@ class SCF(object):
         cpu0 = (time.clock(), time.time())
         if self.direct_scf and self.opt is None:
             self.opt = self.init_direct_scf(mol)
-        vj, vk = get_jk(mol, dm, hermi, self.opt)
+        vj, vk = get_jk(mol, dm, hermi, self.opt, self.direct_scf_nproc)
         logger.timer(self, 'vj and vk', *cpu0)
         return vj, vk
 
@@ -1263,9 +1358,9 @@ class RHF(SCF):
                 self._eri = _vhf.int2e_sph(mol._atm, mol._bas, mol._env)
             vj, vk = dot_eri_dm(self._eri, dm, hermi)
         else:
-            if self.direct_scf:
+            if self.direct_scf and self.opt is None:
                 self.opt = self.init_direct_scf(mol)
-            vj, vk = get_jk(mol, dm, hermi, self.opt)
+            vj, vk = get_jk(mol, dm, hermi, self.opt, self.direct_scf_nproc)
         logger.timer(self, 'vj and vk', *cpu0)
         return vj, vk
 
@@ -35,6 +35,13 @@ class KnowValues(unittest.TestCase):
         mf = scf.density_fit(scf.RHF(mol))
         self.assertAlmostEqual(mf.scf(), -76.025936299702536, 9)
 
+    def test_rhf_outcore(self):
+        mf = scf.density_fit(scf.RHF(mol))
+        mf.max_memory = 0
+        mf.pin_cderi_blocks = True
+        self.assertAlmostEqual(mf.scf(), -76.025936299702536, 9)
+        self.assertFalse(isinstance(mf._cderi, numpy.ndarray))
+
     def test_uhf(self):
         mf = scf.density_fit(scf.UHF(mol))
         self.assertAlmostEqual(mf.scf(), -76.025936299702536, 9)
@@ -94,6 +101,46 @@ class KnowValues(unittest.TestCase):
         vhf0 = vj1 - vk1 * .5
         self.assertTrue(numpy.allclose(vhf0, vhf1))
 
+    def test_batch_jk(self):
+        nao = mol.nao_nr()
+        numpy.random.seed(1)
+        dm = numpy.random.random((3,nao,nao))
+        dm = dm + dm.transpose(0,2,1)
+        mf = scf.density_fit(scf.RHF(mol))
+        vj0, vk0 = scf.dfhf.get_jk_(mf, mol, dm, hermi=1)
+        for i in range(3):
+            vj1, vk1 = scf.dfhf.get_jk_(mf, mol, dm[i], hermi=1)
+            self.assertTrue(numpy.allclose(vj0[i], vj1))
+            self.assertTrue(numpy.allclose(vk0[i], vk1))
+        vj1 = scf.dfhf.get_jk_(mf, mol, dm, hermi=1, with_k=False)[0]
+        self.assertTrue(numpy.allclose(vj0, vj1))
+
+    def test_occ_k(self):
+        mf = scf.density_fit(scf.RHF(mol))
+        mf.scf()
+        dm = mf.make_rdm1()
+        self.assertTrue(numpy.array_equal(mf._dm_occ[0], dm))
+        vj0, vk0 = mf.get_jk(mol, dm)
+        vj1, vk1 = mf.get_jk(mol, dm.copy())
+        self.assertTrue(numpy.allclose(vj0, vj1))
+        self.assertTrue(numpy.allclose(vk0, vk1))
+        dm *= .7  # modified in place, e.g. by damping
+        vj1, vk1 = mf.get_jk(mol, dm)
+        self.assertTrue(numpy.allclose(vj0*.7, vj1))
+        self.assertTrue(numpy.allclose(vk0*.7, vk1))
+
+        numpy.random.seed(1)
+        nao = mol.nao_nr()
+        c = numpy.random.random((nao,6))
+        dm = numpy.dot(c, c.T)
+        cpos, cneg = scf.dfhf.factorize_dm(dm)
+        self.assertEqual(cpos.shape[1], 6)
+        self.assertEqual(cneg.shape[1], 0)
+        dm[0,0] -= 10
+        cpos, cneg = scf.dfhf.factorize_dm(dm)
+        self.assertEqual(cneg.shape[1], 1)
+        self.assertTrue(numpy.allclose(numpy.dot(cpos,cpos.T)-numpy.dot(cneg,cneg.T), dm))
+
     def test_uhf_veff(self):
         mf = scf.density_fit(scf.UHF(mol))
         nao = mol.nao_nr()
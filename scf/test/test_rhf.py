@@ -176,6 +176,19 @@ class KnowValues(unittest.TestCase):
         self.assertAlmostEqual(numpy.linalg.norm(j1), 77.035779188661465, 9)
         self.assertAlmostEqual(numpy.linalg.norm(k1), 46.253491700647963, 9)
 
+    def test_incremental_fock(self):
+        mf1 = scf.RHF(mol)
+        mf1.max_memory = 0
+        mf1.conv_tol = 1e-10
+        mf1.rebuild_nsteps = 3
+        self.assertAlmostEqual(mf1.scf(), -76.026765673119627, 9)
+        self.assertAlmostEqual(mf1.opt.direct_scf_tol, mf1.direct_scf_tol, 15)
+
+    def test_adapt_direct_scf_tol(self):
+        self.assertAlmostEqual(scf.hf.adapt_direct_scf_tol(1e-13, 1e-1, 1e-5), 1e-9, 15)
+        self.assertAlmostEqual(scf.hf.adapt_direct_scf_tol(1e-13, 1e-4, 1e-5), 1e-12, 15)
+        self.assertAlmostEqual(scf.hf.adapt_direct_scf_tol(1e-13, 1e-7, 1e-5), 1e-13, 15)
+
     def test_ghost_atm_meta_lowdin(self):
         mol = gto.Mole()
         mol.atom = [["O" , (0. , 0.     , 0.)],
@@ -34,6 +34,53 @@ class KnowValues(unittest.TestCase):
         self.assertTrue(numpy.allclose(vj0,vj1))
         self.assertTrue(numpy.allclose(vk0,vk1))
 
+    def test_incore_mdm(self):
+        numpy.random.seed(1)
+        dm = numpy.random.random((3,nao,nao))
+        for eri in (mf._eri, ao2mo.restore(4, mf._eri, nmo)):
+            vj0, vk0 = _vhf.incore(eri, dm, hermi=0)
+            for i in range(3):
+                vj1, vk1 = _vhf.incore(eri, dm[i], hermi=0)
+                self.assertTrue(numpy.allclose(vj0[i],vj1))
+                self.assertTrue(numpy.allclose(vk0[i],vk1))
+        dm = dm + dm.transpose(0,2,1)
+        vj0, vk0 = scf.hf.dot_eri_dm(mf._eri, dm, hermi=1)
+        vj1, vk1 = scf.hf.dot_eri_dm(mf._eri, dm[1], hermi=1)
+        self.assertTrue(numpy.allclose(vj0[1],vj1))
+        self.assertTrue(numpy.allclose(vk0[1],vk1))
+
+    def test_direct_mp(self):
+        numpy.random.seed(1)
+        dm = numpy.random.random((2,nao,nao))
+        dm = dm + dm.transpose(0,2,1)
+        vj0, vk0 = _vhf.direct(dm, mol._atm, mol._bas, mol._env, hermi=1)
+        vj1, vk1 = _vhf.direct_mp(dm, mol._atm, mol._bas, mol._env,
+                                  hermi=1, nproc=3)
+        self.assertTrue(numpy.allclose(vj0,vj1))
+        self.assertTrue(numpy.allclose(vk0,vk1))
+
+        opt = mf.init_direct_scf(mol)
+        pairs, cost = _vhf.shell_pair_cost(mol._atm, mol._bas, mol._env, opt)
+        self.assertEqual(len(pairs), mol.nbas*(mol.nbas+1)//2)
+        bounds = _vhf.partition_shell_pairs(cost, 3)
+        self.assertEqual(bounds[-1], len(pairs))
+        vj1, vk1 = _vhf.direct_mp(dm[0], mol._atm, mol._bas, mol._env,
+                                  vhfopt=opt, hermi=1, nproc=2)
+        self.assertTrue(numpy.allclose(vj0[0],vj1))
+        self.assertTrue(numpy.allclose(vk0[0],vk1))
+        # the pool of the last call is reused
+        pool = _vhf._mp_pool['pool']
+        vj1, vk1 = _vhf.direct_mp(dm[1], mol._atm, mol._bas, mol._env,
+                                  vhfopt=opt, hermi=1, nproc=2)
+        self.assertTrue(_vhf._mp_pool['pool'] is pool)
+        self.assertTrue(numpy.allclose(vj0[1],vj1))
+        self.assertTrue(numpy.allclose(vk0[1],vk1))
+        # no memory for the buffers of two workers, computed by direct
+        vj1, vk1 = _vhf.direct_mp(dm, mol._atm, mol._bas, mol._env,
+                                  hermi=1, nproc=2, max_memory=0)
+        self.assertTrue(numpy.allclose(vj0,vj1))
+        self.assertTrue(numpy.allclose(vk0,vk1))
+
     def test_direct_mapdm(self):
         numpy.random.seed(1)
         dm = numpy.random.random((nao,nao))
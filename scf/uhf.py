@@ -548,9 +548,10 @@ class UHF(hf.SCF):
                 self._eri = _vhf.int2e_sph(mol._atm, mol._bas, mol._env)
             vj, vk = hf.dot_eri_dm(self._eri, dm.reshape(-1,nao,nao), hermi)
         else:
-            if self.direct_scf:
+            if self.direct_scf and self.opt is None:
                 self.opt = self.init_direct_scf(mol)
-            vj, vk = hf.get_jk(mol, dm.reshape(-1,nao,nao), hermi, self.opt)
+            vj, vk = hf.get_jk(mol, dm.reshape(-1,nao,nao), hermi, self.opt,
+                               self.direct_scf_nproc)
         logger.timer(self, 'vj and vk', *cpu0)
         return vj.reshape(dm.shape), vk.reshape(dm.shape)
 
@@ -4,54 +4,181 @@
 #
 
 import numpy
+import pyscf.lib
+from pyscf import gto
 from pyscf.dft import numint
+from pyscf.df import incore
 
 '''
 Gaussian cube file format
+
+The grids are evaluated slab by slab (along x), in blocks of slabs which fit
+max_memory.  The AO values are screened by numint.make_mask.  Several cube
+files (e.g. a list of orbitals) can be generated in one pass over the grids.
+The formatting and writing of a block is carried out in a background thread
+while the next block is evaluated.
 '''
 
-def density(mol, outfile, dm, nx=80, ny=80, nz=80):
+def density(mol, outfile, dm, nx=80, ny=80, nz=80, max_memory=2000):
+    '''Electron density.  dm can be the (nao,nao) density matrix or the
+    (alpha,beta) density matrices.
+    '''
+    dm = numpy.asarray(dm)
+    if dm.ndim == 3:
+        dm = dm[0] + dm[1]
+    def fn(coords):
+        mask = numint.make_mask(mol, coords)
+        ao = numint.eval_ao(mol, coords, non0tab=mask)
+        return [numint.eval_rho(mol, ao, dm, non0tab=mask)]
+    write_cubes(mol, [outfile], fn, ['Density in real space'], nx, ny, nz,
+                _blksize(mol.nao_nr(), max_memory))
+
+def spin_density(mol, outfile, dm, nx=80, ny=80, nz=80, max_memory=2000):
+    '''Spin density rho_alpha - rho_beta for dm = (dm_alpha,dm_beta)'''
+    def fn(coords):
+        mask = numint.make_mask(mol, coords)
+        ao = numint.eval_ao(mol, coords, non0tab=mask)
+        return [numint.eval_rho(mol, ao, dm[0], non0tab=mask) -
+                numint.eval_rho(mol, ao, dm[1], non0tab=mask)]
+    write_cubes(mol, [outfile], fn, ['Spin density in real space'],
+                nx, ny, nz, _blksize(mol.nao_nr(), max_memory))
+
+def orbital(mol, outfile, coeff, nx=80, ny=80, nz=80, max_memory=2000):
+    '''Orbital values.  If coeff is a 2D array (nao,norb), outfile is a list
+    of norb file names, and all orbitals are evaluated in one pass.
+
+    Examples:
+
+    >>> cubegen.orbital(mol, ['mo%d.cube'%i for i in range(4)], mf.mo_coeff[:,:4])
+    '''
+    coeff = numpy.ascontiguousarray(coeff)
+    if coeff.ndim == 1:
+        coeff = coeff.reshape(-1,1)
+        outfile = [outfile]
+    assert(len(outfile) == coeff.shape[1])
+    def fn(coords):
+        mask = numint.make_mask(mol, coords)
+        ao = numint.eval_ao(mol, coords, non0tab=mask)
+        return pyscf.lib.dot(ao, coeff).T
+    nao, norb = coeff.shape
+    write_cubes(mol, outfile, fn, ['Orbital value in real space']*norb,
+                nx, ny, nz, _blksize(nao+norb, max_memory))
+
+def mep(mol, outfile, dm, nx=80, ny=80, nz=80, max_memory=2000):
+    '''Molecular electrostatic potential'''
+    dm = numpy.asarray(dm)
+    if dm.ndim == 3:
+        dm = dm[0] + dm[1]
+    nao = dm.shape[0]
+    dm_tril = pyscf.lib.pack_tril(dm + dm.T)
+    idx = numpy.arange(nao)
+    dm_tril[idx*(idx+3)//2] *= .5  # diagonal elements
+    charges = numpy.array([mol.atom_charge(ia) for ia in range(mol.natm)])
+    atom_coords = numpy.array([mol.atom_coord(ia) for ia in range(mol.natm)])
+    blksize = _blksize(nao*(nao+1)//2, max_memory)
+    def fn(coords):
+        vnuc = 0
+        for ia in range(mol.natm):
+            r = numpy.linalg.norm(coords - atom_coords[ia], axis=1)
+            vnuc += charges[ia] / numpy.maximum(r, 1e-100)
+        vele = numpy.empty(len(coords))
+        for p0, p1 in numint.prange(0, len(coords), blksize):
+            ints = incore.aux_e2(mol, _fakemol(coords[p0:p1]), aosym='s2ij')
+            vele[p0:p1] = numpy.dot(dm_tril, ints)
+        return [vnuc - vele]
+    write_cubes(mol, [outfile], fn, ['Electrostatic potential in real space'],
+                nx, ny, nz, blksize*4)
+
+def _blksize(ncol, max_memory):
+    '''The number of grids for the (ngrids,ncol) buffers in max_memory'''
+    blksize = int(max_memory*1e6/8/(ncol*3+1))
+    return max(numint.BLKSIZE, blksize//numint.BLKSIZE*numint.BLKSIZE)
+
+def _fakemol(coords, expnt=1e16):
+    '''Point charges at the coords, approximated by the s-type gaussian
+    functions of the large exponent expnt.'''
+    nbas = len(coords)
+    fakeatm = numpy.zeros((nbas,gto.ATM_SLOTS), dtype=numpy.int32)
+    fakebas = numpy.zeros((nbas,gto.BAS_SLOTS), dtype=numpy.int32)
+    fakeenv = [numpy.zeros(gto.PTR_ENV_START), numpy.ravel(coords)]
+    ptr = gto.PTR_ENV_START
+    fakeatm[:,gto.PTR_COORD] = numpy.arange(ptr, ptr+nbas*3, 3)
+    ptr += nbas * 3
+    fakebas[:,gto.ATOM_OF] = numpy.arange(nbas)
+    fakebas[:,gto.NPRIM_OF] = 1
+    fakebas[:,gto.NCTR_OF] = 1
+    fakebas[:,gto.PTR_EXP] = ptr
+    fakebas[:,gto.PTR_COEFF] = ptr + 1
+# normalized to 1 with the angular factor 1/sqrt(4pi) of s function
+    fakeenv.append([expnt, 2*expnt**1.5/numpy.pi])
+    fakemol = gto.Mole()
+    fakemol._atm = fakeatm
+    fakemol._bas = fakebas
+    fakemol._env = numpy.hstack(fakeenv)
+    fakemol.natm = fakemol.nbas = nbas
+    return fakemol
+
+def get_box(mol, nx=80, ny=80, nz=80):
+    '''The origin, the grid spacing and the coordinates (in the order of
+    cube file, x the slowest and z the fastest index) of the box'''
     coord = [mol.atom_coord(ia) for ia in range(mol.natm)]
     box = numpy.max(coord,axis=0) - numpy.min(coord,axis=0) + 4
     boxorig = numpy.min(coord,axis=0) - 2
     xs = numpy.arange(nx) * (box[0]/nx)
     ys = numpy.arange(ny) * (box[1]/ny)
     zs = numpy.arange(nz) * (box[2]/nz)
-    coords = numpy.vstack(numpy.meshgrid(xs,ys,zs)).reshape(3,-1).T
-    coords = numpy.asarray(coords, order='C') - (-boxorig)
-
-    nao = mol.nao_nr()
-    ngrids = nx * ny * nz
-    blksize = min(200, ngrids)
-    rho = numpy.empty(ngrids)
-    for ip0, ip1 in numint.prange(0, ngrids, blksize):
-        ao = numint.eval_ao(mol, coords[ip0:ip1])
-        rho[ip0:ip1] = numint.eval_rho(mol, ao, dm)
-    rho = rho.reshape(nx,ny,nz)
-
-    with open(outfile, 'w') as f:
-        f.write('Density in real space\n')
-        f.write('Comment line\n')
-        f.write('%5d' % mol.natm)
-        f.write(' %14.8f %14.8f %14.8f\n' % tuple(boxorig.tolist()))
-        f.write('%5d %14.8f %14.8f %14.8f\n' % (nx, xs[1], 0, 0))
-        f.write('%5d %14.8f %14.8f %14.8f\n' % (ny, 0, ys[1], 0))
-        f.write('%5d %14.8f %14.8f %14.8f\n' % (nz, 0, 0, zs[1]))
-        for ia in range(mol.natm):
-            chg = mol.atom_charge(ia)
-            f.write('%5d %f' % (chg, chg))
-            f.write(' %14.8f %14.8f %14.8f\n' % tuple(mol.atom_coord(ia).tolist()))
+    coords = numpy.vstack(numpy.meshgrid(xs,ys,zs,indexing='ij')).reshape(3,-1).T
+    coords = numpy.asarray(coords, order='C') + boxorig
+    delta = box / numpy.array((nx,ny,nz))
+    return boxorig, delta, coords
+
+def write_cubes(mol, outfiles, fn, comments, nx=80, ny=80, nz=80,
+                blksize=None):
+    '''Evaluate fn on the grids and write the cube files.
+
+    Args:
+        fn : function(coords) => array of shape (len(outfiles),len(coords))
+            The values of the cube files on the given grids
+    '''
+    boxorig, delta, coords = get_box(mol, nx, ny, nz)
+    if blksize is None:
+        blksize = _blksize(mol.nao_nr(), 2000)
+    nslab = max(1, blksize // (ny*nz))
+
+    fs = [open(outfile, 'w') for outfile in outfiles]
+    try:
+        for f, comment in zip(fs, comments):
+            f.write(comment + '\n')
+            f.write('PySCF Version: %s\n' % pyscf.__version__)
+            f.write('%5d' % mol.natm)
+            f.write(' %14.8f %14.8f %14.8f\n' % tuple(boxorig.tolist()))
+            f.write('%5d %14.8f %14.8f %14.8f\n' % (nx, delta[0], 0, 0))
+            f.write('%5d %14.8f %14.8f %14.8f\n' % (ny, 0, delta[1], 0))
+            f.write('%5d %14.8f %14.8f %14.8f\n' % (nz, 0, 0, delta[2]))
+            for ia in range(mol.natm):
+                chg = mol.atom_charge(ia)
+                f.write('%5d %f' % (chg, chg))
+                f.write(' %14.8f %14.8f %14.8f\n' % tuple(mol.atom_coord(ia).tolist()))
+
         fmt = ' %14.8f' * nz + '\n'
-        for ix in range(nx):
-            for iy in range(ny):
-                f.write(fmt % tuple(rho[ix,iy].tolist()))
+        def write_block(vals):
+            for f, v in zip(fs, vals):
+                f.write((fmt * (v.size//nz)) % tuple(v.tolist()))
+
+        with pyscf.lib.call_in_background(write_block) as async_write:
+            for ix0, ix1 in numint.prange(0, nx, nslab):
+                vals = fn(coords[ix0*ny*nz:ix1*ny*nz])
+                async_write([numpy.asarray(v) for v in vals])
+    finally:
+        for f in fs:
+            f.close()
 
 
 if __name__ == '__main__':
-    from pyscf.dft import gen_grid
-    from pyscf import gto, scf
+    from pyscf import scf
     mol = gto.M(atom='H 0 0 0; H 0 0 1')
     mf = scf.RHF(mol)
     mf.kernel()
     density(mol, 'h2.cube', mf.make_rdm1())
-
+    orbital(mol, ['h2_mo1.cube', 'h2_mo2.cube'], mf.mo_coeff)
+    mep(mol, 'h2_mep.cube', mf.make_rdm1())
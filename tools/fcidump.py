@@ -1,8 +1,25 @@
 #!/usr/bin/env python
 
+'''
+FCIDUMP functions (write, read) for real Hamiltonian
+
+The integrals are screened and formatted in blocks of (ij| pairs.  The
+2-electron integrals can be given as a numpy array or as the h5py dataset of
+ao2mo.outcore (e.g. the 'eri_mo' dataset of ao2mo.outcore.full), which is
+read block by block, so that the full 4-index array is never held in memory.
+
+In the binary FCIDUMP, the header is the same text namelist as the FCIDUMP.
+It is followed by the records of (value, i, j, k, l) packed in BIN_DTYPE
+(little-endian float64 and 4 int32).
+'''
+
+import re
 from functools import reduce
 import numpy
 
+# The number of integrals to screen and format at once
+BLKSIZE = 1e6
+BIN_DTYPE = numpy.dtype([('val', '<f8'), ('idx', '<i4', (4,))])
 
 def write_head(fout, nmo, nelec, ms=0, orbsym=[]):
     fout.write(' &FCI NORB=%4d,NELEC=%2d,MS2=%d,\n' % (nmo, nelec, ms))
@@ -13,55 +30,87 @@ def write_head(fout, nmo, nelec, ms=0, orbsym=[]):
     fout.write('  ISYM=1,\n')
     fout.write(' &END\n')
 
-# 4-fold symmetry
-def write_eri(fout, eri, nmo, tol=1e-15):
+def _write_lines(fout, val, i, j, k, l, binary=False):
+    if binary:
+        rec = numpy.empty(len(val), dtype=BIN_DTYPE)
+        rec['val'] = val
+        rec['idx'] = numpy.vstack((i, j, k, l)).T
+        rec.tofile(fout)
+    else:
+        fout.write(''.join([' %.16g %4d %4d %4d %4d\n' % x
+                            for x in zip(val, i, j, k, l)]))
+
+def write_eri(fout, eri, nmo, tol=1e-15, binary=False, s8=False):
+    '''Write the 2-electron integrals.  eri can be the 4-fold symmetric
+    (npair,npair) array, or the 8-fold symmetric 1D array, or the h5py
+    dataset of these shapes.  For binary=True, fout needs to be opened in
+    binary mode.  If s8 is True, only the 8-fold unique integrals (ij|kl),
+    kl <= ij of the 4-fold symmetric eri are written.
+    '''
     npair = nmo*(nmo+1)//2
-    if eri.ndim == 2: # 4-fold symmetry
-        assert(eri.size == npair**2)
-        ij = 0
-        for i in range(nmo):
-            for j in range(0, i+1):
-                kl = 0
-                for k in range(0, nmo):
-                    for l in range(0, k+1):
-                        if abs(eri[ij,kl]) > tol:
-                            fout.write(' %.16g %4d %4d %4d %4d\n' \
-                                       % (eri[ij,kl], i+1, j+1, k+1, l+1))
-                        kl += 1
-                ij += 1
+    idx, idy = numpy.tril_indices(nmo)
+    idx += 1
+    idy += 1
+    blksize = max(1, int(BLKSIZE/npair))
+    if len(eri.shape) == 2: # 4-fold symmetry
+        assert(eri.shape == (npair,npair))
+        for ij0, ij1 in prange(0, npair, blksize):
+            buf = numpy.asarray(eri[ij0:ij1])
+            if s8:
+                buf = buf * (numpy.arange(npair) <=
+                             numpy.arange(ij0,ij1).reshape(-1,1))
+            buf = buf.ravel()
+            mask = numpy.where(abs(buf) > tol)[0]
+            ij = mask // npair + ij0
+            kl = mask % npair
+            _write_lines(fout, buf[mask], idx[ij], idy[ij], idx[kl], idy[kl],
+                         binary)
     else:
-        assert(eri.size == npair*(npair+1)//2)
-        ij = 0
-        ijkl = 0
-        for i in range(nmo):
-            for j in range(0, i+1):
-                kl = 0
-                for k in range(0, i+1):
-                    for l in range(0, k+1):
-                        if ij >= kl:
-                            if abs(eri[ijkl]) > tol:
-                                fout.write(' %.16g %4d %4d %4d %4d\n' \
-                                           % (eri[ijkl], i+1, j+1, k+1, l+1))
-                            ijkl += 1
-                        kl += 1
-                ij += 1
-
-def write_hcore(fout, h, nmo, tol=1e-15):
+        assert(eri.shape[0] == npair*(npair+1)//2)
+        for ij0, ij1 in prange(0, npair, blksize):
+            p0 = ij0*(ij0+1)//2
+            p1 = ij1*(ij1+1)//2
+            buf = numpy.asarray(eri[p0:p1])
+            mask = numpy.where(abs(buf) > tol)[0]
+            ij = numpy.repeat(numpy.arange(ij0, ij1), numpy.arange(ij0+1, ij1+1))
+            ij = ij[mask]
+            kl = mask + p0 - ij*(ij+1)//2
+            _write_lines(fout, buf[mask], idx[ij], idy[ij], idx[kl], idy[kl],
+                         binary)
+
+def write_hcore(fout, h, nmo, tol=1e-15, binary=False):
     h = h.reshape(nmo,nmo)
-    for i in range(nmo):
-        for j in range(0, i+1):
-            if abs(h[i,j]) > tol:
-                fout.write(' %.16g %4d %4d  0  0\n' % (h[i,j], i+1, j+1))
+    idx, idy = numpy.tril_indices(nmo)
+    h = h[idx,idy]
+    mask = abs(h) > tol
+    zeros = numpy.zeros(numpy.count_nonzero(mask), dtype=int)
+    if binary:
+        _write_lines(fout, h[mask], idx[mask]+1, idy[mask]+1, zeros, zeros,
+                     binary)
+    else:
+        fout.write(''.join([' %.16g %4d %4d  0  0\n' % x
+                            for x in zip(h[mask], idx[mask]+1, idy[mask]+1)]))
+
+def write_nuc(fout, nuc, binary=False):
+    if binary:
+        _write_lines(fout, [nuc], [0], [0], [0], [0], binary)
+    else:
+        fout.write(' %.16g  0  0  0  0\n' % nuc)
 
 
-def from_chkfile(output, chkfile, tol=1e-15):
+def from_chkfile(output, chkfile, tol=1e-15, binary=False, max_memory=2000):
+    '''The MO integrals are generated by ao2mo.outcore and written to output
+    block by block, with the 8-fold symmetry of the real orbitals.
+    '''
+    import tempfile
+    import h5py
     import pyscf.scf
     import pyscf.ao2mo
     import pyscf.symm
+    mol, scf_rec = pyscf.scf.chkfile.load_scf(chkfile)
+    mo_coeff = numpy.array(scf_rec['mo_coeff'])
+    nmo = mo_coeff.shape[1]
     with open(output, 'w') as fout:
-        mol, scf_rec = pyscf.scf.chkfile.load_scf(chkfile)
-        mo_coeff = numpy.array(scf_rec['mo_coeff'])
-        nmo = mo_coeff.shape[1]
         if mol.symmetry:
             orbsym = pyscf.symm.label_orb_symm(mol, mol.irrep_name,
                                                mol.irrep_id, mo_coeff)
@@ -69,22 +118,114 @@ def from_chkfile(output, chkfile, tol=1e-15):
         else:
             write_head(fout, nmo, mol.nelectron, mol.spin)
 
-        eri = pyscf.ao2mo.outcore.full_iofree(mol, mo_coeff, verbose=0)
-        write_eri(fout, pyscf.ao2mo.restore(8, eri, nmo), nmo, tol=tol)
+    t = mol.intor_symmetric('cint1e_kin_sph')
+    v = mol.intor_symmetric('cint1e_nuc_sph')
+    h = reduce(numpy.dot, (mo_coeff.T, t+v, mo_coeff))
 
-        t = mol.intor_symmetric('cint1e_kin_sph')
-        v = mol.intor_symmetric('cint1e_nuc_sph')
-        h = reduce(numpy.dot, (mo_coeff.T, t+v, mo_coeff))
-        write_hcore(fout, h, nmo, tol=tol)
-        fout.write(' %.16g  0  0  0  0\n' % mol.energy_nuc())
+    ftmp = tempfile.NamedTemporaryFile()
+    pyscf.ao2mo.outcore.full(mol, mo_coeff, ftmp.name, max_memory=max_memory,
+                             verbose=0)
+    with h5py.File(ftmp.name, 'r') as feri:
+        with open(output, binary and 'ab' or 'a') as fout:
+            write_eri(fout, feri['eri_mo'], nmo, tol=tol, binary=binary,
+                      s8=True)
+            write_hcore(fout, h, nmo, tol=tol, binary=binary)
+            write_nuc(fout, mol.energy_nuc(), binary)
 
 def from_integrals(output, h1e, h2e, nmo, nelec, nuc=0, ms=0, orbsym=[],
-                   tol=1e-15):
+                   tol=1e-15, binary=False):
     with open(output, 'w') as fout:
         write_head(fout, nmo, nelec, ms, orbsym)
-        write_eri(fout, h2e, nmo, tol=tol)
-        write_hcore(fout, h1e, nmo, tol=tol)
-        fout.write(' %.16g  0  0  0  0\n' % nuc)
+    with open(output, binary and 'ab' or 'a') as fout:
+        write_eri(fout, h2e, nmo, tol=tol, binary=binary)
+        write_hcore(fout, h1e, nmo, tol=tol, binary=binary)
+        write_nuc(fout, nuc, binary)
+
+
+def read(filename):
+    '''Parse the FCIDUMP (text or binary) file
+
+    Returns:
+        A dict with keys NORB, NELEC, MS2, ORBSYM, ISYM, ECORE, H1 and H2,
+        and the other keys of the header (e.g. UHF of Molpro).  H1 is a
+        (norb,norb) array.  H2 is the 8-fold symmetric 1D array.
+    '''
+    with open(filename, 'rb') as f:
+        header = []
+        while True:
+            line = f.readline().decode()
+            if not line:
+                raise RuntimeError('FCIDUMP %s: &END not found' % filename)
+            header.append(line)
+            if '&END' in line.upper() or line.strip() == '/':
+                break
+        dat = f.read()
+
+    header = ' '.join(header)
+    header = re.sub('&FCI|&END|/', ' ', header, flags=re.I)
+    result = {}
+    tokens = re.split(r'(\w+)\s*=', header)
+    for key, val in zip(tokens[1::2], tokens[2::2]):
+        val = [_parse_value(x) for x in val.replace(',', ' ').split()]
+        if key.upper() == 'ORBSYM':
+            result['ORBSYM'] = val
+        elif len(val) > 0:
+            result[key.upper()] = val[0]
+    norb = result['NORB']
+
+    # int32 indices of the binary records always have zero bytes
+    if b'\0' in dat:
+        rec = numpy.frombuffer(dat, dtype=BIN_DTYPE)
+        val = rec['val']
+        i, j, k, l = rec['idx'].T
+    else:
+        dat = numpy.array(dat.replace(b'D', b'E').replace(b'd', b'e').split(),
+                          dtype=float).reshape(-1,5)
+        val = dat[:,0]
+        i, j, k, l = dat[:,1:].astype(int).T
+
+    def pair(p, q):
+        p, q = numpy.maximum(p, q), numpy.minimum(p, q)
+        return p*(p+1)//2 + q
+
+    mask = (k > 0)
+    ij = pair(i[mask]-1, j[mask]-1)
+    kl = pair(k[mask]-1, l[mask]-1)
+    npair = norb*(norb+1)//2
+    h2 = numpy.zeros(npair*(npair+1)//2)
+    h2[pair(ij, kl)] = val[mask]
+
+    mask = (k == 0) & (i > 0)
+    h1 = numpy.zeros((norb,norb))
+    h1[i[mask]-1,j[mask]-1] = val[mask]
+    h1[j[mask]-1,i[mask]-1] = val[mask]
+
+    mask = (i == 0)
+    result['ECORE'] = val[mask].sum()
+    result['H1'] = h1
+    result['H2'] = h2
+    return result
+
+def _parse_value(x):
+    '''int, float or logical value of the namelist, e.g. UHF=.FALSE.'''
+    try:
+        return int(x)
+    except ValueError:
+        pass
+    try:
+        return float(x.replace('D', 'E').replace('d', 'e'))
+    except ValueError:
+        pass
+    if x.upper() in ('.TRUE.', '.T.', 'T'):
+        return True
+    elif x.upper() in ('.FALSE.', '.F.', 'F'):
+        return False
+    else:
+        return x
+
+def prange(start, end, step):
+    for i in range(start, end, step):
+        yield i, min(i+step, end)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+import unittest
+import tempfile
+import numpy
+from pyscf import gto
+from pyscf.tools import cubegen
+
+# He+ in one tight s function (and a p shell for the orbitals).  The density
+# vanishes at the boundary of the box.
+mol = gto.M(atom='He 0 0 0', charge=1, spin=1, verbose=0,
+            basis={'He': [[0, (4., 1.)], [1, (3., 1.)]]})
+nao = mol.nao_nr()
+dma = numpy.zeros((nao,nao))
+dma[0,0] = 1
+dmb = numpy.zeros((nao,nao))
+nx, ny, nz = 30, 32, 34
+
+def read_cube(fname):
+    with open(fname, 'r') as f:
+        lines = f.readlines()
+    natm = int(lines[2].split()[0])
+    return numpy.array(' '.join(lines[6+natm:]).split(), dtype=float)
+
+def grid_volume():
+    boxorig, delta, coords = cubegen.get_box(mol, nx, ny, nz)
+    return delta.prod()
+
+class KnowValues(unittest.TestCase):
+    def test_get_box(self):
+        mol1 = gto.M(atom='H 0 0 0; H 0 1 2', verbose=0)
+        boxorig, delta, coords = cubegen.get_box(mol1, 3, 4, 5)
+        self.assertEqual(coords.shape, (3*4*5,3))
+        # x is the slowest and z the fastest index
+        ix, iy, iz = 2, 1, 3
+        ref = boxorig + numpy.array((ix,iy,iz)) * delta
+        self.assertTrue(numpy.allclose(coords[ix*4*5+iy*5+iz], ref))
+
+    def test_density(self):
+        with tempfile.NamedTemporaryFile() as f:
+            cubegen.density(mol, f.name, (dma,dmb), nx, ny, nz)
+            rho = read_cube(f.name)
+        self.assertEqual(rho.size, nx*ny*nz)
+        self.assertAlmostEqual(rho.sum() * grid_volume(), mol.nelectron, 5)
+
+        with tempfile.NamedTemporaryFile() as f:
+            cubegen.spin_density(mol, f.name, (dma,dmb), nx, ny, nz)
+            rho = read_cube(f.name)
+        self.assertAlmostEqual(rho.sum() * grid_volume(), 1, 5)
+
+    def test_orbital(self):
+        with tempfile.NamedTemporaryFile() as f1:
+            with tempfile.NamedTemporaryFile() as f2:
+                cubegen.orbital(mol, [f1.name, f2.name], numpy.eye(nao)[:,:2],
+                                nx, ny, nz)
+                mo1 = read_cube(f1.name)
+                mo2 = read_cube(f2.name)
+        self.assertAlmostEqual((mo1**2).sum() * grid_volume(), 1, 5)
+        self.assertAlmostEqual((mo2**2).sum() * grid_volume(), 1, 5)
+        self.assertAlmostEqual((mo1*mo2).sum() * grid_volume(), 0, 5)
+
+    def test_mep(self):
+        with tempfile.NamedTemporaryFile() as f:
+            cubegen.mep(mol, f.name, (dma,dmb), nx, ny, nz)
+            v = read_cube(f.name)
+        coords = cubegen.get_box(mol, nx, ny, nz)[2]
+        r = numpy.linalg.norm(coords - mol.atom_coord(0), axis=1)
+        far = r > 1.8
+        # total charge / r outside of the charge distribution
+        self.assertTrue(abs(v[far] - mol.charge/r[far]).max() < 1e-5)
+
+
+if __name__ == "__main__":
+    print("Full Tests for cubegen")
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+import unittest
+import tempfile
+import numpy
+from pyscf import ao2mo
+from pyscf.tools import fcidump
+
+norb = 6
+numpy.random.seed(12)
+h1 = numpy.random.random((norb,norb))
+h1 = h1 + h1.T
+eri = numpy.random.random((norb,)*4)
+eri = eri + eri.transpose(1,0,2,3)
+eri = eri + eri.transpose(0,1,3,2)
+eri = eri + eri.transpose(2,3,0,1)
+eri[abs(eri) < 1] = 0
+eri4 = ao2mo.restore(4, eri, norb)
+eri8 = ao2mo.restore(8, eri, norb)
+
+def round_trip(h1e, h2e, **kwargs):
+    with tempfile.NamedTemporaryFile() as f:
+        fcidump.from_integrals(f.name, h1e, h2e, norb, 4, nuc=1.5,
+                               orbsym=[1,1,2,2,3,4], **kwargs)
+        return fcidump.read(f.name)
+
+class KnowValues(unittest.TestCase):
+    def test_4fold(self):
+        result = round_trip(h1, eri4)
+        self.assertEqual(result['NORB'], norb)
+        self.assertEqual(result['NELEC'], 4)
+        self.assertEqual(result['ORBSYM'], [1,1,2,2,3,4])
+        self.assertAlmostEqual(result['ECORE'], 1.5, 14)
+        self.assertTrue(numpy.allclose(result['H1'], h1))
+        self.assertTrue(numpy.allclose(result['H2'], eri8))
+
+    def test_8fold(self):
+        result = round_trip(h1, eri8)
+        self.assertTrue(numpy.allclose(result['H1'], h1))
+        self.assertTrue(numpy.allclose(result['H2'], eri8))
+
+        with tempfile.NamedTemporaryFile() as f:
+            with open(f.name, 'w') as fout:
+                fcidump.write_eri(fout, eri4, norb, s8=True)
+            with open(f.name, 'r') as fin:
+                self.assertEqual(len(fin.readlines()),
+                                 numpy.count_nonzero(eri8))
+
+    def test_binary(self):
+        result = round_trip(h1, eri4, binary=True)
+        self.assertTrue(numpy.array_equal(result['H1'], h1))
+        self.assertTrue(numpy.array_equal(result['H2'], eri8))
+        self.assertAlmostEqual(result['ECORE'], 1.5, 14)
+        result = round_trip(h1, eri8, binary=True)
+        self.assertTrue(numpy.array_equal(result['H2'], eri8))
+
+    def test_hcore_only(self):
+        result = round_trip(h1, numpy.zeros_like(eri8))
+        self.assertTrue(numpy.allclose(result['H1'], h1))
+        self.assertTrue(numpy.all(result['H2'] == 0))
+        self.assertAlmostEqual(result['ECORE'], 1.5, 14)
+
+    def test_molpro_header(self):
+        with tempfile.NamedTemporaryFile() as f:
+            with open(f.name, 'w') as fout:
+                fout.write(' &FCI NORB=  2,NELEC= 2,MS2= 0,\n')
+                fout.write('  ORBSYM=1,\n  5,\n')
+                fout.write('  ISYM=1,UHF=.FALSE.,IUHF=0,\n')
+                fout.write(' /\n')
+                fout.write('  0.5D+00   1   1   1   1\n')
+                fout.write(' -1.25D+00   1   1   0   0\n')
+                fout.write('  0.25   2   1   0   0\n')
+                fout.write('  3.0   0   0   0   0\n')
+            result = fcidump.read(f.name)
+        self.assertEqual(result['NORB'], 2)
+        self.assertEqual(result['ORBSYM'], [1,5])
+        self.assertEqual(result['UHF'], False)
+        self.assertEqual(result['IUHF'], 0)
+        self.assertAlmostEqual(result['ECORE'], 3., 14)
+        self.assertTrue(numpy.allclose(result['H1'], [[-1.25,.25],[.25,0]]))
+        self.assertAlmostEqual(result['H2'][0], .5, 14)
+
+
+if __name__ == "__main__":
+    print("Full Tests for fcidump")
+    unittest.main()